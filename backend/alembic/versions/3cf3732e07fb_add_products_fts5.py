@@ -19,6 +19,10 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade():
+    # FTS5 is SQLite only; Postgres search is added in c5f1d9e2a7b8
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
     # Create FTS5 table indexing name, brand, category only
     op.execute(
         """
@@ -73,6 +77,10 @@ def upgrade():
 
 
 def downgrade():
+    # FTS5 is SQLite only; Postgres search is added in c5f1d9e2a7b8
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
     op.execute("DROP TRIGGER IF EXISTS products_ad;")
     op.execute("DROP TRIGGER IF EXISTS products_au;")
     op.execute("DROP TRIGGER IF EXISTS products_ai;")
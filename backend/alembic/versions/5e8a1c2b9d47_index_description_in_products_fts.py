@@ -0,0 +1,141 @@
+"""index description in products fts
+
+Revision ID: 5e8a1c2b9d47
+Revises: cf6a2e24fee8
+Create Date: 2026-10-17 09:12:41.512204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e8a1c2b9d47"
+down_revision: Union[str, None] = "cf6a2e24fee8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_fts():
+    op.execute("DROP TRIGGER IF EXISTS products_ad;")
+    op.execute("DROP TRIGGER IF EXISTS products_au;")
+    op.execute("DROP TRIGGER IF EXISTS products_ai;")
+    op.execute("DROP TABLE IF EXISTS products_fts;")
+
+
+def upgrade():
+    # FTS5 is SQLite only; Postgres search is added in c5f1d9e2a7b8
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    _drop_fts()
+
+    # Same content table, now with description_md and diacritic folding
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE products_fts USING fts5(
+            name,
+            brand,
+            category,
+            description_md,
+            content='products',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        """
+    )
+
+    # Backfill from the content table
+    op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild');")
+
+    # External content triggers must pass the old values on delete
+    op.execute(
+        """
+        CREATE TRIGGER products_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, brand, category, description_md)
+            VALUES (new.id, new.name, new.brand, new.category, new.description_md);
+        END;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER products_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(
+                products_fts, rowid, name, brand, category, description_md
+            )
+            VALUES (
+                'delete', old.id, old.name, old.brand, old.category, old.description_md
+            );
+        END;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER products_au
+        AFTER UPDATE OF name, brand, category, description_md ON products BEGIN
+            INSERT INTO products_fts(
+                products_fts, rowid, name, brand, category, description_md
+            )
+            VALUES (
+                'delete', old.id, old.name, old.brand, old.category, old.description_md
+            );
+            INSERT INTO products_fts(rowid, name, brand, category, description_md)
+            VALUES (new.id, new.name, new.brand, new.category, new.description_md);
+        END;
+        """
+    )
+
+
+def downgrade():
+    # FTS5 is SQLite only; Postgres search is added in c5f1d9e2a7b8
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    _drop_fts()
+
+    # Back to the original name/brand/category index
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE products_fts USING fts5(
+            name,
+            brand,
+            category,
+            content='products',
+            content_rowid='id'
+        );
+        """
+    )
+    op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild');")
+
+    op.execute(
+        """
+        CREATE TRIGGER products_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, brand, category)
+            VALUES (new.id, new.name, new.brand, new.category);
+        END;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER products_au AFTER UPDATE ON products BEGIN
+            UPDATE products_fts
+            SET name = new.name,
+                brand = new.brand,
+                category = new.category
+            WHERE rowid = new.id;
+        END;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER products_ad AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END;
+        """
+    )
@@ -0,0 +1,36 @@
+"""add product listing indexes
+
+Revision ID: 8f3b6d0a4c12
+Revises: 5e8a1c2b9d47
+Create Date: 2026-10-17 10:02:13.871540
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "8f3b6d0a4c12"
+down_revision: Union[str, None] = "5e8a1c2b9d47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Support keyset paging on (created_at, id) and (price_cents, id)
+    op.create_index(
+        "ix_products_active_created_at",
+        "products",
+        ["active", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_products_active_price_cents",
+        "products",
+        ["active", "price_cents", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_active_price_cents", table_name="products")
+    op.drop_index("ix_products_active_created_at", table_name="products")
@@ -0,0 +1,63 @@
+"""add analytics rollups
+
+Revision ID: a41c7e9b2f35
+Revises: 8f3b6d0a4c12
+Create Date: 2026-10-17 11:40:02.118734
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "a41c7e9b2f35"
+down_revision: Union[str, None] = "8f3b6d0a4c12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analytics_rollups",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("granularity", sa.String(8), nullable=False),
+        sa.Column("bucket_start", sa.DateTime, nullable=False),
+        sa.Column("dimension", sa.String(20), nullable=False),
+        sa.Column("key", sa.String(500), nullable=False),
+        sa.Column("count", sa.Integer, nullable=False),
+        sa.CheckConstraint(
+            "granularity in ('hour','day')",
+            name="analytics_rollups_granularity_check",
+        ),
+        sa.UniqueConstraint(
+            "granularity", "bucket_start", "dimension", "key", name="uq_rollup_bucket"
+        ),
+    )
+    op.create_index(
+        "ix_rollups_dimension_bucket",
+        "analytics_rollups",
+        ["granularity", "dimension", "bucket_start"],
+    )
+
+    op.create_table(
+        "analytics_session_buckets",
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket_start", sa.DateTime, primary_key=True),
+        sa.Column("session_id", sa.String(64), primary_key=True),
+    )
+
+    op.create_table(
+        "analytics_rollup_state",
+        sa.Column("source", sa.String(40), primary_key=True),
+        sa.Column("last_event_id", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analytics_rollup_state")
+    op.drop_table("analytics_session_buckets")
+    op.drop_index("ix_rollups_dimension_bucket", table_name="analytics_rollups")
+    op.drop_table("analytics_rollups")
@@ -0,0 +1,50 @@
+"""add stripe events inbox
+
+Revision ID: a9e2c6f1d4b7
+Revises: f4c7a2d9b361
+Create Date: 2026-10-17 18:11:47.902316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "a9e2c6f1d4b7"
+down_revision: Union[str, None] = "f4c7a2d9b361"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stripe_events",
+        sa.Column("id", sa.String(255), primary_key=True),
+        sa.Column("type", sa.String(100), nullable=False),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("received_at", sa.DateTime, nullable=False),
+        sa.Column("processed_at", sa.DateTime, nullable=True),
+        sa.CheckConstraint(
+            "status in ('pending','processing','done','failed')",
+            name="stripe_events_status_check",
+        ),
+    )
+    op.create_index(
+        "ix_stripe_events_status_next_attempt_at",
+        "stripe_events",
+        ["status", "next_attempt_at"],
+    )
+    # Webhook events find their order by PaymentIntent id
+    op.create_index("ix_orders_provider_ref", "orders", ["provider_ref"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_provider_ref", table_name="orders")
+    op.drop_index("ix_stripe_events_status_next_attempt_at", table_name="stripe_events")
+    op.drop_table("stripe_events")
@@ -0,0 +1,69 @@
+"""add product review stats
+
+Revision ID: b3d8f5a1c926
+Revises: a9e2c6f1d4b7
+Create Date: 2026-10-17 19:24:05.317842
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "b3d8f5a1c926"
+down_revision: Union[str, None] = "a9e2c6f1d4b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_COLUMNS = [
+    "rating_count",
+    "rating_sum",
+    "rating_1",
+    "rating_2",
+    "rating_3",
+    "rating_4",
+    "rating_5",
+    "rating_avg_x100",
+]
+
+
+def upgrade() -> None:
+    for name in _COLUMNS:
+        op.add_column(
+            "products",
+            sa.Column(name, sa.Integer(), nullable=False, server_default="0"),
+        )
+    op.create_index(
+        "ix_products_active_rating", "products", ["active", "rating_avg_x100", "id"]
+    )
+
+    # Backfill from existing reviews (same as backend.scripts.backfill_review_stats)
+    buckets = ", ".join(
+        f"rating_{n} = (SELECT COUNT(*) FROM reviews r "
+        f"WHERE r.product_id = products.id AND r.rating = {n})"
+        for n in range(1, 6)
+    )
+    op.execute(
+        f"""
+        UPDATE products SET
+            rating_count = (SELECT COUNT(*) FROM reviews r WHERE r.product_id = products.id),
+            rating_sum = (SELECT COALESCE(SUM(r.rating), 0) FROM reviews r
+                          WHERE r.product_id = products.id),
+            {buckets}
+        """
+    )
+    op.execute(
+        """
+        UPDATE products SET rating_avg_x100 = CASE WHEN rating_count > 0
+            THEN (rating_sum * 100 + rating_count / 2) / rating_count ELSE 0 END
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_active_rating", table_name="products")
+    with op.batch_alter_table("products") as batch:
+        for name in reversed(_COLUMNS):
+            batch.drop_column(name)
@@ -0,0 +1,44 @@
+"""add event indexes
+
+Revision ID: b7d2e5f8c930
+Revises: a41c7e9b2f35
+Create Date: 2026-10-17 12:25:47.300418
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "b7d2e5f8c930"
+down_revision: Union[str, None] = "a41c7e9b2f35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = [
+    ("ix_view_events_occurred_at", "view_events", ["occurred_at"]),
+    ("ix_view_events_session_occurred", "view_events", ["session_id", "occurred_at"]),
+    ("ix_view_events_product_occurred", "view_events", ["product_id", "occurred_at"]),
+    ("ix_interaction_events_occurred_at", "interaction_events", ["occurred_at"]),
+    (
+        "ix_interaction_events_type_occurred",
+        "interaction_events",
+        ["event_type", "occurred_at"],
+    ),
+    (
+        "ix_interaction_events_session_occurred",
+        "interaction_events",
+        ["session_id", "occurred_at"],
+    ),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in _INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,48 @@
+"""add products search tsv (postgres)
+
+Revision ID: c5f1d9e2a7b8
+Revises: b7d2e5f8c930
+Create Date: 2026-10-17 14:02:18.664120
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "c5f1d9e2a7b8"
+down_revision: Union[str, None] = "b7d2e5f8c930"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # SQLite keeps using products_fts
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    # Generated column, so it is backfilled by the ALTER and never drifts.
+    # Weights A-D match the bm25() weights on SQLite.
+    op.execute(
+        """
+        ALTER TABLE products ADD COLUMN search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(brand, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(category, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(description_md, '')), 'D')
+        ) STORED;
+        """
+    )
+    op.execute(
+        "CREATE INDEX ix_products_search_tsv ON products USING GIN (search_tsv);"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_products_search_tsv;")
+    op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_tsv;")
@@ -0,0 +1,30 @@
+"""add reviews product/created_at index
+
+Revision ID: c8e4a7d2f153
+Revises: b3d8f5a1c926
+Create Date: 2026-10-17 20:11:42.604718
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "c8e4a7d2f153"
+down_revision: Union[str, None] = "b3d8f5a1c926"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset paging of a product's reviews, newest first, on (created_at, id)
+    op.create_index(
+        "ix_reviews_product_id_created_at",
+        "reviews",
+        ["product_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reviews_product_id_created_at", table_name="reviews")
@@ -0,0 +1,34 @@
+"""add order stock reservation
+
+Revision ID: d2a8c4f6e913
+Revises: c5f1d9e2a7b8
+Create Date: 2026-10-17 15:20:44.108326
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "d2a8c4f6e913"
+down_revision: Union[str, None] = "c5f1d9e2a7b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Unpaid card orders hold their stock until this time
+    op.add_column("orders", sa.Column("reserved_until", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_orders_status_reserved_until",
+        "orders",
+        ["status", "reserved_until"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_status_reserved_until", table_name="orders")
+    with op.batch_alter_table("orders") as batch:
+        batch.drop_column("reserved_until")
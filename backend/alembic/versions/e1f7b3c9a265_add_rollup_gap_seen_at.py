@@ -0,0 +1,31 @@
+"""add analytics rollup gap_seen_at
+
+Revision ID: e1f7b3c9a265
+Revises: c8e4a7d2f153
+Create Date: 2026-10-17 22:48:13.529174
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "e1f7b3c9a265"
+down_revision: Union[str, None] = "c8e4a7d2f153"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The rollup waits for a missing event id to settle before skipping it
+    op.add_column(
+        "analytics_rollup_state",
+        sa.Column("gap_seen_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("analytics_rollup_state") as batch:
+        batch.drop_column("gap_seen_at")
@@ -0,0 +1,32 @@
+"""add updated_at to products and variants
+
+Revision ID: f4c7a2d9b361
+Revises: e6b3f1a9c574
+Create Date: 2026-10-17 17:02:13.518204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision: str = "f4c7a2d9b361"
+down_revision: Union[str, None] = "e6b3f1a9c574"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The price snapshot only re-reads rows changed since its last refresh
+    for table in ("products", "variants"):
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.create_index(f"ix_{table}_updated_at", table, ["updated_at"])
+
+
+def downgrade() -> None:
+    for table in ("variants", "products"):
+        op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("updated_at")
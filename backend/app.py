@@ -5,13 +5,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Load env variables first
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from flask_talisman import Talisman
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # Security helpers
 from backend.security.load_user import load_user
 from backend.security.analytics import log_view
+from backend.cache import init_catalogue_cache
 
 # Blueprints
 from backend.routes.products import bp as products_bp
@@ -21,13 +23,21 @@ from backend.routes.uploads import bp as uploads_bp
 from backend.routes.reviews import bp as reviews_bp
 from backend.routes.account import bp as account_bp
 from backend.routes.checkout import bp as checkout_bp
+from backend.routes.cart import bp as cart_bp
 from backend.routes.analytics import bp as analytics_bp
 from backend.routes.admin_analytics import bp as admin_analytics_bp
 from backend.routes.seller import bp as seller_bp
 from backend.routes.orders import bp as orders_bp
 from backend.routes.payments_stripe import bp as stripe_payments_bp
+from backend.routes.admin_cache import bp as admin_cache_bp
 
+from backend import config
 from backend.db.bootstrap import bootstrap_db_once
+from backend.db.session import init_db_session
+from backend.security.payments import init_payments
+from backend.security.stripe_inbox import stripe_inbox
+from backend.security.uploads import MAX_BYTES as MAX_UPLOAD_BYTES
+from backend.storage import init_media_storage
 
 def create_app():
     app = Flask(__name__)
@@ -41,16 +51,40 @@ def create_app():
         PERMANENT_SESSION_LIFETIME=timedelta(hours=4),
         STRIPE_SECRET_KEY=os.getenv("STRIPE_SECRET_KEY"),
         STRIPE_WEBHOOK_SECRET=os.getenv("STRIPE_WEBHOOK_SECRET"),
+        # Bodies over this are refused from Content-Length, or as soon as a
+        # chunked body passes it, instead of being spooled first. The
+        # headroom covers multipart framing around a MAX_UPLOAD_BYTES image.
+        MAX_CONTENT_LENGTH=int(
+            os.getenv("MAX_CONTENT_LENGTH") or MAX_UPLOAD_BYTES + 64 * 1024
+        ),
     )
 
+    @app.errorhandler(RequestEntityTooLarge)
+    def request_too_large(exc):
+        return jsonify(error="Request body too large"), 413
+
     # Media uploads
-    upload_root = Path(__file__).resolve().parent / "uploads"
+    upload_root = Path(config.UPLOAD_ROOT).resolve()
     upload_root.mkdir(parents=True, exist_ok=True)
     app.config["UPLOAD_ROOT"] = upload_root
+    # Local disk, or an S3-compatible bucket (MEDIA_STORAGE)
+    init_media_storage(app)
 
     # ✅ New line: ensure DB is created and seeded once
     bootstrap_db_once()
 
+    # Catalogue read cache (sizes/TTL/shared backend come from env)
+    init_catalogue_cache()
+
+    # One DB session per request, closed when the app context ends
+    init_db_session(app)
+
+    # Stripe client: key, timeouts and circuit breaker, set once per process
+    init_payments(app)
+
+    # Stripe webhook inbox: apply events still pending from before a restart
+    stripe_inbox.ensure_started()
+
     # CORS for the frontend
     CORS(
         app,
@@ -95,6 +129,11 @@ def create_app():
     # Attach logged user
     @app.before_request
     def attach_user():
+        # Media is public: not reading the session keeps those responses
+        # free of Vary: Cookie, so shared caches can store them
+        if request.path.startswith("/media/"):
+            g.current_user = None
+            return
         load_user()
 
     # Log every view (basic analytics)
@@ -113,7 +152,7 @@ def create_app():
         # Skip obvious noise
         if path == "/favicon.ico":
             return
-        if path.startswith("/static"):
+        if path.startswith(("/static", "/media/")):
             return
         if path.startswith("/api/auth"):
             return  # do not log login/logout/register endpoints
@@ -129,11 +168,13 @@ def create_app():
     app.register_blueprint(account_bp)
     app.register_blueprint(admin_users_bp)
     app.register_blueprint(checkout_bp)
+    app.register_blueprint(cart_bp)
     app.register_blueprint(analytics_bp)
     app.register_blueprint(admin_analytics_bp)
     app.register_blueprint(seller_bp)
     app.register_blueprint(orders_bp)
     app.register_blueprint(stripe_payments_bp)
+    app.register_blueprint(admin_cache_bp)
 
     # Root and health checks
     @app.get("/")
@@ -0,0 +1,22 @@
+"""
+In-process caching helpers for LePax.
+"""
+
+from .ttl import TTLCache
+from .catalogue import (
+    CatalogueCache,
+    LocalSharedBackend,
+    catalogue_cache,
+    init_catalogue_cache,
+)
+from .pricing import PriceSnapshot, price_snapshot
+
+__all__ = [
+    "TTLCache",
+    "CatalogueCache",
+    "LocalSharedBackend",
+    "catalogue_cache",
+    "init_catalogue_cache",
+    "PriceSnapshot",
+    "price_snapshot",
+]
@@ -0,0 +1,330 @@
+"""
+Read-through cache for catalogue responses (listings, facets, product detail).
+
+Two layers:
+  - a per-process LRU+TTL cache (always on)
+  - an optional shared backend with a Redis-like API (get/set/delete/incr),
+    so several app processes see the same entries and invalidations
+
+Invalidation:
+  - product detail entries are dropped by product id
+  - listing/facet keys embed a catalogue generation number; any seller write
+    bumps it, so every older listing entry simply stops being addressed
+  - they also embed a stock generation, bumped whenever variant stock
+    changes (sales, expired reservations), since the size/colour filters and
+    facets only count variants in stock; product detail leaves stock out
+
+Without the shared backend, generations are per process: other workers only
+catch up when their entries expire (CATALOGUE_CACHE_TTL), and conditional
+GETs always get a full response (see `coherent`).
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter
+from typing import Any, Hashable, Protocol
+
+from .ttl import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "lepax:catalogue"
+_GENERATION_KEY = f"{_PREFIX}:generation"
+
+
+class SharedBackend(Protocol):
+    def get(self, key: str) -> Any: ...
+
+    def set(self, key: str, value: str, ex: int | None = None) -> Any: ...
+
+    def delete(self, *keys: str) -> Any: ...
+
+    def incr(self, key: str) -> int: ...
+
+
+class LocalSharedBackend:
+    """
+    In-memory stand-in for a shared cache server, with the subset of the
+    redis-py API the catalogue cache uses. Handy for tests and single-node
+    development.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ex: int | None = None) -> bool:
+        expires_at = time.monotonic() + ex if ex else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(k, None) is not None for k in keys)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            expires_at, value = self._data.get(key, (None, 0))
+            value = int(value) + 1
+            self._data[key] = (expires_at, value)
+            return value
+
+
+class CatalogueCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 30.0,
+        shared: SharedBackend | None = None,
+        generation_ttl: float = 1.0,
+    ):
+        self.ttl = ttl
+        self.enabled = ttl > 0
+        self.shared = shared
+        self.generation_ttl = generation_ttl
+
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        # scope -> [value, last shared read (monotonic), first seen (wall clock)]
+        self._generations: dict[str, list] = {}
+        self._epoch = self._new_epoch()
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _new_epoch(self) -> str:
+        # Local counters restart at 0 with the process, so versions built from
+        # them must not collide with the ones a previous process handed out
+        return "shared" if self.shared is not None else secrets.token_hex(4)
+
+    # -------------------------
+    # Configuration
+    # -------------------------
+
+    def configure(
+        self,
+        maxsize: int | None = None,
+        ttl: float | None = None,
+        shared: SharedBackend | None = None,
+    ) -> None:
+        if ttl is not None:
+            self.ttl = ttl
+            self.enabled = ttl > 0
+        self._local = TTLCache(
+            maxsize=maxsize or self._local.maxsize, ttl=self.ttl or 1
+        )
+        self.shared = shared
+        self._generations.clear()
+        self._epoch = self._new_epoch()
+        self.reset_stats()
+
+    # -------------------------
+    # Generation counters
+    # -------------------------
+
+    def _entry(self, scope: str) -> list:
+        entry = self._generations.get(scope)
+        if entry is None:
+            entry = self._generations.setdefault(scope, [0, 0.0, time.time()])
+        return entry
+
+    def _store(self, entry: list, value: int) -> None:
+        if value != entry[0]:
+            entry[0] = value
+            entry[2] = time.time()
+
+    def generation(self, scope: str = "catalogue") -> int:
+        """
+        Current generation of `scope` ("catalogue", "reviews:<id>", ...).
+        With a shared backend the value is re-read at most once per
+        `generation_ttl` seconds.
+        """
+        entry = self._entry(scope)
+        if self.shared is None:
+            return entry[0]
+
+        now = time.monotonic()
+        if now - entry[1] >= self.generation_ttl:
+            try:
+                raw = self.shared.get(f"{_GENERATION_KEY}:{scope}")
+                self._store(entry, int(raw or 0))
+            except Exception:
+                logger.warning("catalogue cache: shared backend unavailable")
+            entry[1] = now
+        return entry[0]
+
+    def bump_generation(self, scope: str = "catalogue") -> int:
+        with self._lock:
+            self._stats["generation_bumps"] += 1
+            entry = self._entry(scope)
+            if self.shared is not None:
+                try:
+                    value = int(self.shared.incr(f"{_GENERATION_KEY}:{scope}"))
+                    self._store(entry, value)
+                    entry[1] = time.monotonic()
+                    return value
+                except Exception:
+                    logger.warning("catalogue cache: shared backend unavailable")
+            self._store(entry, entry[0] + 1)
+            return entry[0]
+
+    @property
+    def coherent(self) -> bool:
+        """
+        True when generations are shared between processes. Without a shared
+        backend each worker counts on its own: a bump on one worker is never
+        seen by the others, so their versions cannot be used to answer 304s.
+        """
+        return self.shared is not None
+
+    def version(self, scope: str = "catalogue") -> str:
+        """Opaque token that changes whenever `scope` is bumped (for ETags)."""
+        return f"{self._epoch}.{self.generation(scope)}"
+
+    def changed_at(self, scope: str = "catalogue") -> float:
+        """Wall-clock time this process first saw the current generation."""
+        self.generation(scope)
+        return self._entry(scope)[2]
+
+    # -------------------------
+    # Entries
+    # -------------------------
+
+    def _key(self, namespace: str, key: Hashable) -> str:
+        if namespace == "product":
+            return f"{_PREFIX}:product:{key}"
+        generations = f"{self.generation()}.{self.generation('stock')}"
+        return f"{_PREFIX}:{namespace}:{generations}:{json.dumps(key)}"
+
+    def get(self, namespace: str, key: Hashable) -> Any:
+        if not self.enabled:
+            return None
+
+        full_key = self._key(namespace, key)
+        value = self._local.get(full_key)
+
+        if value is None and self.shared is not None:
+            try:
+                raw = self.shared.get(full_key)
+            except Exception:
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._local.set(full_key, value)
+
+        self._count(namespace, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, namespace: str, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        full_key = self._key(namespace, key)
+        self._local.set(full_key, value)
+
+        if self.shared is not None:
+            try:
+                self.shared.set(full_key, json.dumps(value), ex=int(self.ttl) or 1)
+            except Exception:
+                logger.warning("catalogue cache: shared backend unavailable")
+
+    def invalidate_product(self, product_id: int) -> None:
+        full_key = self._key("product", product_id)
+        self._local.delete(full_key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(full_key)
+            except Exception:
+                logger.warning("catalogue cache: shared backend unavailable")
+        self._count("product", "invalidations")
+
+    def product_changed(self, product_id: int | None = None) -> None:
+        """Call after any committed catalogue write."""
+        if product_id is not None:
+            self.invalidate_product(product_id)
+        self.bump_generation()
+
+    def stock_changed(self) -> None:
+        """Call after any committed change to variant stock."""
+        self.bump_generation("stock")
+
+    # -------------------------
+    # Metrics
+    # -------------------------
+
+    def _count(self, namespace: str, what: str) -> None:
+        with self._lock:
+            self._stats[f"{namespace}.{what}"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._stats)
+
+        namespaces = sorted({k.split(".")[0] for k in counters if "." in k})
+        per_namespace = {}
+        for ns in namespaces:
+            hits = counters.get(f"{ns}.hits", 0)
+            misses = counters.get(f"{ns}.misses", 0)
+            per_namespace[ns] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+                "invalidations": counters.get(f"{ns}.invalidations", 0),
+            }
+
+        return {
+            "enabled": self.enabled,
+            "shared_backend": type(self.shared).__name__ if self.shared else None,
+            "generation": self.generation(),
+            "generation_bumps": counters.get("generation_bumps", 0),
+            "local_entries": len(self._local),
+            "namespaces": per_namespace,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+catalogue_cache = CatalogueCache()
+
+
+def init_catalogue_cache() -> None:
+    """
+    Configure the process-wide catalogue cache from the environment:
+
+        CATALOGUE_CACHE_TTL        seconds, 0 disables caching (default 30)
+        CATALOGUE_CACHE_SIZE       max local entries (default 1024)
+        CATALOGUE_CACHE_REDIS_URL  optional shared backend (needs `redis`)
+    """
+    ttl = float(os.getenv("CATALOGUE_CACHE_TTL", "30"))
+    maxsize = int(os.getenv("CATALOGUE_CACHE_SIZE", "1024"))
+
+    shared = None
+    redis_url = os.getenv("CATALOGUE_CACHE_REDIS_URL")
+    if redis_url:
+        try:
+            import redis  # optional dependency
+        except ImportError:
+            logger.warning(
+                "CATALOGUE_CACHE_REDIS_URL is set but the redis package is not "
+                "installed; using the local cache only"
+            )
+        else:
+            shared = redis.Redis.from_url(redis_url, socket_timeout=0.25)
+
+    catalogue_cache.configure(maxsize=maxsize, ttl=ttl, shared=shared)
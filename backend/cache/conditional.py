@@ -0,0 +1,78 @@
+"""
+Conditional GET helpers (ETag / Last-Modified).
+
+ETags are derived from version counters kept by the catalogue cache, so a
+handler can answer If-None-Match with 304 before it opens a DB session.
+That needs the counters to be shared by every worker, i.e. the catalogue
+cache's shared backend (CATALOGUE_CACHE_REDIS_URL); without it responses
+still carry validators but are always sent in full.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+from .catalogue import catalogue_cache
+
+
+def etag_for(scopes: tuple[str, ...], *parts: object) -> str:
+    """
+    Strong ETag for a response that depends on the given version scopes
+    plus request specific parts (path, normalised args, user id...).
+    """
+    versions = [catalogue_cache.version(scope) for scope in scopes]
+    raw = "|".join([*versions, *(str(p) for p in parts)])
+    return hashlib.sha1(raw.encode()).hexdigest()[:32]
+
+
+def last_modified_for(scopes: tuple[str, ...]) -> datetime:
+    changed = max(catalogue_cache.changed_at(scope) for scope in scopes)
+    return datetime.fromtimestamp(int(changed), tz=timezone.utc)
+
+
+def not_modified(
+    etag: str,
+    last_modified: datetime | None = None,
+    private: bool = False,
+) -> Response | None:
+    """
+    Return a 304 if the client's validators still match, otherwise None.
+    If-None-Match wins over If-Modified-Since when both are sent (RFC 9110).
+    Never 304s when the version counters are per process: another worker may
+    have bumped them without this one knowing.
+    """
+    if not catalogue_cache.coherent:
+        return None
+
+    if request.if_none_match:
+        if request.if_none_match.contains(etag):
+            return _not_modified_response(etag, last_modified, private)
+        return None
+
+    if last_modified is not None and request.if_modified_since is not None:
+        if last_modified <= request.if_modified_since:
+            return _not_modified_response(etag, last_modified, private)
+
+    return None
+
+
+def add_validators(
+    response: Response,
+    etag: str,
+    last_modified: datetime | None = None,
+    private: bool = False,
+) -> Response:
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+
+def _not_modified_response(
+    etag: str, last_modified: datetime | None, private: bool
+) -> Response:
+    response = Response(status=304)
+    return add_validators(response, etag, last_modified, private)
@@ -0,0 +1,338 @@
+"""
+In-memory price/stock snapshot shared by the cart quote endpoint and checkout.
+
+Holds only what pricing needs: name, price, currency and the active flag per
+product, and product id and stock per variant. The first refresh loads every
+row; later ones re-read only rows whose updated_at moved since the previous
+refresh (minus an overlap, so rows from transactions that committed late are
+not missed) and fall back to a full reload when the row count or the sum
+of ids stops matching the table, which is how deletes are noticed (the
+sum also catches a delete paired with an insert the delta did not see).
+
+Checkout uses the snapshot like quotes do, within max_age, but checks the
+lines it is about to order against the database (price_lines with a
+session): orders are always charged the product's current price, a product
+deleted in the meantime is a clean 400 rather than a foreign key error, and
+a line can never skip stock tracking because the snapshot has not seen the
+product's variants yet.
+
+Stock here is advisory. Checkout still takes it with the conditional UPDATE
+in backend.security.inventory, which is what prevents overselling.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import func, select
+
+from backend.models.models import Product, Variant, now
+
+# Quotes and checkout reuse a snapshot this recent (seconds)
+PRICE_SNAPSHOT_MAX_AGE = float(os.getenv("PRICE_SNAPSHOT_MAX_AGE", "2"))
+PRICE_SNAPSHOT_OVERLAP = timedelta(
+    seconds=float(os.getenv("PRICE_SNAPSHOT_OVERLAP", "5"))
+)
+
+
+def parse_lines(items, qty_field: str = "qty") -> list[dict]:
+    """
+    Turn the client's items into {product_id, variant_id, qty} lines.
+    Raises ValueError with a client-facing message.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("No items supplied")
+
+    lines = []
+    for raw in items:
+        try:
+            line = {
+                "product_id": int(raw["product_id"]),
+                "variant_id": (
+                    int(raw["variant_id"]) if raw.get("variant_id") is not None else None
+                ),
+                "qty": int(raw.get(qty_field, 1)),
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError("Invalid items") from None
+
+        if line["qty"] < 1:
+            raise ValueError("Quantity must be at least 1")
+        lines.append(line)
+    return lines
+
+
+class ProductPrice(NamedTuple):
+    name: str
+    price_cents: int
+    currency: str
+    active: bool
+
+
+class VariantStock(NamedTuple):
+    product_id: int
+    stock: int
+
+
+def _checksum(db, model) -> tuple[int, int]:
+    """(row count, sum of ids) of a table."""
+    count, total = db.execute(
+        select(func.count(), func.coalesce(func.sum(model.id), 0))
+    ).one()
+    return count, int(total)
+
+
+def _checksum_of(rows: dict) -> tuple[int, int]:
+    return len(rows), sum(rows)
+
+
+class PriceSnapshot:
+    def __init__(
+        self,
+        max_age: float = PRICE_SNAPSHOT_MAX_AGE,
+        overlap: timedelta = PRICE_SNAPSHOT_OVERLAP,
+    ):
+        self.max_age = max_age
+        self.overlap = overlap
+
+        self.products: dict[int, ProductPrice] = {}
+        self.variants: dict[int, VariantStock] = {}
+        self._variants_by_product: dict[int, list[int]] = {}
+        self._watermark: datetime | None = None
+        self._checked = 0.0
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Refresh
+    # -------------------------
+
+    def refresh(self, db, force: bool = False) -> None:
+        """
+        Bring the snapshot up to date using `db`. Without `force` this is a
+        no-op when the last refresh is younger than max_age.
+        """
+        if not force and time.monotonic() - self._checked < self.max_age:
+            return
+
+        with self._lock:
+            if not force and time.monotonic() - self._checked < self.max_age:
+                return
+            started = now()
+            if self._watermark is None:
+                self._load_all(db)
+            else:
+                self._load_changes(db, self._watermark - self.overlap)
+            self._watermark = started
+            self._checked = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.products = {}
+            self.variants = {}
+            self._variants_by_product = {}
+            self._watermark = None
+            self._checked = 0.0
+            self._stats.clear()
+
+    def _product_rows(self, db, since: datetime | None = None):
+        stmt = select(
+            Product.id, Product.name, Product.price_cents, Product.currency, Product.active
+        )
+        if since is not None:
+            stmt = stmt.where(Product.updated_at >= since)
+        for row in db.execute(stmt):
+            yield row.id, ProductPrice(
+                row.name, row.price_cents, row.currency, bool(row.active)
+            )
+
+    def _variant_rows(self, db, since: datetime | None = None):
+        stmt = select(Variant.id, Variant.product_id, Variant.stock)
+        if since is not None:
+            stmt = stmt.where(Variant.updated_at >= since)
+        for row in db.execute(stmt):
+            yield row.id, VariantStock(row.product_id, row.stock)
+
+    @staticmethod
+    def _index_variants(variants: dict[int, VariantStock]) -> dict[int, list[int]]:
+        by_product: dict[int, list[int]] = {}
+        for variant_id, entry in sorted(variants.items()):
+            by_product.setdefault(entry.product_id, []).append(variant_id)
+        return by_product
+
+    def _publish(self, products: dict, variants: dict, by_product: dict) -> None:
+        # quote() runs without the lock. Swapping in new dicts means it never
+        # sees a half-applied load. Products go last, so a product it can see
+        # always has its variants indexed.
+        self.variants = variants
+        self._variants_by_product = by_product
+        self.products = products
+
+    def _load_all(self, db) -> None:
+        variants = dict(self._variant_rows(db))
+        self._publish(
+            dict(self._product_rows(db)), variants, self._index_variants(variants)
+        )
+        self._stats["full_loads"] += 1
+
+    def _load_changes(self, db, since: datetime) -> None:
+        changed_products = dict(self._product_rows(db, since))
+        changed_variants = dict(self._variant_rows(db, since))
+        products = {**self.products, **changed_products}
+        variants = {**self.variants, **changed_variants}
+
+        if (
+            _checksum(db, Product) != _checksum_of(products)
+            or _checksum(db, Variant) != _checksum_of(variants)
+        ):
+            # Something was deleted; deltas cannot see that
+            self._load_all(db)
+            return
+
+        moved = any(
+            self.variants.get(variant_id, (None,))[0] != entry.product_id
+            for variant_id, entry in changed_variants.items()
+        )
+        by_product = (
+            self._index_variants(variants) if moved else self._variants_by_product
+        )
+        self._publish(products, variants, by_product)
+        self._stats["delta_loads"] += 1
+        self._stats["delta_rows"] += len(changed_products) + len(changed_variants)
+
+    # -------------------------
+    # Pricing
+    # -------------------------
+
+    def quote(self, lines: list[dict]) -> list[dict]:
+        """
+        Price {product_id, variant_id, qty} lines. Every line comes back with
+        available and, when it cannot be bought, an error; nothing raises.
+        variant_id is filled in when the product has exactly one variant.
+        """
+        quoted = []
+        for line in lines:
+            product_id = line["product_id"]
+            variant_id = line.get("variant_id")
+            qty = line["qty"]
+            item = {"product_id": product_id, "variant_id": variant_id, "qty": qty}
+            quoted.append(item)
+
+            product = self.products.get(product_id)
+            if product is None or not product.active:
+                item.update(available=False, error=f"unknown product {product_id}")
+                continue
+
+            options = self._variants_by_product.get(product_id, [])
+            if variant_id is None:
+                if len(options) > 1:
+                    item.update(
+                        available=False,
+                        error=f"variant_id is required for product {product_id}",
+                    )
+                    continue
+                variant_id = item["variant_id"] = options[0] if options else None
+            elif variant_id not in options:
+                item.update(
+                    available=False,
+                    error=f"variant {variant_id} does not belong to product {product_id}",
+                )
+                continue
+
+            # Products without variants are not stock-tracked
+            stock = self.variants[variant_id].stock if variant_id is not None else None
+            item.update(
+                name=product.name,
+                unit_price_cents=product.price_cents,
+                currency=product.currency,
+                line_total_cents=product.price_cents * qty,
+                stock=stock,
+                available=stock is None or stock >= qty,
+            )
+            if not item["available"]:
+                item["error"] = "not enough stock"
+        return quoted
+
+    def price_lines(self, lines: list[dict], db=None) -> list[dict]:
+        """
+        Like quote(), for checkout: raises ValueError with a client-facing
+        message if a line names an unknown product or variant. Stock is
+        left to reserve_stock().
+
+        With `db`, the result is checked against the database, since the
+        snapshot may not have seen the latest writes yet. If it is behind, the
+        lines are priced again after a forced refresh.
+        """
+        quoted = self.quote(lines)
+        if db is not None and self._behind(db, quoted):
+            self.refresh(db, force=True)
+            quoted = self.quote(lines)
+            if self._behind(db, quoted):
+                # A change the delta could not see (e.g. a price written
+                # without moving updated_at): reload everything
+                with self._lock:
+                    self._load_all(db)
+                quoted = self.quote(lines)
+                if self._behind(db, quoted) and all(
+                    "unit_price_cents" in i for i in quoted
+                ):
+                    raise ValueError("products changed, please try again")
+        for item in quoted:
+            if "unit_price_cents" not in item:
+                raise ValueError(item["error"])
+        return quoted
+
+    @staticmethod
+    def _behind(db, quoted: list[dict]) -> bool:
+        """
+        True if a line could not be priced (the product may be newer than the
+        snapshot), names a product that is gone or inactive, was priced with
+        a price or currency the product no longer has, or has no variant
+        although the product now has some (it would escape stock tracking).
+        """
+        if any("unit_price_cents" not in item for item in quoted):
+            return True
+
+        wanted = {item["product_id"] for item in quoted}
+        current = {
+            row.id: (row.price_cents, row.currency)
+            for row in db.execute(
+                select(Product.id, Product.price_cents, Product.currency).where(
+                    Product.id.in_(wanted), Product.active
+                )
+            )
+        }
+        if any(
+            current.get(item["product_id"])
+            != (item["unit_price_cents"], item["currency"])
+            for item in quoted
+        ):
+            return True
+
+        untracked = {i["product_id"] for i in quoted if i["variant_id"] is None}
+        if untracked:
+            tracked = db.execute(
+                select(Variant.id).where(Variant.product_id.in_(untracked)).limit(1)
+            ).first()
+            return tracked is not None
+        return False
+
+    # -------------------------
+    # Metrics
+    # -------------------------
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self.products),
+            "variants": len(self.variants),
+            "age_seconds": (
+                round(time.monotonic() - self._checked, 3) if self._checked else None
+            ),
+            **self._stats,
+        }
+
+
+price_snapshot = PriceSnapshot()
@@ -1,12 +1,14 @@
 # backend/db/bootstrap.py
 
-from sqlalchemy import inspect
+from sqlalchemy import inspect, text
 
 from backend.db.database import engine, SessionLocal
+from backend.db.fts import ensure_products_search
 from backend.models import models as m
 from backend.models.models import User, Product
 from backend.scripts.seed_users import seed as seed_users
 from backend.scripts.seed_products import seed_products
+from backend.security.review_stats import recompute as recompute_review_stats
 
 
 def normalise_roles() -> None:
@@ -39,6 +41,48 @@ def normalise_roles() -> None:
             db.commit()
 
 
+def add_missing_columns() -> set[tuple[str, str]]:
+    """
+    Development only: keeps the local SQLite database that create_all
+    builds in step with the models. create_all only creates missing
+    tables, so this adds the columns newer models gained to tables that
+    already exist (nullable ones, or NOT NULL ones with a server default)
+    and their missing indexes. Returns the (table, column) pairs it added.
+
+    It is not a migrator: any other database is left alone and must be
+    upgraded with the alembic migrations, which remain the schema's
+    source of truth.
+    """
+    if engine.dialect.name != "sqlite":
+        return set()
+
+    added = set()
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for table in m.Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+                if not column.nullable:
+                    if column.server_default is None:
+                        continue
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                added.add((table.name, column.name))
+
+            present_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in present_indexes:
+                    index.create(bind=conn)
+    return added
+
+
 def bootstrap_db_once() -> None:
     """
     Create tables if needed and seed initial data, but only
@@ -49,6 +93,17 @@ def bootstrap_db_once() -> None:
 
     # Ensure tables exist
     m.Base.metadata.create_all(bind=engine)
+    # Dev SQLite only; other databases are migrated with alembic
+    added = add_missing_columns()
+
+    # New review aggregate columns start at 0, fill them from existing reviews
+    if ("products", "rating_count") in added:
+        with SessionLocal() as db:
+            recompute_review_stats(db)
+            db.commit()
+
+    # The search index is not part of the models, create_all does not know about it
+    ensure_products_search(engine)
 
     # Run role normalisation on every startup
     normalise_roles()
@@ -1,29 +1,175 @@
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
 from pathlib import Path
 
+from flask import has_request_context, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+
+from backend.config import DATABASE_READ_URL, DATABASE_URL
+
 BACKEND_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = BACKEND_DIR / "lepax.db"
-DB_URL = f"sqlite:///{DB_PATH}"
+DB_URL = DATABASE_URL
 
-connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    DB_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,
-    future=True,
-)
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes")
+
 
-if DB_URL.startswith("sqlite"):
+# -------------------------
+# Connection profile
+# -------------------------
 
+# Applied to every new SQLite connection. WAL + synchronous=NORMAL is durable
+# against application crashes and only risks the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "foreign_keys": "ON",
+    "journal_mode": "WAL",
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # negative = KiB, so -65536 is a 64 MiB page cache per connection
+    "cache_size": _env_int("SQLITE_CACHE_SIZE", -65536),
+    "mmap_size": _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+}
+
+# Pool sizing and health checks. pre_ping costs a round trip per checkout,
+# which buys nothing for a local SQLite file, so it is off by default;
+# on a networked database prefer DB_POOL_RECYCLE or turn it on.
+POOL_SETTINGS = {
+    "pool_size": _env_int("DB_POOL_SIZE", 10),
+    "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+    "read_pool_size": _env_int("DB_READ_POOL_SIZE", 8),
+    "read_max_overflow": _env_int("DB_READ_MAX_OVERFLOW", 4),
+    "write_pool_size": _env_int("DB_WRITE_POOL_SIZE", 1),
+    "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+    "pool_recycle": _env_int("DB_POOL_RECYCLE", -1),
+    "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", False),
+}
+
+
+def _apply_pragmas(engine: Engine, read_only: bool) -> None:
     @event.listens_for(engine, "connect")
     def _sqlite_pragmas(dbapi_conn, _):
         cur = dbapi_conn.cursor()
-        cur.execute("PRAGMA foreign_keys = ON;")
-        cur.execute("PRAGMA journal_mode = WAL;")
+        for name, value in SQLITE_PRAGMAS.items():
+            cur.execute(f"PRAGMA {name} = {value};")
+        if read_only:
+            cur.execute("PRAGMA query_only = ON;")
         cur.close()
 
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def make_engines(url: str = DB_URL, read_url: str = "") -> tuple[Engine, Engine]:
+    """
+    Build the (writer, reader) engine pair for DATABASE_URL.
+
+    For SQLite the writer pool holds a single connection, so app writes queue
+    in the pool instead of fighting over the database lock, while readers
+    use their own pool and, thanks to WAL, never wait for the writer.
+    A POST handler holds that connection from its first statement until it
+    commits, so slow work that needs no database (password hashing, SMTP,
+    HTTP calls) belongs before the first query or after the commit.
+    Server databases get one regular pool, plus a second one when a
+    read replica URL is configured.
+    """
+    common = {
+        "pool_timeout": POOL_SETTINGS["pool_timeout"],
+        "pool_recycle": POOL_SETTINGS["pool_recycle"],
+        "pool_pre_ping": POOL_SETTINGS["pool_pre_ping"],
+        "future": True,
+    }
+
+    if not url.startswith("sqlite"):
+        pool = {
+            "pool_size": POOL_SETTINGS["pool_size"],
+            "max_overflow": POOL_SETTINGS["max_overflow"],
+        }
+        writer = create_engine(url, **pool, **common)
+        reader = create_engine(read_url, **pool, **common) if read_url else writer
+        return writer, reader
+
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+    }
+
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=POOL_SETTINGS["write_pool_size"],
+        max_overflow=0,
+        **common,
+    )
+    reader = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=POOL_SETTINGS["read_pool_size"],
+        max_overflow=POOL_SETTINGS["read_max_overflow"],
+        **common,
+    )
+
+    _apply_pragmas(writer, read_only=False)
+    _apply_pragmas(reader, read_only=True)
+    return writer, reader
+
+
+# -------------------------
+# Sessions
+# -------------------------
+
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RoutingSession(Session):
+    """
+    Sends statements issued while handling GET/HEAD requests (or inside a
+    read_only endpoint) to the read-only engine; everything else, and any
+    flush or DML, goes to the writer.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        writes = self._flushing or isinstance(clause, UpdateBase)
+        if writes and self.info.get("read_only"):
+            raise RuntimeError("write attempted in a read-only endpoint")
+
+        read_bind = self.info.get("read_bind")
+        if read_bind is not None and not writes and self._reads_from_replica():
+            return read_bind
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def _reads_from_replica(self) -> bool:
+        if self.info.get("read_only"):
+            return True
+        return has_request_context() and request.method in _READ_METHODS
+
+
+engine, read_engine = make_engines(DB_URL, DATABASE_READ_URL)
+
+SessionLocal = sessionmaker(
+    bind=engine,
+    class_=RoutingSession,
+    autoflush=False,
+    autocommit=False,
+    future=True,
+    info={"read_bind": read_engine},
+)
 Base = declarative_base()
+
+
+def dialect_name() -> str:
+    """'sqlite' or 'postgresql', for the few queries that differ."""
+    return engine.dialect.name
+
+
+def init_engines(url: str, read_url: str = "") -> None:
+    """Point the app at another database (tests, scripts)."""
+    global engine, read_engine
+
+    engine, read_engine = make_engines(url, read_url)
+    SessionLocal.configure(bind=engine, info={"read_bind": read_engine})
@@ -0,0 +1,119 @@
+# backend/db/fts.py
+
+"""
+Full-text index over the products table: FTS5 on SQLite, a generated
+tsvector column with a GIN index on PostgreSQL.
+
+The alembic migrations create the same objects; this module exists so that a
+database created through ``Base.metadata.create_all`` (fresh installs, tests)
+still gets a working search index.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+FTS_COLUMNS = ("name", "brand", "category", "description_md")
+
+_COLS = ", ".join(FTS_COLUMNS)
+_NEW = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_OLD = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+PRODUCTS_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE products_fts USING fts5(
+        {_COLS},
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # External content tables must be told the *old* values on delete,
+    # a plain DELETE/UPDATE would leave stale terms in the index.
+    f"""
+    CREATE TRIGGER products_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, {_COLS})
+        VALUES (new.id, {_NEW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER products_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, {_COLS})
+        VALUES ('delete', old.id, {_OLD});
+    END
+    """,
+    # Only re-index when an indexed column changes (not on price/stock edits)
+    f"""
+    CREATE TRIGGER products_au AFTER UPDATE OF {_COLS} ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, {_COLS})
+        VALUES ('delete', old.id, {_OLD});
+        INSERT INTO products_fts(rowid, {_COLS})
+        VALUES (new.id, {_NEW});
+    END
+    """,
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+DROP_PRODUCTS_FTS = [
+    "DROP TRIGGER IF EXISTS products_ad",
+    "DROP TRIGGER IF EXISTS products_au",
+    "DROP TRIGGER IF EXISTS products_ai",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+
+# Postgres: weights A-D mirror the bm25() weights used on SQLite.
+# 'simple' keeps brand names and sizes as-is instead of stemming them.
+PG_SEARCH_CONFIG = "simple"
+
+_PG_VECTOR = " || ".join(
+    f"setweight(to_tsvector('{PG_SEARCH_CONFIG}', coalesce({col}, '')), '{weight}')"
+    for col, weight in zip(FTS_COLUMNS, "ABCD")
+)
+
+PRODUCTS_TSV_DDL = [
+    f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS ({_PG_VECTOR}) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_tsv ON products USING GIN (search_tsv)",
+]
+
+DROP_PRODUCTS_TSV = [
+    "DROP INDEX IF EXISTS ix_products_search_tsv",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_tsv",
+]
+
+
+def ensure_products_search(engine: Engine) -> None:
+    """Create the search index that matches the engine's dialect."""
+    if engine.dialect.name == "postgresql":
+        ensure_products_tsv(engine)
+    else:
+        ensure_products_fts(engine)
+
+
+def ensure_products_tsv(engine: Engine) -> None:
+    """Add the products.search_tsv column and its GIN index (idempotent)."""
+    with engine.begin() as conn:
+        for stmt in PRODUCTS_TSV_DDL:
+            conn.execute(text(stmt))
+
+
+def ensure_products_fts(engine: Engine) -> None:
+    """
+    Create (or upgrade) the products_fts index if it is missing or was
+    built without the description column. Safe to run on every startup.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        cols = {
+            row[1]
+            for row in conn.execute(text("PRAGMA table_info(products_fts)"))
+        }
+        if set(FTS_COLUMNS) <= cols:
+            return
+
+        for stmt in DROP_PRODUCTS_FTS + PRODUCTS_FTS_DDL:
+            conn.execute(text(stmt))
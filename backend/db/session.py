@@ -0,0 +1,102 @@
+# backend/db/session.py
+
+"""
+One SQLAlchemy session per request.
+
+get_db() lazily opens a session on the current app context and every caller
+in the same request (load_user, the handler, helpers) gets that same
+session back. It is closed in teardown_appcontext, rolling back anything
+left uncommitted, so handlers no longer open and close their own.
+
+Background threads and scripts have no app context and keep using
+SessionLocal() directly.
+"""
+
+from functools import wraps
+
+from flask import g
+from sqlalchemy.orm import Session
+
+from backend.db.database import SessionLocal
+
+
+def get_db() -> Session:
+    """The session for the current request, opened on first use."""
+    db = g.get("db")
+    if db is None:
+        db = g.db = SessionLocal()
+    return db
+
+
+def release_connection() -> None:
+    """
+    End the current (read) transaction so the pooled connection goes back
+    early. Loaded objects are kept; the session reconnects on next use.
+    """
+    db = g.get("db")
+    if db is not None:
+        db.rollback()
+
+
+def close_db(exc: BaseException | None = None) -> None:
+    db = g.pop("db", None)
+    if db is None:
+        return
+    try:
+        # Anything the handler did not commit is discarded
+        db.rollback()
+    finally:
+        db.close()
+
+
+def init_db_session(app) -> None:
+    app.teardown_appcontext(close_db)
+
+
+def _status_of(result) -> int:
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], int):
+        return result[1]
+    return getattr(result, "status_code", 200)
+
+
+def read_only(view):
+    """
+    For endpoints that only read: statements go to the read engine even on
+    POST, and any accidental flush fails instead of writing.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db = get_db()
+        db.info["read_only"] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.info["read_only"] = False
+            db.rollback()
+
+    return wrapper
+
+
+def transactional(view):
+    """
+    Commit the request session when the view returns a success status,
+    roll back on an error status or an exception.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db = get_db()
+        try:
+            result = view(*args, **kwargs)
+        except Exception:
+            db.rollback()
+            raise
+
+        if _status_of(result) < 400:
+            db.commit()
+        else:
+            db.rollback()
+        return result
+
+    return wrapper
@@ -15,6 +15,11 @@ from .models import (
     ViewEvent,
     InteractionEvent,
     AuditLog,
+    AnalyticsRollup,
+    AnalyticsSessionBucket,
+    AnalyticsRollupState,
+    IdempotencyKey,
+    StripeEvent,
 )
 
 __all__ = [
@@ -33,4 +38,9 @@ __all__ = [
     "ViewEvent",
     "InteractionEvent",
     "AuditLog",
+    "AnalyticsRollup",
+    "AnalyticsSessionBucket",
+    "AnalyticsRollupState",
+    "IdempotencyKey",
+    "StripeEvent",
 ]
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Boolean,
     CheckConstraint,
     ForeignKey,
+    Index,
     JSON,
     UniqueConstraint,
 )
@@ -80,6 +81,27 @@ class Product(Base):
     seo_slug: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
     hero_image_url: Mapped[str | None] = mapped_column(String(500))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+    # Drives incremental refreshes of the in-memory price snapshot
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=now, onupdate=now, index=True
+    )
+
+    # Review aggregates, maintained with the reviews (backend.security.review_stats)
+    rating_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    rating_sum: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    rating_1: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_2: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_3: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_4: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_5: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Average rating x 100, rounded: an integer key for sort=rating keyset paging
+    rating_avg_x100: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
     images: Mapped[list["ProductImage"]] = relationship(
         back_populates="product", cascade="all, delete-orphan"
@@ -88,6 +110,13 @@ class Product(Base):
         back_populates="product", cascade="all, delete-orphan"
     )
 
+    # Match the listing ORDER BYs so keyset pages are index range scans
+    __table_args__ = (
+        Index("ix_products_active_created_at", "active", "created_at", "id"),
+        Index("ix_products_active_price_cents", "active", "price_cents", "id"),
+        Index("ix_products_active_rating", "active", "rating_avg_x100", "id"),
+    )
+
 
 class ProductImage(Base):
     __tablename__ = "product_images"
@@ -109,6 +138,10 @@ class Variant(Base):
     size: Mapped[str | None] = mapped_column(String(40))
     colour: Mapped[str | None] = mapped_column(String(80))
     stock: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Also set by the raw stock UPDATEs in backend.security.inventory
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=now, onupdate=now, index=True
+    )
     product: Mapped[Product] = relationship(back_populates="variants")
 
 
@@ -122,14 +155,19 @@ class Order(Base):
     currency: Mapped[str] = mapped_column(String(10), nullable=False, default="£")
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="created")
     payment_provider: Mapped[str | None] = mapped_column(String(40))
-    provider_ref: Mapped[str | None] = mapped_column(String(120))
+    # Webhook events find their order by PaymentIntent id
+    provider_ref: Mapped[str | None] = mapped_column(String(120), index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+    # Stock is held for unpaid ('created') orders until then, see inventory.py
+    reserved_until: Mapped[datetime | None] = mapped_column(DateTime)
 
     __table_args__ = (
         CheckConstraint(
             "status in ('created','paid','fulfilled','refunded','cancelled')",
             name="orders_status_check",
         ),
+        # The reservation sweeper scans created orders by expiry
+        Index("ix_orders_status_reserved_until", "status", "reserved_until"),
     )
 
 
@@ -163,6 +201,8 @@ class Review(Base):
     __table_args__ = (
         CheckConstraint("rating >= 1 and rating <= 5", name="reviews_rating_check"),
         UniqueConstraint("product_id", "user_id", name="one_review_per_buyer"),
+        # Newest-first paging of a product's reviews on (created_at, id)
+        Index("ix_reviews_product_id_created_at", "product_id", "created_at", "id"),
     )
 
 
@@ -211,6 +251,12 @@ class ViewEvent(Base):
     user_agent: Mapped[str | None] = mapped_column(String(300))
     occurred_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
 
+    __table_args__ = (
+        Index("ix_view_events_occurred_at", "occurred_at"),
+        Index("ix_view_events_session_occurred", "session_id", "occurred_at"),
+        Index("ix_view_events_product_occurred", "product_id", "occurred_at"),
+    )
+
 
 class InteractionEvent(Base):
     __tablename__ = "interaction_events"
@@ -221,6 +267,12 @@ class InteractionEvent(Base):
     event_data: Mapped[dict | None] = mapped_column(JSON)
     occurred_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
 
+    __table_args__ = (
+        Index("ix_interaction_events_occurred_at", "occurred_at"),
+        Index("ix_interaction_events_type_occurred", "event_type", "occurred_at"),
+        Index("ix_interaction_events_session_occurred", "session_id", "occurred_at"),
+    )
+
 
 class AuditLog(Base):
     __tablename__ = "audit_log"
@@ -232,3 +284,106 @@ class AuditLog(Base):
     # rename the attribute, keep the column name "metadata"
     meta: Mapped[dict | None] = mapped_column("metadata", JSON)
     occurred_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+
+
+class AnalyticsRollup(Base):
+    """Pre-aggregated event counts per hour/day bucket and dimension."""
+
+    __tablename__ = "analytics_rollups"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    granularity: Mapped[str] = mapped_column(String(8), nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # views, sessions, path, product, event_type
+    dimension: Mapped[str] = mapped_column(String(20), nullable=False)
+    key: Mapped[str] = mapped_column(String(500), nullable=False, default="")
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        CheckConstraint(
+            "granularity in ('hour','day')", name="analytics_rollups_granularity_check"
+        ),
+        UniqueConstraint(
+            "granularity", "bucket_start", "dimension", "key", name="uq_rollup_bucket"
+        ),
+        Index("ix_rollups_dimension_bucket", "granularity", "dimension", "bucket_start"),
+    )
+
+
+class AnalyticsSessionBucket(Base):
+    """Sessions already counted in a bucket, so unique sessions stay exact."""
+
+    __tablename__ = "analytics_session_buckets"
+    granularity: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    session_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+
+class AnalyticsRollupState(Base):
+    """Watermark: highest raw event id already folded into the rollups."""
+
+    __tablename__ = "analytics_rollup_state"
+    source: Mapped[str] = mapped_column(String(40), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # When the id right after the watermark was first found missing
+    gap_seen_at: Mapped[datetime | None] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a POST sent with an Idempotency-Key header, replayed when the
+    same user retries the same request with the same key.
+    """
+
+    __tablename__ = "idempotency_keys"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    endpoint: Mapped[str] = mapped_column(String(120), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    # sha256 of the canonical request body, a reused key must match it
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="in_progress")
+    response_status: Mapped[int | None] = mapped_column(Integer)
+    response_body: Mapped[str | None] = mapped_column(Text)
+    response_mimetype: Mapped[str | None] = mapped_column(String(80))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "status in ('in_progress','done')", name="idempotency_keys_status_check"
+        ),
+        UniqueConstraint("user_id", "endpoint", "key", name="uq_idempotency_key"),
+    )
+
+
+class StripeEvent(Base):
+    """
+    Inbox of verified Stripe webhook events, applied by a background worker.
+    The primary key is Stripe's event id, so redeliveries are ignored.
+    """
+
+    __tablename__ = "stripe_events"
+    id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    type: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # When the event is next due; while 'processing' this is the lease expiry
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, default=now, nullable=False
+    )
+    last_error: Mapped[str | None] = mapped_column(Text)
+    received_at: Mapped[datetime] = mapped_column(DateTime, default=now, nullable=False)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime)
+
+    __table_args__ = (
+        CheckConstraint(
+            "status in ('pending','processing','done','failed')",
+            name="stripe_events_status_check",
+        ),
+        # Workers pick the next due event
+        Index("ix_stripe_events_status_next_attempt_at", "status", "next_attempt_at"),
+    )
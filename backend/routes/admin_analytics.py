@@ -1,8 +1,19 @@
+from datetime import datetime, timedelta
+
 from flask import Blueprint, jsonify, request
-from sqlalchemy import desc
+from sqlalchemy import desc, func, select
 
-from backend.db.database import SessionLocal
-from backend.models.models import ViewEvent, InteractionEvent
+from backend.db.session import get_db, read_only
+from backend.models.models import (
+    ViewEvent,
+    InteractionEvent,
+    AnalyticsRollup,
+    AnalyticsRollupState,
+    now,
+)
+from backend.routes.analytics import _parse_time
+from backend.security.analytics_rollup import bucket_start, run_rollup
+from backend.security.event_writer import event_writer
 from backend.security.rbac import require_role
 
 bp = Blueprint("admin_analytics", __name__)
@@ -10,68 +21,196 @@ bp = Blueprint("admin_analytics", __name__)
 
 @bp.get("/api/admin/analytics/views")
 @require_role("admin")
+@read_only
 def list_view_events():
     """Recent page views."""
     limit = request.args.get("limit", 300, type=int) or 300
     limit = min(max(limit, 1), 300)
 
-    db = SessionLocal()
-    try:
-        events = (
-            db.query(ViewEvent).order_by(desc(ViewEvent.occurred_at)).limit(limit).all()
-        )
+    db = get_db()
+    events = (
+        db.query(ViewEvent).order_by(desc(ViewEvent.occurred_at)).limit(limit).all()
+    )
 
-        items = []
-        for e in events:
-            items.append(
-                {
-                    "id": e.id,
-                    "user_id": e.user_id,
-                    "session_id": getattr(e, "session_id", None),
-                    "path": e.path,
-                    "product_id": getattr(e, "product_id", None),
-                    "referrer": getattr(e, "referrer", None),
-                    "user_agent": getattr(e, "user_agent", None),
-                    "occurred_at": e.occurred_at.isoformat()
-                    if getattr(e, "occurred_at", None)
-                    else None,
-                }
-            )
-        return jsonify(items=items)
-    finally:
-        db.close()
+    items = []
+    for e in events:
+        items.append(
+            {
+                "id": e.id,
+                "user_id": e.user_id,
+                "session_id": getattr(e, "session_id", None),
+                "path": e.path,
+                "product_id": getattr(e, "product_id", None),
+                "referrer": getattr(e, "referrer", None),
+                "user_agent": getattr(e, "user_agent", None),
+                "occurred_at": e.occurred_at.isoformat()
+                if getattr(e, "occurred_at", None)
+                else None,
+            }
+        )
+    return jsonify(items=items)
 
 
 @bp.get("/api/admin/analytics/interactions")
 @require_role("admin")
+@read_only
 def list_interaction_events():
     """Recent key interactions like add_to_cart, checkout, review_submitted."""
     limit = request.args.get("limit", 300, type=int) or 300
     limit = min(max(limit, 1), 300)
 
-    db = SessionLocal()
+    db = get_db()
+    events = (
+        db.query(InteractionEvent)
+        .order_by(desc(InteractionEvent.occurred_at))
+        .limit(limit)
+        .all()
+    )
+
+    items = []
+    for e in events:
+        items.append(
+            {
+                "id": e.id,
+                "user_id": e.user_id,
+                "session_id": getattr(e, "session_id", None),
+                "action": getattr(e, "event_type", getattr(e, "action", None)),
+                "metadata": getattr(e, "event_data", getattr(e, "metadata", None)),
+                "occurred_at": e.occurred_at.isoformat()
+                if getattr(e, "occurred_at", None)
+                else None,
+            }
+        )
+    return jsonify(items=items)
+
+
+@bp.get("/api/admin/analytics/ingest")
+@require_role("admin")
+def ingest_stats():
+    """Queue depth, written and dropped counters of the event writer."""
+    return jsonify(event_writer.stats())
+
+
+# -------------------------
+# Rollup summaries (never touch the raw event tables)
+# -------------------------
+
+_SUMMARY_SERIES = ("views", "sessions", "interactions")
+_SUMMARY_TOP = ("path", "product", "event_type")
+
+
+def _summary_range() -> tuple[str, datetime, datetime]:
+    """granularity, since, until from the query string (until exclusive)."""
+    granularity = request.args.get("granularity", "day")
+    if granularity not in ("hour", "day"):
+        raise ValueError("granularity must be hour or day")
+
+    until = _parse_time("until") or now()
+    default_span = timedelta(days=7) if granularity == "day" else timedelta(hours=48)
+    since = _parse_time("since") or until - default_span
+    return granularity, bucket_start(since, granularity), until
+
+
+def _watermarks(db) -> dict:
+    return {
+        s.source: {
+            "last_event_id": s.last_event_id,
+            "updated_at": s.updated_at.isoformat() if s.updated_at else None,
+        }
+        for s in db.query(AnalyticsRollupState).all()
+    }
+
+
+@bp.get("/api/admin/analytics/summary")
+@require_role("admin")
+@read_only
+def analytics_summary():
+    """Views, unique sessions and interactions per hour/day bucket."""
     try:
-        events = (
-            db.query(InteractionEvent)
-            .order_by(desc(InteractionEvent.occurred_at))
-            .limit(limit)
-            .all()
+        granularity, since, until = _summary_range()
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    db = get_db()
+    rows = db.execute(
+        select(
+            AnalyticsRollup.bucket_start,
+            AnalyticsRollup.dimension,
+            AnalyticsRollup.count,
+        ).where(
+            AnalyticsRollup.granularity == granularity,
+            AnalyticsRollup.dimension.in_(_SUMMARY_SERIES),
+            AnalyticsRollup.bucket_start >= since,
+            AnalyticsRollup.bucket_start < until,
         )
+    ).all()
+
+    series: dict[datetime, dict] = {}
+    totals = dict.fromkeys(_SUMMARY_SERIES, 0)
+    for bucket, dimension, count in rows:
+        point = series.setdefault(bucket, dict.fromkeys(_SUMMARY_SERIES, 0))
+        point[dimension] += count
+        totals[dimension] += count
+
+    # Sessions are only unique within a bucket: one active in several
+    # buckets is counted in each, so the total is not a distinct count
+    totals["session_buckets"] = totals.pop("sessions")
+
+    return jsonify(
+        granularity=granularity,
+        since=since.isoformat(),
+        until=until.isoformat(),
+        series=[
+            {"bucket_start": bucket.isoformat(), **series[bucket]}
+            for bucket in sorted(series)
+        ],
+        totals=totals,
+        watermarks=_watermarks(db),
+    )
+
+
+@bp.get("/api/admin/analytics/summary/top")
+@require_role("admin")
+@read_only
+def analytics_summary_top():
+    """Most viewed paths / products, or most frequent interaction types."""
+    dimension = request.args.get("dimension", "path")
+    if dimension not in _SUMMARY_TOP:
+        return jsonify(error="dimension must be path, product or event_type"), 400
 
-        items = []
-        for e in events:
-            items.append(
-                {
-                    "id": e.id,
-                    "user_id": e.user_id,
-                    "session_id": getattr(e, "session_id", None),
-                    "action": getattr(e, "event_type", getattr(e, "action", None)),
-                    "metadata": getattr(e, "event_data", getattr(e, "metadata", None)),
-                    "occurred_at": e.occurred_at.isoformat()
-                    if getattr(e, "occurred_at", None)
-                    else None,
-                }
-            )
-        return jsonify(items=items)
-    finally:
-        db.close()
+    limit = min(max(request.args.get("limit", 20, type=int) or 20, 1), 100)
+
+    try:
+        granularity, since, until = _summary_range()
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    db = get_db()
+    total = func.sum(AnalyticsRollup.count).label("total")
+    rows = db.execute(
+        select(AnalyticsRollup.key, total)
+        .where(
+            AnalyticsRollup.granularity == granularity,
+            AnalyticsRollup.dimension == dimension,
+            AnalyticsRollup.bucket_start >= since,
+            AnalyticsRollup.bucket_start < until,
+        )
+        .group_by(AnalyticsRollup.key)
+        .order_by(total.desc(), AnalyticsRollup.key)
+        .limit(limit)
+    ).all()
+
+    return jsonify(
+        dimension=dimension,
+        granularity=granularity,
+        since=since.isoformat(),
+        until=until.isoformat(),
+        items=[{"key": key, "count": count} for key, count in rows],
+    )
+
+
+@bp.post("/api/admin/analytics/rollup")
+@require_role("admin")
+def trigger_rollup():
+    """Run the incremental rollup now (normally done by the cron script)."""
+    return jsonify(ok=True, processed=run_rollup())
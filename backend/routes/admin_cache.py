@@ -0,0 +1,13 @@
+from flask import Blueprint, jsonify
+
+from backend.cache import catalogue_cache, price_snapshot
+from backend.security.rbac import require_role
+
+bp = Blueprint("admin_cache", __name__)
+
+
+@bp.get("/api/admin/cache/stats")
+@require_role("admin")
+def cache_stats():
+    """Hit/miss counters for the catalogue cache and price snapshot in this process."""
+    return jsonify(catalogue=catalogue_cache.stats(), pricing=price_snapshot.stats())
@@ -1,35 +1,34 @@
 from flask import Blueprint, request, jsonify, g
-from backend.db.database import SessionLocal
+from backend.db.session import get_db, read_only
 from backend.models.models import User
+from backend.security.load_user import invalidate_user
 from backend.security.rbac import require_role
 
 bp = Blueprint("admin", __name__)
 
 @bp.get("/api/admin/users")
 @require_role("admin")
+@read_only
 def list_users():
     """
     Return a list of all users for admin.
     """
-    db = SessionLocal()
-    try:
-        users = db.query(User).all()
+    db = get_db()
+    users = db.query(User).all()
 
-        items = []
-        for u in users:
-            items.append(
-                {
-                    "id": u.id,
-                    "email": u.email,
-                    "full_name": getattr(u, "full_name", "") or "",
-                    "role": u.role,
-                    "created_at": str(getattr(u, "created_at", "")),
-                }
-            )
+    items = []
+    for u in users:
+        items.append(
+            {
+                "id": u.id,
+                "email": u.email,
+                "full_name": getattr(u, "full_name", "") or "",
+                "role": u.role,
+                "created_at": str(getattr(u, "created_at", "")),
+            }
+        )
 
-        return jsonify(items=items)
-    finally:
-        db.close()
+    return jsonify(items=items)
 
 
 @bp.patch("/api/admin/users/<int:user_id>")
@@ -45,27 +44,27 @@ def update_user(user_id: int):
     if new_role not in valid_roles:
         return jsonify(error="Invalid role"), 400
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(id=user_id).first()
-        if not user:
-            return jsonify(error="User not found"), 404
+    db = get_db()
+    user = db.query(User).filter_by(id=user_id).first()
+    if not user:
+        return jsonify(error="User not found"), 404
 
-        current = g.current_user
-        if user.id == current.id and new_role != "admin":
-            return jsonify(error="You cannot change your own admin status"), 400
+    current = g.current_user
+    if user.id == current.id and new_role != "admin":
+        return jsonify(error="You cannot change your own admin status"), 400
 
-        user.role = new_role
-        db.commit()
-        db.refresh(user)
+    user.role = new_role
+    db.commit()
+    db.refresh(user)
 
-        return jsonify(
-            ok=True,
-            user={
-                "id": user.id,
-                "email": user.email,
-                "role": user.role,
-            },
-        )
-    finally:
-        db.close()
+    # Role checks read a cached snapshot, make the change effective now
+    invalidate_user(user.id)
+
+    return jsonify(
+        ok=True,
+        user={
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+        },
+    )
@@ -1,61 +1,225 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import text
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, request, jsonify
+from sqlalchemy import JSON, DateTime, bindparam, text
 
 from backend.security.analytics import log_interaction
 from backend.db.database import SessionLocal
+from backend.db.session import get_db, read_only
 from backend.security.rbac import require_role
 
 bp = Blueprint("analytics", __name__)
 
 
+# kind -> (table, columns); explicit columns instead of SELECT *
+_EVENT_TABLES = {
+    "views": (
+        "view_events",
+        ["id", "user_id", "session_id", "path", "product_id", "referrer",
+         "user_agent", "occurred_at"],
+    ),
+    "interactions": (
+        "interaction_events",
+        ["id", "user_id", "session_id", "event_type", "event_data", "occurred_at"],
+    ),
+}
+
+_PAGE_DEFAULT = 500
+_PAGE_MAX = 5000
+_EXPORT_CHUNK = 1000
+
+
+def _parse_time(name: str) -> datetime | None:
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime") from None
+
+    # Events are stored as naive UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _events_sql(
+    kind: str,
+    since: datetime | None,
+    until: datetime | None,
+    before_id: int | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    newest_first: bool = True,
+):
+    table, columns = _EVENT_TABLES[kind]
+    where = []
+    params: dict[str, object] = {}
+
+    # occurred_at range (until is exclusive)
+    if since is not None:
+        where.append("occurred_at >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("occurred_at < :until")
+        params["until"] = until
+
+    # keyset on the primary key, never OFFSET
+    if before_id is not None:
+        where.append("id < :before_id")
+        params["before_id"] = before_id
+    if after_id is not None:
+        where.append("id > :after_id")
+        params["after_id"] = after_id
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT :limit"
+        params["limit"] = limit
+
+    sql = text(
+        f"""
+        SELECT {", ".join(columns)}
+        FROM {table}
+        {where_sql}
+        ORDER BY id {"DESC" if newest_first else "ASC"}
+        {limit_sql}
+        """
+    )
+    for name in ("since", "until"):
+        if name in params:
+            sql = sql.bindparams(bindparam(name, type_=DateTime))
+    types = {"occurred_at": DateTime}
+    if kind == "interactions":
+        types["event_data"] = JSON
+    return sql.columns(**types), params
+
+
+def _serialise(row) -> dict:
+    item = dict(row)
+    if item.get("occurred_at") is not None:
+        item["occurred_at"] = item["occurred_at"].isoformat()
+    return item
+
+
 @bp.get("/api/admin/analytics")
 @require_role("admin")
+@read_only
 def admin_analytics():
     """
-    Admin view of all recorded page views and interactions.
-    No artificial record limit; newest first.
+    Admin view of recorded page views and interactions, newest first.
+
+    Query params:
+      limit                    rows per stream (default 500, max 5000)
+      since, until             ISO 8601 bounds on occurred_at
+      views_before_id          keyset cursor from next_views_before_id
+      interactions_before_id   keyset cursor from next_interactions_before_id
     """
-    db = SessionLocal()
+    limit = request.args.get("limit", _PAGE_DEFAULT, type=int) or _PAGE_DEFAULT
+    limit = min(max(limit, 1), _PAGE_MAX)
+
     try:
-        # ---- Views: take ALL columns, newest by id ----
-        views_rows = (
-            db.execute(
-                text(
-                    """
-                    SELECT *
-                    FROM view_events
-                    ORDER BY id DESC
-                    """
-                )
-            )
-            .mappings()
-            .all()
-        )
+        since = _parse_time("since")
+        until = _parse_time("until")
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
 
-        # ---- Interactions: take ALL columns, newest by id ----
-        interactions_rows = (
-            db.execute(
-                text(
-                    """
-                    SELECT *
-                    FROM interaction_events
-                    ORDER BY id DESC
-                    """
-                )
-            )
-            .mappings()
-            .all()
+    db = get_db()
+    payload: dict[str, object] = {}
+
+    for kind in ("views", "interactions"):
+        before_id = request.args.get(f"{kind}_before_id", type=int)
+        sql, params = _events_sql(
+            kind, since, until, before_id=before_id, limit=limit + 1
         )
+        rows = db.execute(sql, params).mappings().all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        payload[kind] = [_serialise(r) for r in rows]
+        payload[f"next_{kind}_before_id"] = rows[-1]["id"] if has_more else None
+
+    return jsonify(payload), 200
+
+
+@bp.get("/api/admin/analytics/export")
+@require_role("admin")
+def export_analytics():
+    """
+    Stream every matching event as NDJSON (default) or CSV, oldest first.
+
+    Rows are read through a server-side cursor in chunks of _EXPORT_CHUNK,
+    so memory stays flat no matter how many events match.
+
+    Query params: kind=views|interactions, format=ndjson|csv, since, until.
+    """
+    kind = request.args.get("kind", "views")
+    fmt = request.args.get("format", "ndjson")
+
+    if kind not in _EVENT_TABLES:
+        return jsonify(error="kind must be views or interactions"), 400
+    if fmt not in ("ndjson", "csv"):
+        return jsonify(error="format must be ndjson or csv"), 400
+
+    try:
+        since = _parse_time("since")
+        until = _parse_time("until")
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    sql, params = _events_sql(kind, since, until, newest_first=False)
+    columns = _EVENT_TABLES[kind][1]
+
+    def generate():
+        # Runs while the response streams, after the request's app context
+        # (and its session) is gone, so it owns a session of its own; pinned
+        # to the read engine so a long export never holds the writer
+        db = SessionLocal(info={"read_only": True})
+        try:
+            result = db.execute(
+                sql,
+                params,
+                execution_options={"stream_results": True, "yield_per": _EXPORT_CHUNK},
+            ).mappings()
+
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                writer.writerow(columns)
+                yield buf.getvalue()
+
+            for chunk in result.partitions():
+                if fmt == "csv":
+                    buf = io.StringIO()
+                    writer = csv.writer(buf)
+                    for row in chunk:
+                        item = _serialise(row)
+                        writer.writerow(
+                            json.dumps(item[c]) if c == "event_data" else item[c]
+                            for c in columns
+                        )
+                    yield buf.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps(_serialise(row), default=str) + "\n"
+                        for row in chunk
+                    )
+        finally:
+            db.close()
 
-        # Just send raw rows; frontend will pick the fields it cares about
-        return jsonify(
-            {
-                "views": [dict(r) for r in views_rows],
-                "interactions": [dict(r) for r in interactions_rows],
-            }
-        ), 200
-    finally:
-        db.close()
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{_EVENT_TABLES[kind][0]}.{fmt}"
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @bp.post("/api/analytics/interaction")
@@ -6,8 +6,9 @@ from email.message import EmailMessage
 from flask import Blueprint, request, session, jsonify, current_app
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
-from backend.db.database import SessionLocal
+from backend.db.session import get_db, read_only, release_connection, transactional
 from backend.models.models import User
+from backend.security.load_user import invalidate_user
 from backend.security.passwords import hash_password, verify_password
 
 bp = Blueprint("auth", __name__)
@@ -86,6 +87,7 @@ def send_password_reset_email(to_email: str, reset_url: str) -> None:
 
 
 @bp.post("/api/auth/register")
+@transactional
 def register():
     data = request.get_json() or {}
     email = data.get("email")
@@ -94,48 +96,46 @@ def register():
     if not email or not password:
         return {"error": "Missing fields"}, 400
 
-    db = SessionLocal()
-    try:
-        # check existing
-        if db.query(User).filter_by(email=email).first():
-            return {"error": "email exists"}, 409
-
-        user = User(
-            email=email,
-            password_hash=hash_password(password),
-            role="customer",
-        )
-        db.add(user)
-        db.commit()
-        return {"ok": True}, 201
-    finally:
-        db.close()
+    # Hash before touching the database: POST statements run on the single
+    # writer connection, which every other write waits for
+    password_hash = hash_password(password)
+
+    db = get_db()
+    # check existing
+    if db.query(User).filter_by(email=email).first():
+        return {"error": "email exists"}, 409
+
+    user = User(
+        email=email,
+        password_hash=password_hash,
+        role="customer",
+    )
+    db.add(user)
+    return {"ok": True}, 201
 
 
 @bp.post("/api/auth/login")
+@read_only
 def login():
     data = request.get_json() or {}
     email = data.get("email")
     password = data.get("password")
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(email=email).first()
-        if not email or not password:
-            return {"error": "Missing email or password"}, 400
-
-        session["user_id"] = user.id
-
-        return jsonify(
-            ok=True,
-            user={
-                "id": user.id,
-                "email": user.email,
-                "role": user.role,
-            },
-        )
-    finally:
-        db.close()
+    db = get_db()
+    user = db.query(User).filter_by(email=email).first()
+    if not email or not password:
+        return {"error": "Missing email or password"}, 400
+
+    session["user_id"] = user.id
+
+    return jsonify(
+        ok=True,
+        user={
+            "id": user.id,
+            "email": user.email,
+            "role": user.role,
+        },
+    )
 
 
 @bp.post("/api/auth/logout")
@@ -150,6 +150,7 @@ def logout():
 
 
 @bp.post("/api/auth/forgot-password")
+@read_only
 def forgot_password():
     """
     Request a password reset link.
@@ -164,29 +165,29 @@ def forgot_password():
     if not email:
         return {"error": "email is required"}, 400
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter_by(email=email).first()
+    db = get_db()
+    user = db.query(User).filter_by(email=email).first()
 
-        if user:
-            # Generate signed token with user_id and email
-            s = _get_serializer()
-            token = s.dumps({"user_id": user.id, "email": user.email})
+    if user:
+        # Generate signed token with user_id and email
+        s = _get_serializer()
+        token = s.dumps({"user_id": user.id, "email": user.email})
 
-            # Where your frontend reset form lives
-            frontend_base = (
-                current_app.config.get("FRONTEND_BASE_URL")
-                or os.getenv("FRONTEND_BASE_URL")
-                or "http://localhost:5173"
-            )
-            reset_url = f"{frontend_base}/reset-password?token={token}"
+        # Where your frontend reset form lives
+        frontend_base = (
+            current_app.config.get("FRONTEND_BASE_URL")
+            or os.getenv("FRONTEND_BASE_URL")
+            or "http://localhost:5173"
+        )
+        reset_url = f"{frontend_base}/reset-password?token={token}"
 
-            send_password_reset_email(user.email, reset_url)
+        # Hand the connection back before waiting on the mail server
+        to_email = user.email
+        release_connection()
+        send_password_reset_email(to_email, reset_url)
 
-        # Do not reveal whether the email exists
-        return {"ok": True}
-    finally:
-        db.close()
+    # Do not reveal whether the email exists
+    return {"ok": True}
 
 
 # -------------------------
@@ -217,15 +218,15 @@ def reset_password():
         return {"error": "invalid reset token"}, 400
 
     user_id = payload.get("user_id")
+    # Hashed up front so the writer connection is only held for the update
+    password_hash = hash_password(new_password)
 
-    db = SessionLocal()
-    try:
-        user = db.query(User).get(user_id)
-        if not user:
-            return {"error": "user not found"}, 404
-
-        user.password_hash = hash_password(new_password)
-        db.commit()
-        return {"ok": True}
-    finally:
-        db.close()
+    db = get_db()
+    user = db.query(User).get(user_id)
+    if not user:
+        return {"error": "user not found"}, 404
+
+    user.password_hash = password_hash
+    db.commit()
+    invalidate_user(user.id)
+    return {"ok": True}
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, request
+
+from backend.cache.pricing import parse_lines, price_snapshot
+from backend.db.session import get_db, read_only
+
+bp = Blueprint("cart", __name__)
+
+MAX_QUOTE_LINES = 100
+
+
+@bp.post("/api/cart/quote")
+@read_only
+def quote():
+    """
+    Current prices and availability for a whole cart in one call:
+    - expects JSON: { "items": [{ "product_id": ..., "variant_id": ..., "qty": ... }] }
+    - prices come from the in-memory snapshot, not one query per product
+    - lines that cannot be bought come back with available=false and an error
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        lines = parse_lines(data.get("items"))
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+
+    if len(lines) > MAX_QUOTE_LINES:
+        return jsonify(
+            {"ok": False, "error": f"At most {MAX_QUOTE_LINES} items per quote"}
+        ), 400
+
+    price_snapshot.refresh(get_db())
+    items = price_snapshot.quote(lines)
+
+    priced = [i for i in items if "unit_price_cents" in i]
+    return jsonify(
+        {
+            "ok": True,
+            "items": items,
+            "total_cents": sum(i["line_total_cents"] for i in priced),
+            "currency": priced[0]["currency"] if priced else None,
+            "available": all(i["available"] for i in items),
+        }
+    )
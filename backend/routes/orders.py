@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify, g
-from backend.db.database import SessionLocal
+from backend.db.session import get_db, read_only
 from backend.models.models import Order, OrderItem, Product
 from backend.security.rbac import require_role
 
@@ -7,11 +7,12 @@ bp = Blueprint("orders", __name__)
 
 @bp.get("/api/orders/my")
 @require_role("customer")
+@read_only
 def my_orders():
     """
     Return orders for the current user, with basic line items.
     """
-    db = SessionLocal()
+    db = get_db()
     try:
         user = g.current_user
 
@@ -66,5 +67,3 @@ def my_orders():
             ),
             500,
         )
-    finally:
-        db.close()
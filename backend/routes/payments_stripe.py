@@ -1,134 +1,141 @@
 import stripe
 from stripe import error as stripe_error
 from flask import Blueprint, request, jsonify, current_app, g
-
-from backend.db.database import SessionLocal
-from backend.models.models import Product, Order, OrderItem
+from sqlalchemy import update
+
+from backend.cache.pricing import parse_lines, price_snapshot
+from backend.db.session import get_db
+from backend.models.models import Order, OrderItem, now
+from backend.security.idempotency import idempotent
+from backend.security.inventory import (
+    RESERVATION_TTL,
+    OutOfStock,
+    cancel_reservation,
+    reserve_stock,
+    stock_committed,
+)
+from backend.security.payments import PaymentProviderError, payment_provider
 from backend.security.rbac import require_role
+from backend.security.stripe_inbox import record_event, stripe_inbox
 
 
 bp = Blueprint("stripe_payments", __name__)
 
 
-@bp.before_app_request
-def load_stripe_key():
-    api_key = current_app.config.get("STRIPE_SECRET_KEY")
-    if api_key:
-        stripe.api_key = api_key
-    else:
-        current_app.logger.warning("STRIPE_SECRET_KEY is not configured")
-
-
 @bp.route("/api/payments/stripe/create-intent", methods=["POST"])
 @require_role("customer", "seller", "admin")
+@idempotent
 def create_stripe_intent():
     data = request.get_json() or {}
-    items = data.get("items")
-
-    if not items or not isinstance(items, list):
-        return jsonify({"ok": False, "error": "items must be a non empty list"}), 400
-
     try:
-        product_ids = {int(item["product_id"]) for item in items if "product_id" in item}
-    except (KeyError, TypeError, ValueError):
-        return jsonify({"ok": False, "error": "invalid product_id in items"}), 400
-
-    if not product_ids:
-        return jsonify({"ok": False, "error": "no product_ids provided"}), 400
+        lines = parse_lines(data.get("items"), qty_field="quantity")
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
 
-    db = SessionLocal()
+    db = get_db()
+    # Same pricing path as /api/checkout and /api/cart/quote
+    price_snapshot.refresh(db)
     try:
-        products = db.query(Product).filter(Product.id.in_(product_ids)).all()
-        products_by_id = {p.id: p for p in products}
-
-        missing = product_ids - products_by_id.keys()
-        if missing:
-            return (
-                jsonify(
-                    {
-                        "ok": False,
-                        "error": f"unknown product ids: {sorted(missing)}",
-                    }
-                ),
-                400,
-            )
-
-        total_cents = 0
-        order_items = []
-
-        for item in items:
-            try:
-                pid = int(item["product_id"])
-                qty = int(item.get("quantity", 1))
-            except (KeyError, TypeError, ValueError):
-                return jsonify({"ok": False, "error": "invalid item payload"}), 400
-
-            if qty <= 0:
-                return jsonify({"ok": False, "error": "quantity must be at least 1"}), 400
-
-            product = products_by_id[pid]
-
-            # Each product already stores price in pence
-            unit_price_cents = product.price_cents
-            line_total_cents = unit_price_cents * qty
-            total_cents += line_total_cents
-
-            order_item = OrderItem(
-                product_id=pid,
-                qty=qty,
-                unit_price_cents=unit_price_cents,
-            )
-            order_items.append(order_item)
-
-        if total_cents <= 0:
-            return jsonify({"ok": False, "error": "total must be greater than zero"}), 400
-
-        # Create order (matches your schema)
-        order = Order(
-            user_id=g.current_user.id,   # <-- fix here
-            total_cents=total_cents,
-            currency="£",
-            status="created",
-            payment_provider="stripe",
-            provider_ref=None,
-        )
-        db.add(order)
-        db.flush()
-
-        for oi in order_items:
-            oi.order_id = order.id
-            db.add(oi)
-
-        # Create PaymentIntent in Stripe
-        intent = stripe.PaymentIntent.create(
-            amount=total_cents,
-            currency="gbp",
-            metadata={
-                "order_id": str(order.id),
-                "user_id": str(g.current_user.id),
-            },
+        priced = price_snapshot.price_lines(lines, db)
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+
+    total_cents = 0
+    order_items = []
+
+    for line in priced:
+        # Each product already stores price in pence
+        total_cents += line["line_total_cents"]
+
+        order_item = OrderItem(
+            product_id=line["product_id"],
+            variant_id=line["variant_id"],
+            qty=line["qty"],
+            unit_price_cents=line["unit_price_cents"],
         )
+        order_items.append(order_item)
 
-        order.provider_ref = intent.id
-        db.commit()
+    if total_cents <= 0:
+        return jsonify({"ok": False, "error": "total must be greater than zero"}), 400
 
+    # Phase 1: hold the stock and record the order without a PaymentIntent.
+    # The sweeper gives the stock back if the payment never completes.
+    try:
+        reserve_stock(db, [(oi.variant_id, oi.qty) for oi in order_items])
+    except OutOfStock as exc:
+        db.rollback()
         return (
             jsonify(
                 {
-                    "ok": True,
-                    "client_secret": intent.client_secret,
-                    "order_id": order.id,
+                    "ok": False,
+                    "error": "not enough stock",
+                    "code": "OUT_OF_STOCK",
+                    "variant_ids": exc.variant_ids,
                 }
             ),
-            200,
+            409,
         )
 
+    order = Order(
+        user_id=g.current_user.id,
+        total_cents=total_cents,
+        currency="£",
+        status="created",
+        payment_provider="stripe",
+        provider_ref=None,
+        reserved_until=now() + RESERVATION_TTL,
+    )
+    db.add(order)
+    db.flush()
+    order_id = order.id
+
+    for oi in order_items:
+        oi.order_id = order_id
+        db.add(oi)
+    db.commit()
+    stock_committed(db)
+
+    # Phase 2: call Stripe with no transaction or connection held
+    try:
+        intent = payment_provider.create_payment_intent(
+            amount_cents=total_cents,
+            currency="gbp",
+            metadata={"order_id": str(order_id), "user_id": str(g.current_user.id)},
+            # A retry for the same order gets the same intent back
+            idempotency_key=f"order-{order_id}",
+        )
     except Exception as exc:
         db.rollback()
+        cancel_reservation(db, order_id)
+        db.commit()
+        stock_committed(db)
+        if isinstance(exc, PaymentProviderError):
+            current_app.logger.warning("Stripe unavailable for order %s: %s", order_id, exc)
+            return jsonify(
+                {"ok": False, "error": "payment provider unavailable, try again shortly"}
+            ), 503
         current_app.logger.exception("Error creating Stripe PaymentIntent: %s", exc)
         return jsonify({"ok": False, "error": "failed to create payment intent"}), 500
-    finally:
-        db.close()
+
+    # Phase 3: attach the intent. Done even if the order was swept in the
+    # meantime, so the webhook can still find it and take the stock again.
+    db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.provider_ref.is_(None))
+        .values(provider_ref=intent.id)
+    )
+    db.commit()
+
+    return (
+        jsonify(
+            {
+                "ok": True,
+                "client_secret": intent.client_secret,
+                "order_id": order_id,
+            }
+        ),
+        200,
+    )
 
 
 @bp.route("/webhooks/stripe", methods=["POST"])
@@ -152,28 +159,10 @@ def stripe_webhook():
     except stripe_error.SignatureVerificationError:
         return "Invalid signature", 400
 
-    if event["type"] == "payment_intent.succeeded":
-        intent = event["data"]["object"]
-        intent_id = intent["id"]
-
-        db = SessionLocal()
-        try:
-            order = db.query(Order).filter(Order.provider_ref == intent_id).one_or_none()
-
-            if order:
-                order.status = "paid"
-                db.commit()
-            else:
-                current_app.logger.warning(
-                    "Stripe webhook: no order found for intent %s",
-                    intent_id,
-                )
-        except Exception as exc:
-            db.rollback()
-            current_app.logger.exception(
-                "Failed to update order on payment_intent.succeeded: %s", exc
-            )
-        finally:
-            db.close()
+    # Store it and let the inbox workers apply it; Stripe only needs the 200
+    if record_event(get_db(), event["id"], event["type"], payload.decode("utf-8")):
+        stripe_inbox.wake()
+    else:
+        current_app.logger.info("Stripe webhook: duplicate event %s", event["id"])
 
     return jsonify({"received": True}), 200
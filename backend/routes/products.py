@@ -1,15 +1,134 @@
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
-from sqlalchemy import text
-from backend.db.database import SessionLocal
+from sqlalchemy import DateTime, Integer, bindparam, text
+from backend.cache import catalogue_cache
+from backend.cache.conditional import (
+    add_validators,
+    etag_for,
+    last_modified_for,
+    not_modified,
+)
+from backend.db.database import dialect_name
+from backend.db.session import get_db, read_only
+from backend.db.fts import PG_SEARCH_CONFIG
 from backend.models.models import Product
 from backend.security.analytics import log_interaction
+from backend.security.review_stats import rating_summary
 
 bp = Blueprint("products", __name__)
 
 
-@bp.get("/api/products")
-def list_products():
-    args = {
+# FTS5 column weights for bm25(): name, brand, category, description_md
+_BM25_WEIGHTS = "10.0, 5.0, 3.0, 1.0"
+# Same weighting for ts_rank_cd(), which takes {D, C, B, A}
+_TS_RANK_WEIGHTS = "{0.1, 0.3, 0.5, 1.0}"
+_FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_FTS_MAX_TOKENS = 12
+
+
+def _fts_match_expr(text_query: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("rose"* "gold"*), so user input
+    can never inject FTS operators and partial words still match while typing.
+    """
+    tokens = _FTS_TOKEN_RE.findall(text_query)[:_FTS_MAX_TOKENS]
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _tsquery_expr(text_query: str) -> str:
+    """Postgres counterpart of _fts_match_expr: 'rose':* & 'gold':*"""
+    tokens = _FTS_TOKEN_RE.findall(text_query)[:_FTS_MAX_TOKENS]
+    return " & ".join(f"'{t}':*" for t in tokens)
+
+
+def _text_search(text_query: str) -> tuple[str, str, dict, str]:
+    """
+    FROM clause, WHERE condition, params and rank expression for a text
+    search. The rank sorts ascending, best match first, on both backends.
+    """
+    if dialect_name() == "postgresql":
+        tsquery = f"to_tsquery('{PG_SEARCH_CONFIG}', :q_match)"
+        return (
+            "FROM products p",
+            f"p.search_tsv @@ {tsquery}",
+            {"q_match": _tsquery_expr(text_query)},
+            f"-ts_rank_cd('{_TS_RANK_WEIGHTS}', p.search_tsv, {tsquery})",
+        )
+
+    return (
+        "FROM products_fts JOIN products p ON p.id = products_fts.rowid",
+        "products_fts MATCH :q_match",
+        {"q_match": _fts_match_expr(text_query)},
+        f"bm25(products_fts, {_BM25_WEIGHTS})",
+    )
+
+
+# sort -> (key column, direction) for keyset paging, id is always the tiebreak
+_KEYSET_SORTS = {
+    "newest": ("p.created_at", "DESC"),
+    "price_asc": ("p.price_cents", "ASC"),
+    "price_desc": ("p.price_cents", "DESC"),
+    "rating": ("p.rating_avg_x100", "DESC"),
+}
+_KEYSET_TYPES = {
+    "newest": DateTime(),
+    "price_asc": Integer(),
+    "price_desc": Integer(),
+    "rating": Integer(),
+}
+# Cursor key per keyset sort, read from the last row of a page
+_KEYSET_ROW_KEYS = {
+    "price_asc": "price_cents",
+    "price_desc": "price_cents",
+    "rating": "rating_avg_x100",
+}
+# include_total=estimate stops counting here
+_ESTIMATE_CAP = 1000
+
+# Version counters that listing/detail ETags are derived from
+_CATALOGUE_SCOPE = ("catalogue",)
+# Listings and facets filter on stock, product detail does not
+_LISTING_SCOPE = ("catalogue", "stock")
+
+
+def _encode_cursor(sort: str, row) -> str:
+    """
+    Opaque cursor for the row a page ended on. Clients must pass it back
+    unchanged; the sort is embedded so it cannot be replayed against
+    a different ordering.
+    """
+    key = row["created_at"].isoformat() if sort == "newest" else row[_KEYSET_ROW_KEYS[sort]]
+    raw = json.dumps({"s": sort, "k": key, "i": row["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["s"] != sort or not isinstance(data["i"], int):
+            raise ValueError("cursor does not match sort")
+        if sort == "newest":
+            key = datetime.fromisoformat(data["k"])
+        elif isinstance(data["k"], int):
+            key = data["k"]
+        else:
+            raise ValueError("bad cursor key")
+    except (KeyError, TypeError, binascii.Error, json.JSONDecodeError) as exc:
+        raise ValueError("malformed cursor") from exc
+
+    return {"key": key, "id": data["i"]}
+
+
+def _listing_args(default_sort: str = "newest") -> dict:
+    return {
         "q": request.args.get("q"),
         "brand": request.args.get("brand"),
         "category": request.args.get("category"),
@@ -17,12 +136,20 @@ def list_products():
         "colour": request.args.get("colour"),
         "min_price": request.args.get("min_price", type=int),
         "max_price": request.args.get("max_price", type=int),
-        "sort": request.args.get("sort", "newest"),
+        "sort": request.args.get("sort", default_sort),
         "limit": min(max(request.args.get("limit", default=12, type=int), 1), 50),
         "page": max(request.args.get("page", default=1, type=int), 1),
+        # Present (even empty) switches to keyset paging
+        "cursor": request.args.get("cursor"),
+        "include_total": request.args.get("include_total"),
     }
-    offset = (args["page"] - 1) * args["limit"]
 
+
+def _build_filters(args: dict) -> tuple[str, list[str], dict, str | None]:
+    """
+    Shared FROM/WHERE for the listing and the facet counts.
+    Returns (from_clause, where_clauses, sql_params, rank_sql).
+    """
     text_query_raw = args["q"]
     text_query = text_query_raw.strip() if text_query_raw else ""
 
@@ -32,19 +159,8 @@ def list_products():
     category_raw = args["category"]
     category = category_raw.strip() if category_raw else ""
 
-    # ORDERING...
-    order_sql_map = {
-        "newest": "p.created_at DESC",
-        "price_asc": "p.price_cents ASC",
-        "price_desc": "p.price_cents DESC",
-    }
-    order_sql = order_sql_map.get(args["sort"], "p.created_at DESC")
-
-    where_clauses = ["p.active = 1"]
-    sql_params: dict[str, object] = {
-        "limit": args["limit"],
-        "offset": offset,
-    }
+    where_clauses = ["p.active = :active"]
+    sql_params: dict[str, object] = {"active": True}
 
     # BRAND (case insensitive)
     if brand:
@@ -81,15 +197,80 @@ def list_products():
         )
         sql_params["colour"] = args["colour"]
 
-    # SIMPLE TEXT SEARCH (no FTS, just LIKE)
+    # TEXT SEARCH over name, brand, category and description
     from_clause = "FROM products p"
+    rank_sql = None
 
-    if text_query:
-        where_clauses.append("(p.name LIKE :q_like OR p.description_md LIKE :q_like)")
-        sql_params["q_like"] = f"%{text_query}%"
+    if _FTS_TOKEN_RE.search(text_query):
+        from_clause, match_sql, match_params, rank_sql = _text_search(text_query)
+        where_clauses.append(match_sql)
+        sql_params.update(match_params)
+
+    return from_clause, where_clauses, sql_params, rank_sql
+
+
+def _filter_cache_key(args: dict) -> tuple:
+    """
+    Normalised filter part of a cache key: cosmetic differences
+    (case, spacing, punctuation) must not split the cache.
+    """
+    q = (args["q"] or "").strip().lower()
+    return (
+        _fts_match_expr(q) if q else "",
+        (args["brand"] or "").strip().lower(),
+        (args["category"] or "").strip().lower(),
+        args["size"] or "",
+        args["colour"] or "",
+        args["min_price"],
+        args["max_price"],
+    )
+
+
+def _query_products(args: dict) -> tuple[dict, int]:
+    keyset = args["cursor"] is not None
+    offset = 0 if keyset else (args["page"] - 1) * args["limit"]
+
+    from_clause, where_clauses, sql_params, rank_sql = _build_filters(args)
+    sql_params["offset"] = offset
+
+    # ORDERING... (id breaks ties so pages never overlap)
+    order_sql_map = {
+        "newest": "p.created_at DESC, p.id DESC",
+        "price_asc": "p.price_cents ASC, p.id ASC",
+        "price_desc": "p.price_cents DESC, p.id DESC",
+        # Unrated products have 0 and come last
+        "rating": "p.rating_avg_x100 DESC, p.id DESC",
+    }
+    if rank_sql:
+        # rank is lower for better matches
+        order_sql_map["relevance"] = f"{rank_sql} ASC, p.created_at DESC, p.id DESC"
+
+    sort = args["sort"] if args["sort"] in order_sql_map else "newest"
+    order_sql = order_sql_map[sort]
+
+    # KEYSET PAGING: continue strictly after the last row of the previous page
+    cursor_sql = ""
+    if keyset:
+        if sort not in _KEYSET_SORTS:
+            return {"error": f"cursor paging is not available for sort={sort}"}, 400
+
+        if args["cursor"]:
+            try:
+                after = _decode_cursor(args["cursor"], sort)
+            except ValueError:
+                return {"error": "Invalid cursor"}, 400
+
+            column, direction = _KEYSET_SORTS[sort]
+            op = "<" if direction == "DESC" else ">"
+            cursor_sql = f"AND ({column}, p.id) {op} (:after_key, :after_id)"
+            sql_params["after_key"] = after["key"]
+            sql_params["after_id"] = after["id"]
 
     where_sql = " AND ".join(where_clauses)
 
+    # One extra row tells us whether another page exists
+    sql_params["fetch"] = args["limit"] + 1 if keyset else args["limit"]
+
     items_sql = text(
         f"""
         SELECT
@@ -99,14 +280,23 @@ def list_products():
             p.category,
             p.price_cents,
             p.currency,
-            p.hero_image_url
+            p.hero_image_url,
+            p.created_at,
+            p.rating_count,
+            p.rating_avg_x100
         {from_clause}
-        WHERE {where_sql}
+        WHERE {where_sql} {cursor_sql}
         ORDER BY {order_sql}
-        LIMIT :limit OFFSET :offset
+        LIMIT :fetch OFFSET :offset
         """
     )
+    if cursor_sql:
+        items_sql = items_sql.bindparams(
+            bindparam("after_key", type_=_KEYSET_TYPES[sort])
+        )
+    items_sql = items_sql.columns(created_at=DateTime)
 
+    # The count ignores the cursor position, it describes the whole result set
     count_sql = text(
         f"""
         SELECT COUNT(*)
@@ -114,46 +304,261 @@ def list_products():
         WHERE {where_sql}
         """
     )
+    estimate_sql = text(
+        f"""
+        SELECT COUNT(*) FROM (
+            SELECT 1
+            {from_clause}
+            WHERE {where_sql}
+            LIMIT :estimate_cap
+        ) AS capped
+        """
+    )
 
-    db = SessionLocal()
-    try:
-        total = db.execute(count_sql, sql_params).scalar_one()
-        rows = db.execute(items_sql, sql_params).mappings().all()
-
-        return jsonify(
-            {
-                "items": [dict(r) for r in rows],
-                "total": total,
-                "page": args["page"],
-                "limit": args["limit"],
-                "debug_marker": "products_list_v3",
-            }
+    # include_total: 1 = exact COUNT(*), 0 = skip it, estimate = bounded count.
+    # Page mode keeps the exact total by default for existing clients.
+    include_total = (args["include_total"] or ("0" if keyset else "1")).lower()
+
+    db = get_db()
+    rows = db.execute(items_sql, sql_params).mappings().all()
+
+    has_more = keyset and len(rows) > args["limit"]
+    rows = rows[: args["limit"]]
+
+    items = []
+    for r in rows:
+        item = dict(r)
+        item["created_at"] = r["created_at"].isoformat() if r["created_at"] else None
+        # Enough for star ratings on listing cards; the histogram is on the detail
+        avg_x100 = item.pop("rating_avg_x100")
+        item["rating_avg"] = avg_x100 / 100 if item["rating_count"] else None
+        items.append(item)
+
+    payload: dict[str, object] = {
+        "items": items,
+        "limit": args["limit"],
+        "debug_marker": "products_list_v3",
+    }
+
+    if include_total in ("1", "true", "yes"):
+        payload["total"] = db.execute(count_sql, sql_params).scalar_one()
+    elif include_total == "estimate":
+        capped = db.execute(
+            estimate_sql, {**sql_params, "estimate_cap": _ESTIMATE_CAP + 1}
+        ).scalar_one()
+        payload["total"] = min(capped, _ESTIMATE_CAP)
+        payload["total_is_estimate"] = capped > _ESTIMATE_CAP
+    else:
+        payload["total"] = None
+
+    if keyset:
+        last = rows[-1] if rows else None
+        payload["next_cursor"] = (
+            _encode_cursor(sort, last) if has_more and last else None
         )
-    finally:
-        db.close()
+    else:
+        payload["page"] = args["page"]
+
+    return payload, 200
+
+
+def _listing_response(args: dict):
+    """Serve a listing page from the catalogue cache, filling it on a miss."""
+    cache_key = _filter_cache_key(args) + (
+        args["sort"],
+        args["limit"],
+        None if args["cursor"] is not None else args["page"],
+        args["cursor"],
+        (args["include_total"] or "").lower(),
+    )
+
+    etag = etag_for(_LISTING_SCOPE, request.path, cache_key)
+    last_modified = last_modified_for(_LISTING_SCOPE)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged is not None:
+        return unchanged
+
+    payload = catalogue_cache.get("list", cache_key)
+    if payload is not None:
+        return _cached_response(payload, "HIT", etag, last_modified)
+
+    payload, status = _query_products(args)
+    if status != 200:
+        return jsonify(payload), status
+
+    catalogue_cache.set("list", cache_key, payload)
+    return _cached_response(payload, "MISS", etag, last_modified)
+
+
+def _cached_response(payload: dict, cache_status: str, etag: str, last_modified):
+    response = add_validators(jsonify(payload), etag, last_modified)
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+@bp.get("/api/products")
+@read_only
+def list_products():
+    return _listing_response(_listing_args())
+
+
+@bp.get("/api/search")
+@read_only
+def search_products():
+    """
+    Same filters as /api/products, but ranked by relevance unless the
+    caller asks for another sort.
+    """
+    return _listing_response(_listing_args(default_sort="relevance"))
+
+
+# Price bands for the facet sidebar, in pence: (label, min inclusive, max exclusive)
+_PRICE_BANDS = [
+    ("under_100", None, 10000),
+    ("100_250", 10000, 25000),
+    ("250_500", 25000, 50000),
+    ("500_1000", 50000, 100000),
+    ("1000_plus", 100000, None),
+]
+
+
+def _price_band_sql() -> str:
+    whens = []
+    for label, low, high in _PRICE_BANDS:
+        conds = []
+        if low is not None:
+            conds.append(f"price_cents >= {low}")
+        if high is not None:
+            conds.append(f"price_cents < {high}")
+        whens.append(f"WHEN {' AND '.join(conds)} THEN '{label}'")
+    return "CASE " + " ".join(whens) + " END"
+
+
+@bp.get("/api/products/facets")
+@read_only
+def product_facets():
+    """
+    Counts per brand, category, size, colour and price band for the
+    current filter set, in one statement over the same WHERE as the listing.
+    """
+    args = _listing_args()
+    # Only the filters change facet counts, sort and paging are not part of the key
+    cache_key = _filter_cache_key(args)
+
+    etag = etag_for(_LISTING_SCOPE, "facets", cache_key)
+    last_modified = last_modified_for(_LISTING_SCOPE)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged is not None:
+        return unchanged
+
+    cached = catalogue_cache.get("facets", cache_key)
+    if cached is not None:
+        return _cached_response(cached, "HIT", etag, last_modified)
+
+    from_clause, where_clauses, sql_params, _ = _build_filters(args)
+    where_sql = " AND ".join(where_clauses)
+
+    # The filtered set is scanned once; every facet groups over it. Brand and
+    # category group case-insensitively, like their filters
+    facets_sql = text(
+        f"""
+        WITH filtered AS (
+            SELECT p.id, p.brand, p.category, p.price_cents
+            {from_clause}
+            WHERE {where_sql}
+        )
+        SELECT 'brand' AS facet, MIN(brand) AS value, COUNT(*) AS n
+        FROM filtered WHERE brand IS NOT NULL GROUP BY LOWER(brand)
+        UNION ALL
+        SELECT 'category', MIN(category), COUNT(*)
+        FROM filtered WHERE category IS NOT NULL GROUP BY LOWER(category)
+        UNION ALL
+        SELECT 'size', v.size, COUNT(DISTINCT v.product_id)
+        FROM filtered f JOIN variants v ON v.product_id = f.id
+        WHERE v.size IS NOT NULL AND v.stock > 0 GROUP BY v.size
+        UNION ALL
+        SELECT 'colour', v.colour, COUNT(DISTINCT v.product_id)
+        FROM filtered f JOIN variants v ON v.product_id = f.id
+        WHERE v.colour IS NOT NULL AND v.stock > 0 GROUP BY v.colour
+        UNION ALL
+        SELECT 'price', {_price_band_sql()}, COUNT(*)
+        FROM filtered GROUP BY 2
+        UNION ALL
+        SELECT 'total', NULL, COUNT(*) FROM filtered
+        """
+    )
+
+    db = get_db()
+    rows = db.execute(facets_sql, sql_params).all()
+
+    facets: dict[str, list] = {"brand": [], "category": [], "size": [], "colour": []}
+    band_counts: dict[str, int] = {}
+    total = 0
+
+    for facet, value, n in rows:
+        if facet == "total":
+            total = n
+        elif facet == "price":
+            band_counts[value] = n
+        else:
+            facets[facet].append({"value": value, "count": n})
+
+    for values in facets.values():
+        values.sort(key=lambda v: (-v["count"], str(v["value"]).lower()))
+
+    facets["price"] = [
+        {
+            "band": label,
+            "min_price": low,
+            "max_price": high,
+            "count": band_counts.get(label, 0),
+        }
+        for label, low, high in _PRICE_BANDS
+    ]
+
+    payload = {"facets": facets, "total": total}
+    catalogue_cache.set("facets", cache_key, payload)
+    return _cached_response(payload, "MISS", etag, last_modified)
 
 
 @bp.get("/api/products/<int:product_id>")
+@read_only
 def get_product(product_id: int):
     # Step 4 — log product view
     log_interaction("product_view", f"product_id={product_id}")
 
-    db = SessionLocal()
-    try:
-        product = db.query(Product).filter_by(id=product_id).first()
-        if not product:
-            return jsonify(error="Product not found"), 404
-
-        return jsonify(
-            id=product.id,
-            name=product.name,
-            brand=product.brand,
-            category=product.category,
-            description_md=product.description_md,
-            price_cents=product.price_cents,
-            currency=product.currency,
-            hero_image_url=product.hero_image_url,
-            created_at=product.created_at.isoformat() if product.created_at else None,
-        ), 200
-    finally:
-        db.close()
+    # Answer revalidations before touching the ORM
+    etag = etag_for(_CATALOGUE_SCOPE, "product", product_id)
+    last_modified = last_modified_for(_CATALOGUE_SCOPE)
+    unchanged = not_modified(etag, last_modified)
+    if unchanged is not None:
+        return unchanged
+
+    cached = catalogue_cache.get("product", product_id)
+    if cached is not None:
+        return _cached_response(cached, "HIT", etag, last_modified)
+
+    db = get_db()
+    product = db.query(Product).filter_by(id=product_id).first()
+    if not product:
+        return jsonify(error="Product not found"), 404
+
+    payload = dict(
+        id=product.id,
+        name=product.name,
+        brand=product.brand,
+        category=product.category,
+        description_md=product.description_md,
+        price_cents=product.price_cents,
+        currency=product.currency,
+        hero_image_url=product.hero_image_url,
+        created_at=product.created_at.isoformat() if product.created_at else None,
+        # Stock is left out on purpose: it changes with every sale
+        variants=[
+            {"id": v.id, "size": v.size, "colour": v.colour} for v in product.variants
+        ],
+        rating=rating_summary(product),
+    )
+
+    catalogue_cache.set("product", product_id, payload)
+    return _cached_response(payload, "MISS", etag, last_modified)
@@ -1,15 +1,31 @@
-from flask import Blueprint, jsonify, request, g
-from sqlalchemy import desc
+import base64
+import binascii
+import json
+from datetime import datetime
 
-from backend.db.database import SessionLocal
+from flask import Blueprint, jsonify, request, g
+from sqlalchemy import exists, select, tuple_
+
+from backend.cache import catalogue_cache
+from backend.cache.conditional import (
+    add_validators,
+    etag_for,
+    last_modified_for,
+    not_modified,
+)
+from backend.db.session import get_db, read_only
 from backend.models.models import Review, Product, Order, OrderItem
 from backend.security.markdown_sanitiser import md_to_safe_html
 from backend.security.rbac import require_role
+from backend.security.review_stats import apply_review
 from sqlalchemy.exc import IntegrityError
 
 
 bp = Blueprint("reviews", __name__)
 
+# Order statuses that count as having bought a product
+_PURCHASED_STATUSES = ["paid", "PAID", "completed", "COMPLETED"]
+
 
 @bp.post("/api/products/<int:product_id>/reviews")
 @require_role("customer", "seller", "admin")
@@ -29,163 +45,248 @@ def create_review(product_id: int):
     if rating < 1 or rating > 5:
         return jsonify(error="Rating must be between 1 and 5"), 400
 
-    db = SessionLocal()
-    try:
-        # 1. Product exists
-        product = db.query(Product).filter_by(id=product_id).first()
-        if not product:
-            return jsonify(error="Product not found"), 404
-
-        # 2. Enforce “only after purchase”
-        # Adjust these allowed statuses if your DB uses something else
-        allowed_statuses = ["paid", "PAID", "completed", "COMPLETED"]
-
-        has_purchased = (
-            db.query(OrderItem)
-            .join(Order, OrderItem.order_id == Order.id)
-            .filter(
-                Order.user_id == g.current_user.id,
-                Order.status.in_(allowed_statuses),
-                OrderItem.product_id == product_id,
-            )
-            .first()
-            is not None
+    db = get_db()
+    # 1. Product exists
+    product = db.query(Product).filter_by(id=product_id).first()
+    if not product:
+        return jsonify(error="Product not found"), 404
+
+    # 2. Enforce “only after purchase”
+    has_purchased = (
+        db.query(OrderItem)
+        .join(Order, OrderItem.order_id == Order.id)
+        .filter(
+            Order.user_id == g.current_user.id,
+            Order.status.in_(_PURCHASED_STATUSES),
+            OrderItem.product_id == product_id,
+        )
+        .first()
+        is not None
+    )
+
+    if not has_purchased:
+        return (
+            jsonify(
+                ok=False,
+                error="You can only review products you have purchased.",
+            ),
+            403,
         )
 
-        if not has_purchased:
-            return (
-                jsonify(
-                    ok=False,
-                    error="You can only review products you have purchased.",
-                ),
-                403,
-            )
-
-        # 3. Sanitise markdown, keep your existing fields
-        body_html = md_to_safe_html(body_md)
-
-        review = Review(
-            product_id=product_id,
-            user_id=g.current_user.id,
-            rating=rating,
-            body_md=body_md,
-            body_html_sanitised=body_html,
-            images=None,  # or "[]" if your column is a JSON string
+    # 3. Sanitise markdown, keep your existing fields
+    body_html = md_to_safe_html(body_md)
+
+    review = Review(
+        product_id=product_id,
+        user_id=g.current_user.id,
+        rating=rating,
+        body_md=body_md,
+        body_html_sanitised=body_html,
+        images=None,  # or "[]" if your column is a JSON string
+    )
+
+    try:
+        db.add(review)
+        db.flush()
+        # Same transaction as the review, so the stats can never drift
+        apply_review(db, product_id, rating, +1)
+        db.commit()
+        db.refresh(review)
+        catalogue_cache.bump_generation(f"reviews:{product_id}")
+        # Listings and the product page show the rating summary
+        catalogue_cache.product_changed(product_id)
+    except IntegrityError:
+        db.rollback()
+        return (
+            jsonify(
+                ok=False,
+                error="You have already reviewed this product.",
+                code="REVIEW_ALREADY_EXISTS",
+            ),
+            400,
         )
 
-        try:
-            db.add(review)
-            db.commit()
-            db.refresh(review)
-        except IntegrityError:
-            db.rollback()
-            return (
-                jsonify(
-                    ok=False,
-                    error="You have already reviewed this product.",
-                    code="REVIEW_ALREADY_EXISTS",
-                ),
-                400,
-            )
-
-        return jsonify(
-            ok=True,
-            review={
-                "id": review.id,
-                "product_id": review.product_id,
-                "user_id": review.user_id,
-                "rating": review.rating,
-                "body_html": review.body_html_sanitised,
-                "created_at": review.created_at.isoformat()
-                if review.created_at
-                else None,
-            },
-        ), 201
-    finally:
-        db.close()
+    return jsonify(
+        ok=True,
+        review={
+            "id": review.id,
+            "product_id": review.product_id,
+            "user_id": review.user_id,
+            "rating": review.rating,
+            "body_html": review.body_html_sanitised,
+            "created_at": review.created_at.isoformat()
+            if review.created_at
+            else None,
+        },
+    ), 201
+
+
+def _review_scopes(product_id: int, user) -> tuple[str, ...]:
+    """
+    The review list changes with the product's reviews; can_review also
+    depends on the viewer's paid orders.
+    """
+    if user is None:
+        return (f"reviews:{product_id}",)
+    return (f"reviews:{product_id}", f"orders:{user.id}")
+
+
+def _encode_cursor(review: Review) -> str:
+    """Opaque cursor for the (created_at, id) of the last review on a page."""
+    raw = json.dumps(
+        {"k": review.created_at.isoformat(), "i": review.id}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data["i"], int):
+            raise ValueError("bad cursor id")
+        return datetime.fromisoformat(data["k"]), data["i"]
+    except (KeyError, TypeError, binascii.Error, json.JSONDecodeError) as exc:
+        raise ValueError("malformed cursor") from exc
+
+
+def _viewer_state(db, product_id: int, user_id: int) -> dict:
+    """
+    Whether the viewer bought the product and which review (if any) they
+    left on it, in one round trip. Cached per (user, product); the key
+    carries both generations, so paying an order or writing a review
+    moves it on.
+    """
+    key = [
+        user_id,
+        product_id,
+        catalogue_cache.version(f"orders:{user_id}"),
+        catalogue_cache.version(f"reviews:{product_id}"),
+    ]
+    state = catalogue_cache.get("review_viewer", key)
+    if state is not None:
+        return state
+
+    purchased = exists().where(
+        OrderItem.order_id == Order.id,
+        Order.user_id == user_id,
+        Order.status.in_(_PURCHASED_STATUSES),
+        OrderItem.product_id == product_id,
+    )
+    own_review = (
+        select(Review.id)
+        .where(Review.product_id == product_id, Review.user_id == user_id)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(purchased.label("purchased"), own_review.label("review_id"))
+    ).one()
+
+    state = {"purchased": bool(row.purchased), "review_id": row.review_id}
+    catalogue_cache.set("review_viewer", key, state)
+    return state
 
 
 @bp.get("/api/products/<int:product_id>/reviews")
+@read_only
 def list_reviews(product_id: int):
-    db = SessionLocal()
-    try:
-        reviews = (
-            db.query(Review)
-            .filter_by(product_id=product_id)
-            .order_by(desc(Review.created_at))
-            .all()
+    """
+    Newest reviews first, `limit` per page (default 20, max 50). Pass the
+    returned next_cursor back as `cursor` for the following page.
+    """
+    user = getattr(g, "current_user", None)
+    limit = min(max(request.args.get("limit", default=20, type=int), 1), 50)
+    cursor = request.args.get("cursor") or None
+
+    after = None
+    if cursor is not None:
+        try:
+            after = _decode_cursor(cursor)
+        except ValueError:
+            return jsonify(ok=False, error="Invalid cursor"), 400
+
+    scopes = _review_scopes(product_id, user)
+    etag = etag_for(
+        scopes, "reviews", product_id, getattr(user, "id", None), limit, cursor
+    )
+    last_modified = last_modified_for(scopes)
+
+    unchanged = not_modified(etag, last_modified, private=True)
+    if unchanged is not None:
+        unchanged.vary.add("Cookie")
+        return unchanged
+
+    db = get_db()
+    # Walks ix_reviews_product_id_created_at backwards; no OFFSET, so deep
+    # pages cost the same as the first one
+    stmt = select(Review).where(Review.product_id == product_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(Review.created_at, Review.id) < tuple_(*after))
+    reviews = (
+        db.execute(
+            stmt.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1)
         )
-
-        payload = [
-            {
-                "id": r.id,
-                "product_id": r.product_id,
-                "user_id": r.user_id,
-                "rating": r.rating,
-                "body_html": r.body_html_sanitised,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
-            }
-            for r in reviews
-        ]
-
-        # NEW: decide if the current user is allowed to review
-        user = getattr(g, "current_user", None)
-        can_review = False
-
-        if user is not None:
-            allowed_statuses = ["paid", "PAID", "completed", "COMPLETED"]
-
-            has_purchased = (
-                db.query(OrderItem)
-                .join(Order, OrderItem.order_id == Order.id)
-                .filter(
-                    Order.user_id == user.id,
-                    Order.status.in_(allowed_statuses),
-                    OrderItem.product_id == product_id,
-                )
-                .first()
-                is not None
-            )
-
-            has_reviewed = (
-                db.query(Review.id)
-                .filter(
-                    Review.product_id == product_id,
-                    Review.user_id == user.id,
-                )
-                .first()
-                is not None
-            )
-
-            can_review = has_purchased and not has_reviewed
-
-        return jsonify(
+        .scalars()
+        .all()
+    )
+    has_more = len(reviews) > limit
+    reviews = reviews[:limit]
+
+    payload = [
+        {
+            "id": r.id,
+            "product_id": r.product_id,
+            "user_id": r.user_id,
+            "rating": r.rating,
+            "body_html": r.body_html_sanitised,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in reviews
+    ]
+
+    can_review = False
+    my_review_id = None
+    if user is not None:
+        state = _viewer_state(db, product_id, user.id)
+        my_review_id = state["review_id"]
+        can_review = state["purchased"] and my_review_id is None
+
+    response = add_validators(
+        jsonify(
             reviews=payload,
+            limit=limit,
+            next_cursor=_encode_cursor(reviews[-1]) if has_more else None,
             can_review=can_review,
-        ), 200
-
-    finally:
-        db.close()
+            my_review_id=my_review_id,
+        ),
+        etag,
+        last_modified,
+        private=True,
+    )
+    response.vary.add("Cookie")
+    return response, 200
 
 
 @bp.delete("/api/reviews/<int:review_id>")
 @require_role("customer", "seller", "admin")
 def delete_review(review_id: int):
-    db = SessionLocal()
-    try:
-        review = db.query(Review).filter_by(id=review_id).first()
-        if not review:
-            return jsonify(error="Review not found"), 404
+    db = get_db()
+    review = db.query(Review).filter_by(id=review_id).first()
+    if not review:
+        return jsonify(error="Review not found"), 404
 
-        user = g.current_user
+    user = g.current_user
 
-        # Only the author or an admin can delete
-        if user.role != "admin" and review.user_id != user.id:
-            return jsonify(error="You can only delete your own reviews"), 403
+    # Only the author or an admin can delete
+    if user.role != "admin" and review.user_id != user.id:
+        return jsonify(error="You can only delete your own reviews"), 403
 
-        db.delete(review)
-        db.commit()
+    product_id, rating = review.product_id, review.rating
+    db.delete(review)
+    apply_review(db, product_id, rating, -1)
+    db.commit()
+
+    catalogue_cache.bump_generation(f"reviews:{product_id}")
+    catalogue_cache.product_changed(product_id)
 
-        return jsonify(ok=True), 200
-    finally:
-        db.close()
+    return jsonify(ok=True), 200
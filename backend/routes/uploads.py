@@ -1,9 +1,17 @@
+import mimetypes
+import os
+import stat
 from pathlib import Path
+from urllib.parse import quote
 
-from flask import Blueprint, current_app, jsonify, request, send_from_directory
+from flask import Blueprint, current_app, jsonify, redirect, request, send_file
 from werkzeug.datastructures import FileStorage
+from werkzeug.security import safe_join
 
-from backend.security.uploads import validate_and_save_image
+from backend.security import image_variants
+from backend.security.image_variants import variant_pool
+from backend.security.uploads import is_content_addressed, validate_and_save_image
+from backend.storage import MediaStorage, media_storage
 
 bp = Blueprint("uploads", __name__)
 
@@ -14,37 +22,155 @@ def upload_image():
         return jsonify(error="Missing file field"), 400
 
     uploaded: FileStorage = request.files["file"]
+    storage = media_storage()
 
     try:
-        upload_root: Path = current_app.config["UPLOAD_ROOT"]
-    except KeyError:
-        return jsonify(error="Upload root not configured"), 500
-
-    try:
-        rel_path = validate_and_save_image(uploaded, upload_root, subdir="products")
+        rel_path = validate_and_save_image(uploaded, storage, subdir="products")
     except ValueError as exc:
         return jsonify(error=str(exc)), 400
 
+    # Grid-sized variants are rendered in the background
+    variant_pool.submit(storage, rel_path)
+
     # Public URL for frontend
     url = f"/media/{rel_path}"
-    return jsonify(ok=True, path=rel_path, url=url), 201
+    srcset = ", ".join(f"{url}?w={w} {w}w" for w in image_variants.VARIANT_WIDTHS)
+    return jsonify(ok=True, path=rel_path, url=url, srcset=srcset), 201
+
+
+# Media responses: cache lifetime for files that may be replaced under the
+# same name (content-addressed ones are cached for a year, immutable), and
+# optionally let the front proxy send the bytes:
+#   MEDIA_ACCEL=x-accel     nginx, internal location at MEDIA_ACCEL_PREFIX
+#   MEDIA_ACCEL=x-sendfile  Apache mod_xsendfile / lighttpd, absolute path
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "86400"))
+MEDIA_ACCEL = os.getenv("MEDIA_ACCEL", "").lower()
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/_media/")
+
+# A year, the conventional ceiling for "never changes"
+_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
 
 
 @bp.get("/media/<path:rel_path>")
 def serve_media(rel_path: str):
+    # safe_join rejects traversal without touching the disk or the bucket
+    if safe_join(".", rel_path) is None:
+        return jsonify(error="Invalid path"), 400
+
+    storage = media_storage()
+    if "w" in request.args:
+        return _serve_variant(storage, rel_path)
+
+    return _send_media(storage, rel_path)
+
+
+def _send_media(storage: MediaStorage, key: str, mimetype: str | None = None,
+                cache: bool = True, vary_accept: bool = False):
+    """
+    Local files are sent from here; objects in a bucket are a redirect to
+    the bucket (or the CDN in front of it), so their bytes never pass
+    through a worker.
+    """
+    path = storage.local_path(key)
+    if path is None:
+        response = redirect(storage.url(key))
+        max_age = storage.url_max_age
+    else:
+        response = _send_local(path, key, mimetype)
+        if response is None:
+            return jsonify(error="Not found"), 404
+        max_age = (
+            _IMMUTABLE_MAX_AGE if is_content_addressed(key) else MEDIA_MAX_AGE
+        )
+
+    if vary_accept:
+        response.vary.add("Accept")
+    if not cache:
+        response.cache_control.no_cache = True
+        return response
+
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if path is not None and is_content_addressed(key):
+        # Content-addressed files never change under their URL
+        response.cache_control.immutable = True
+    return response
+
+
+def _send_local(path: Path, key: str, mimetype: str | None):
+    """
+    Send one file with validators from a single stat(): ETag and
+    Last-Modified, 304s for conditional requests, 206s for Range requests.
+    With MEDIA_ACCEL set, only headers are returned and the proxy streams
+    the file, so the worker is free straight away. None if there is no file.
+    """
     try:
-        upload_root: Path = current_app.config["UPLOAD_ROOT"]
-    except KeyError:
-        return jsonify(error="Upload root not configured"), 500
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
 
-    # No path traversal, Path will normalise
-    safe_root = upload_root.resolve()
-    target = (safe_root / rel_path).resolve()
+    etag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    mimetype = mimetype or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    if MEDIA_ACCEL in ("x-accel", "x-sendfile"):
+        response = current_app.response_class(mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = st.st_mtime
+        # The proxy handles Range itself; 304s are answered here
+        response.make_conditional(request)
+        if response.status_code == 200:
+            if MEDIA_ACCEL == "x-accel":
+                response.headers["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX + quote(key)
+            else:
+                response.headers["X-Sendfile"] = os.path.abspath(path)
+        return response
+
+    return send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=etag,
+        last_modified=st.st_mtime,
+    )
 
-    if not str(target).startswith(str(safe_root)):
-        return jsonify(error="Invalid path"), 400
 
-    if not target.exists():
+def _serve_variant(storage: MediaStorage, rel_path: str):
+    """
+    /media/<original>?w=640[&fm=webp]: the variant covering that width, in
+    the format named by fm or else the best one the client Accepts.
+    """
+    width = request.args.get("w", type=int)
+    if width is None or width < 1:
+        return jsonify(error="Invalid width"), 400
+    if image_variants.is_variant(rel_path):
         return jsonify(error="Not found"), 404
 
-    return send_from_directory(safe_root, rel_path)
+    fmt = request.args.get("fm")
+    negotiated = fmt is None
+    if negotiated:
+        fmt = image_variants.negotiate_format(request.accept_mimetypes)
+    elif fmt not in image_variants.supported_formats():
+        return jsonify(error="Unsupported format"), 400
+
+    width = image_variants.snap_width(width)
+    key = image_variants.variant_path(rel_path, width, fmt)
+    if not storage.exists(key):
+        if not storage.exists(rel_path):
+            return jsonify(error="Not found"), 404
+        try:
+            image_variants.render_variant(storage, rel_path, width, fmt)
+        except Exception:
+            # Not something Pillow can decode; the original is better than
+            # nothing, but must not be cached as the variant
+            current_app.logger.exception("image variant failed for %s", rel_path)
+            return _send_media(storage, rel_path, cache=False)
+
+    return _send_media(
+        storage,
+        key,
+        mimetype=image_variants.content_type(fmt),
+        vary_accept=negotiated,
+    )
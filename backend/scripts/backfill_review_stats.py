@@ -0,0 +1,30 @@
+"""
+Rebuild the review aggregates on products (count, sum, histogram, average)
+from the reviews table. Run once after upgrading, and whenever reviews were
+removed outside the review routes (e.g. a user deleted with their reviews):
+    python3 -m backend.scripts.backfill_review_stats
+
+The running app sees the change at once when it shares its catalogue cache
+through CATALOGUE_CACHE_REDIS_URL (set it for this script too); otherwise
+its workers pick it up as their cache entries expire (CATALOGUE_CACHE_TTL).
+"""
+
+from backend.cache import catalogue_cache, init_catalogue_cache
+from backend.db.database import SessionLocal
+from backend.security.review_stats import recompute
+
+
+def main():
+    # Bumps must reach the running app through the shared backend
+    init_catalogue_cache()
+    with SessionLocal() as db:
+        updated = recompute(db)
+        db.commit()
+
+    # Listings and product pages embed the stats
+    catalogue_cache.bump_generation()
+    print(f"recomputed review stats for {updated} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Concurrency benchmark for stock reservation: N buyers in separate processes
+race for one variant with limited stock. Exits non-zero if it oversells.
+
+    python3 -m backend.scripts.bench_stock_reservation --buyers 64 --stock 10
+
+Uses a throwaway SQLite file unless --database-url is given (point it at a
+scratch database: the schema is created and a test product is inserted).
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+
+def _setup(url: str, stock: int) -> int:
+    from backend.db import database
+    from backend.models.models import Base, Product, Variant
+
+    database.init_engines(url)
+    Base.metadata.create_all(bind=database.engine)
+
+    with database.SessionLocal() as db:
+        product = Product(
+            sku=f"SKU-BENCH-{os.getpid()}-{time.time_ns()}",
+            name="Benchmark Product",
+            price_cents=1000,
+            currency="GBP",
+            active=True,
+            seo_slug=f"bench-{os.getpid()}-{time.time_ns()}",
+        )
+        product.variants.append(Variant(size="M", stock=stock))
+        db.add(product)
+        db.commit()
+        return product.variants[0].id
+
+
+def _buyer(url: str, variant_id: int, qty: int, start, results) -> None:
+    from backend.db import database
+    from backend.security.inventory import OutOfStock, reserve_stock
+
+    database.init_engines(url)
+    start.wait()
+
+    began = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        reserve_stock(db, [(variant_id, qty)])
+        db.commit()
+        ok = True
+    except OutOfStock:
+        db.rollback()
+        ok = False
+    finally:
+        db.close()
+    results.put((ok, time.perf_counter() - began))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--buyers", type=int, default=64)
+    parser.add_argument("--stock", type=int, default=10)
+    parser.add_argument("--qty", type=int, default=1)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    variant_id = _setup(url, args.stock)
+
+    start = mp.Barrier(args.buyers)
+    results = mp.Queue()
+    buyers = [
+        mp.Process(target=_buyer, args=(url, variant_id, args.qty, start, results))
+        for _ in range(args.buyers)
+    ]
+
+    began = time.perf_counter()
+    for p in buyers:
+        p.start()
+    outcomes = [results.get() for _ in buyers]
+    for p in buyers:
+        p.join()
+    elapsed = time.perf_counter() - began
+
+    from backend.db import database
+    from backend.models.models import Variant
+
+    with database.SessionLocal() as db:
+        left = db.get(Variant, variant_id).stock
+
+    sold = sum(1 for ok, _ in outcomes if ok)
+    latencies = sorted(t for _, t in outcomes)
+    expected = min(args.buyers, args.stock // args.qty)
+
+    print(f"buyers={args.buyers} stock={args.stock} qty={args.qty}")
+    print(f"sold={sold} expected={expected} stock_left={left}")
+    print(
+        f"elapsed={elapsed:.3f}s "
+        f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+        f"max={latencies[-1] * 1000:.1f}ms"
+    )
+
+    if left < 0 or sold != expected or left != args.stock - sold * args.qty:
+        print("FAIL: stock and sales do not add up")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == "__main__":
+    main()
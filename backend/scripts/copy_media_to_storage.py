@@ -0,0 +1,45 @@
+"""
+Copy every file under UPLOAD_ROOT into the configured media storage
+(MEDIA_STORAGE, see backend.storage), skipping keys that already exist.
+Run once when moving from local disk to a bucket, before switching the app
+over:
+    MEDIA_STORAGE=s3 S3_BUCKET=... python3 -m backend.scripts.copy_media_to_storage
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from backend.config import UPLOAD_ROOT
+from backend.storage import LocalStorage, storage_from_env
+
+
+def main():
+    root = Path(UPLOAD_ROOT)
+    storage = storage_from_env(root)
+    if isinstance(storage, LocalStorage):
+        print("MEDIA_STORAGE is local; nothing to copy")
+        return
+
+    copied = skipped = 0
+    for path in sorted(root.rglob("*")):
+        # Temp files of uploads in progress start with a dot
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        key = path.relative_to(root).as_posix()
+        if storage.exists(key):
+            skipped += 1
+            continue
+        # save() consumes its source, so hand it a copy
+        fd, tmp = tempfile.mkstemp(prefix=".copy-")
+        os.close(fd)
+        shutil.copyfile(path, tmp)
+        storage.save(key, Path(tmp))
+        copied += 1
+
+    print(f"copied {copied} files to media storage ({skipped} already there)")
+
+
+if __name__ == "__main__":
+    main()
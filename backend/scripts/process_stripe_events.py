@@ -0,0 +1,30 @@
+"""
+Apply queued Stripe webhook events from the stripe_events inbox.
+
+The web app applies events in background threads as they arrive; run this
+to catch up after a restart, or with --loop as a dedicated worker process
+(then set STRIPE_INBOX_WORKERS=0 for the web app):
+    python3 -m backend.scripts.process_stripe_events
+    python3 -m backend.scripts.process_stripe_events --loop
+"""
+
+import argparse
+
+from backend.security.stripe_inbox import stripe_inbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--loop", action="store_true", help="keep running")
+    args = parser.parse_args()
+
+    if args.loop:
+        stripe_inbox.run()
+        return
+
+    handled = stripe_inbox.drain()
+    print(f"handled {handled} stripe events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Archive and delete raw analytics events older than the retention window.
+
+    python3 -m backend.scripts.prune_analytics --days 90
+
+Run the rollup first; only rolled up events are pruned.
+"""
+
+import argparse
+from pathlib import Path
+
+from backend.security.analytics_retention import prune_events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=None,
+                        help="retention in days (default ANALYTICS_RETENTION_DAYS or 90)")
+    parser.add_argument("--archive-dir", type=Path, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    removed = prune_events(args.days, args.archive_dir, batch_size=args.batch_size)
+    for table, n in removed.items():
+        print(f"{table}: archived and deleted {n} rows")
+
+
+if __name__ == "__main__":
+    main()
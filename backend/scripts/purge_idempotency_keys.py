@@ -0,0 +1,17 @@
+"""
+Delete expired Idempotency-Key records.
+
+Run periodically (e.g. hourly from cron):
+    python3 -m backend.scripts.purge_idempotency_keys
+"""
+
+from backend.security.idempotency import purge_expired
+
+
+def main():
+    removed = purge_expired()
+    print(f"removed {removed} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
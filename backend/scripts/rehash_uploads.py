@@ -0,0 +1,120 @@
+"""
+Move uploads stored under random names to content-addressed paths
+(products/ab/cd/<sha256>.ext) and point product and profile image URLs at
+them. Duplicates collapse into one file. Old variants are removed; /media
+renders new ones on demand.
+
+New files are written and the database updated before any old file is
+deleted, so an interrupted run can simply be started again:
+    python3 -m backend.scripts.rehash_uploads --dry-run
+    python3 -m backend.scripts.rehash_uploads
+
+The running app sees the change at once when it shares its catalogue cache
+through CATALOGUE_CACHE_REDIS_URL (set it for this script too); otherwise
+its workers pick it up as their cache entries expire (CATALOGUE_CACHE_TTL).
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import text
+
+from backend.cache import catalogue_cache, init_catalogue_cache
+from backend.config import UPLOAD_ROOT
+from backend.db.database import SessionLocal
+from backend.security.image_variants import is_variant
+from backend.security.uploads import (
+    ALLOWED_EXTENSIONS,
+    canonical_ext,
+    content_path,
+    is_content_addressed,
+)
+
+# Columns that hold /media/... URLs
+_URL_COLUMNS = (
+    ("products", "hero_image_url"),
+    ("product_images", "url"),
+    ("profiles", "avatar_url"),
+)
+
+
+def _legacy_uploads(root: Path):
+    for path in sorted(root.rglob("*")):
+        rel_path = path.relative_to(root).as_posix()
+        ext = path.suffix.lstrip(".").lower()
+        if (
+            path.is_file()
+            and ext in ALLOWED_EXTENSIONS
+            and not is_variant(rel_path)
+            and not is_content_addressed(rel_path)
+        ):
+            yield path, rel_path
+
+
+def _copy_into_place(source: Path, target: Path) -> None:
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".upload-")
+    os.close(fd)
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="only report")
+    args = parser.parse_args()
+
+    # Bumps must reach the running app through the shared backend
+    init_catalogue_cache()
+    root = Path(UPLOAD_ROOT)
+    moves: dict[Path, tuple[str, str]] = {}
+    for path, rel_path in _legacy_uploads(root):
+        with path.open("rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        subdir = rel_path.split("/", 1)[0] if "/" in rel_path else "products"
+        new_rel = content_path(digest, canonical_ext(path.suffix[1:]), subdir)
+        moves[path] = (rel_path, new_rel)
+        print(f"{rel_path} -> {new_rel}")
+
+    if args.dry_run or not moves:
+        print(f"{len(moves)} uploads to rehash")
+        return
+
+    for path, (_, new_rel) in moves.items():
+        _copy_into_place(path, root / new_rel)
+
+    with SessionLocal() as db:
+        for old_rel, new_rel in moves.values():
+            for table, column in _URL_COLUMNS:
+                db.execute(
+                    text(
+                        f"UPDATE {table} SET {column} = REPLACE({column}, :old, :new) "
+                        f"WHERE {column} LIKE :pattern"
+                    ),
+                    {
+                        "old": f"/media/{old_rel}",
+                        "new": f"/media/{new_rel}",
+                        "pattern": f"%/media/{old_rel}",
+                    },
+                )
+        db.commit()
+    # Listings and product pages embed hero_image_url
+    catalogue_cache.bump_generation()
+
+    for path in moves:
+        for variant in path.parent.glob(f"{path.stem}.w*.*"):
+            if is_variant(variant.relative_to(root).as_posix()):
+                variant.unlink()
+        path.unlink()
+
+    print(f"rehashed {len(moves)} uploads into {len(set(n for _, n in moves.values()))} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Cancel unpaid card orders whose stock reservation has expired and put
+their stock back.
+
+Run periodically (e.g. every minute from cron):
+    python3 -m backend.scripts.release_reservations
+"""
+
+from backend.security.inventory import release_expired
+
+
+def main():
+    released = release_expired()
+    print(f"released {released} expired reservations")
+
+
+if __name__ == "__main__":
+    main()
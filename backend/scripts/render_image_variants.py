@@ -0,0 +1,36 @@
+"""
+Render the missing grid-sized variants (see backend.security.image_variants)
+for every original under UPLOAD_ROOT (local media storage). New uploads get theirs in the
+background and /media renders any that are missing on first request, so
+this is only needed to warm existing images after upgrading:
+    python3 -m backend.scripts.render_image_variants
+"""
+
+from pathlib import Path
+
+from backend.config import UPLOAD_ROOT
+from backend.security.image_variants import is_variant, render_all
+from backend.security.uploads import ALLOWED_EXTENSIONS
+from backend.storage import LocalStorage
+
+
+def main():
+    root = Path(UPLOAD_ROOT)
+    storage = LocalStorage(root)
+    rendered = failed = 0
+    for path in sorted(root.rglob("*")):
+        rel_path = path.relative_to(root).as_posix()
+        ext = path.suffix.lstrip(".").lower()
+        if not path.is_file() or ext not in ALLOWED_EXTENSIONS or is_variant(rel_path):
+            continue
+        try:
+            rendered += render_all(storage, rel_path)
+        except Exception as exc:
+            failed += 1
+            print(f"skipped {rel_path}: {exc}")
+
+    print(f"rendered {rendered} image variants ({failed} originals skipped)")
+
+
+if __name__ == "__main__":
+    main()
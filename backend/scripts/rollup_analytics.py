@@ -0,0 +1,18 @@
+"""
+Fold new raw analytics events into the hourly/daily rollup tables.
+
+Run periodically (e.g. every minute from cron):
+    python3 -m backend.scripts.rollup_analytics
+"""
+
+from backend.security.analytics_rollup import run_rollup
+
+
+def main():
+    processed = run_rollup()
+    for source, n in processed.items():
+        print(f"{source}: rolled up {n} events")
+
+
+if __name__ == "__main__":
+    main()
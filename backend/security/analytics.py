@@ -2,8 +2,8 @@ from typing import Optional, Any
 
 from flask import g, request
 
-from backend.db.database import SessionLocal
-from backend.models.models import ViewEvent, InteractionEvent
+from backend.models.models import ViewEvent, InteractionEvent, now
+from backend.security.event_writer import event_writer
 
 
 def _get_session_id() -> str:
@@ -33,30 +33,24 @@ def log_view(path: str, product_id: Optional[int] = None) -> None:
     if request.method == "OPTIONS":
         return
 
-    db = SessionLocal()
-    try:
-        user = getattr(g, "current_user", None)
-        user_id = getattr(user, "id", None)
-
-        session_id = _get_session_id()
-
-        ev = ViewEvent(
-            user_id=user_id,
-            session_id=session_id,
-            path=path,
-            product_id=product_id,
-            referrer=request.referrer,
-            user_agent=request.headers.get("User-Agent"),
-            # occurred_at has a default of now(), so we could omit it,
-            # but setting it explicitly is also fine if you prefer:
-            # occurred_at=datetime.utcnow(),
-        )
-        db.add(ev)
-        db.commit()
-    except Exception:
-        db.rollback()
-    finally:
-        db.close()
+    user = getattr(g, "current_user", None)
+    user_id = getattr(user, "id", None)
+
+    # Written later in a batch by the background writer, so capture the
+    # request data and timestamp now. Lengths are clipped to the column
+    # sizes so one odd row cannot fail a whole batch.
+    event_writer.enqueue(
+        ViewEvent,
+        {
+            "user_id": user_id,
+            "session_id": _get_session_id()[:64],
+            "path": path[:500],
+            "product_id": product_id,
+            "referrer": request.referrer[:500] if request.referrer else None,
+            "user_agent": (request.headers.get("User-Agent") or "")[:300] or None,
+            "occurred_at": now(),
+        },
+    )
 
 
 def log_interaction(action: str, metadata: Optional[Any] = None) -> None:
@@ -69,22 +63,16 @@ def log_interaction(action: str, metadata: Optional[Any] = None) -> None:
     if request.method == "OPTIONS":
         return
 
-    db = SessionLocal()
-    try:
-        user = getattr(g, "current_user", None)
-        user_id = getattr(user, "id", None)
-        session_id = _get_session_id()
-
-        ev = InteractionEvent(
-            user_id=user_id,
-            session_id=session_id,
-            event_type=action,  # maps your old "action" param to the event_type column
-            event_data=metadata,  # maps "metadata" to event_data JSON column
-            # occurred_at default is now(), so no need to pass it
-        )
-        db.add(ev)
-        db.commit()
-    except Exception:
-        db.rollback()
-    finally:
-        db.close()
+    user = getattr(g, "current_user", None)
+    user_id = getattr(user, "id", None)
+
+    event_writer.enqueue(
+        InteractionEvent,
+        {
+            "user_id": user_id,
+            "session_id": _get_session_id()[:64],
+            "event_type": action[:60],  # maps your old "action" param to event_type
+            "event_data": metadata,  # maps "metadata" to event_data JSON column
+            "occurred_at": now(),
+        },
+    )
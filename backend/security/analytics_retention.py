@@ -0,0 +1,130 @@
+"""
+Retention for raw analytics events.
+
+Events older than the retention window are appended to gzip-compressed
+NDJSON archives (one file per table per month) and then deleted in small
+batches, each in its own short transaction, so the app's writers are never
+locked out for long.
+
+Only events already folded into the rollups (id <= rollup watermark) are
+archived, so the summaries stay complete after raw rows are gone.
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, select
+
+from backend.db.database import SessionLocal
+from backend.models.models import (
+    AnalyticsRollupState,
+    InteractionEvent,
+    ViewEvent,
+    now,
+)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_MODELS = {
+    "view_events": ViewEvent,
+    "interaction_events": InteractionEvent,
+}
+
+
+def default_archive_dir() -> Path:
+    return Path(os.getenv("ANALYTICS_ARCHIVE_DIR", BACKEND_DIR / "archive"))
+
+
+def _archive_path(archive_dir: Path, table: str, occurred_at: datetime) -> Path:
+    return archive_dir / table / f"{table}-{occurred_at:%Y-%m}.ndjson.gz"
+
+
+def _row_to_json(model, event) -> str:
+    item = {}
+    for column in model.__table__.columns:
+        value = getattr(event, column.key)
+        item[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(item, default=str)
+
+
+def _write_archive(archive_dir: Path, table: str, model, events) -> None:
+    """
+    Append events to their monthly archives. Appending creates a new gzip
+    member, which gzip readers concatenate transparently.
+    """
+    by_file: dict[Path, list[str]] = {}
+    for event in events:
+        path = _archive_path(archive_dir, table, event.occurred_at)
+        by_file.setdefault(path, []).append(_row_to_json(model, event))
+
+    for path, lines in by_file.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                gz.write(("\n".join(lines) + "\n").encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def prune_table(
+    table: str,
+    days: int,
+    archive_dir: Path | None = None,
+    batch_size: int = 1000,
+    pause: float = 0.05,
+) -> int:
+    """
+    Archive and delete events in `table` older than `days`. Returns the
+    number of rows removed.
+
+    Rows are written to the archive before they are deleted; if the process
+    dies in between, the next run archives them again, so archive readers
+    should de-duplicate on id.
+    """
+    model = _MODELS[table]
+    archive_dir = archive_dir or default_archive_dir()
+    cutoff = now() - timedelta(days=days)
+    removed = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            state = db.get(AnalyticsRollupState, table)
+            watermark = state.last_event_id if state else 0
+
+            events = (
+                db.execute(
+                    select(model)
+                    .where(model.occurred_at < cutoff, model.id <= watermark)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not events:
+                return removed
+
+            _write_archive(archive_dir, table, model, events)
+
+            db.execute(delete(model).where(model.id.in_([e.id for e in events])))
+            db.commit()
+            removed += len(events)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Give request writers a window between batches
+        if pause:
+            time.sleep(pause)
+
+
+def prune_events(days: int | None = None, archive_dir: Path | None = None, **kw) -> dict:
+    days = days if days is not None else int(os.getenv("ANALYTICS_RETENTION_DAYS", "90"))
+    return {table: prune_table(table, days, archive_dir, **kw) for table in _MODELS}
@@ -0,0 +1,248 @@
+"""
+Incremental rollup of raw analytics events into hourly/daily counts.
+
+Each run folds the events after the stored watermark into
+analytics_rollups (and analytics_session_buckets for unique sessions),
+then advances the watermark in the same transaction, so every raw event
+is counted exactly once.
+
+With several writers ids are not committed in order: id N+1 can be
+visible while N is still in flight. The watermark therefore only moves
+over ids with no gap below them; a missing id is skipped once it has
+stayed missing for the settle window (its transaction rolled back).
+"""
+
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from backend.db.database import SessionLocal
+from backend.models.models import (
+    AnalyticsRollup,
+    AnalyticsRollupState,
+    AnalyticsSessionBucket,
+    InteractionEvent,
+    ViewEvent,
+    now,
+)
+
+GRANULARITIES = ("hour", "day")
+
+# Product pages are fetched as /api/products/<id>; sub-resources like
+# /reviews are not counted as a product view.
+_PRODUCT_PATH_RE = re.compile(r"^/api/products/(\d+)$")
+
+# Rows per upsert statement (keeps bound params well under SQLite's limit)
+_UPSERT_CHUNK = 500
+
+# Session ids per IN (...) lookup, for the same reason
+_SESSION_CHUNK = 500
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _product_key(row) -> str | None:
+    if row.product_id is not None:
+        return str(row.product_id)
+    match = _PRODUCT_PATH_RE.match(row.path or "")
+    return match.group(1) if match else None
+
+
+def _view_counts(rows) -> tuple[Counter, dict]:
+    counts: Counter = Counter()
+    sessions: dict[tuple, set] = defaultdict(set)
+
+    for row in rows:
+        product = _product_key(row)
+        for gran in GRANULARITIES:
+            bucket = bucket_start(row.occurred_at, gran)
+            counts[(gran, bucket, "views", "")] += 1
+            counts[(gran, bucket, "path", row.path[:500])] += 1
+            if product is not None:
+                counts[(gran, bucket, "product", product)] += 1
+            sessions[(gran, bucket)].add(row.session_id)
+
+    return counts, sessions
+
+
+def _interaction_counts(rows) -> tuple[Counter, dict]:
+    counts: Counter = Counter()
+    for row in rows:
+        for gran in GRANULARITIES:
+            bucket = bucket_start(row.occurred_at, gran)
+            counts[(gran, bucket, "interactions", "")] += 1
+            counts[(gran, bucket, "event_type", row.event_type)] += 1
+    return counts, {}
+
+
+_SOURCES = {
+    "view_events": (
+        ViewEvent,
+        [ViewEvent.id, ViewEvent.occurred_at, ViewEvent.path,
+         ViewEvent.product_id, ViewEvent.session_id],
+        _view_counts,
+    ),
+    "interaction_events": (
+        InteractionEvent,
+        [InteractionEvent.id, InteractionEvent.occurred_at,
+         InteractionEvent.event_type],
+        _interaction_counts,
+    ),
+}
+
+
+def _insert_for(db):
+    if db.get_bind().dialect.name == "postgresql":
+        return pg_insert
+    return sqlite_insert
+
+
+def _count_new_sessions(db, sessions: dict, counts: Counter) -> None:
+    """
+    Record sessions per bucket; only sessions not seen before in that bucket
+    add to its unique session count.
+    """
+    for (gran, bucket), session_ids in sessions.items():
+        ordered = sorted(session_ids)
+        existing = set()
+        for i in range(0, len(ordered), _SESSION_CHUNK):
+            existing.update(
+                db.execute(
+                    select(AnalyticsSessionBucket.session_id).where(
+                        AnalyticsSessionBucket.granularity == gran,
+                        AnalyticsSessionBucket.bucket_start == bucket,
+                        AnalyticsSessionBucket.session_id.in_(
+                            ordered[i : i + _SESSION_CHUNK]
+                        ),
+                    )
+                ).scalars()
+            )
+        new = session_ids - existing
+        if not new:
+            continue
+
+        db.execute(
+            AnalyticsSessionBucket.__table__.insert(),
+            [{"granularity": gran, "bucket_start": bucket, "session_id": s} for s in new],
+        )
+        counts[(gran, bucket, "sessions", "")] += len(new)
+
+
+def _upsert_counts(db, counts: Counter) -> None:
+    insert = _insert_for(db)
+    values = [
+        {
+            "granularity": gran,
+            "bucket_start": bucket,
+            "dimension": dim,
+            "key": key,
+            "count": n,
+        }
+        for (gran, bucket, dim, key), n in counts.items()
+    ]
+
+    for i in range(0, len(values), _UPSERT_CHUNK):
+        stmt = insert(AnalyticsRollup).values(values[i : i + _UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["granularity", "bucket_start", "dimension", "key"],
+            set_={"count": AnalyticsRollup.count + stmt.excluded.count},
+        )
+        db.execute(stmt)
+
+
+def _contiguous(rows, state, started: datetime, cutoff: datetime) -> tuple[list, bool]:
+    """
+    The rows that can be folded without leaving a lower id behind, and
+    whether the scan stopped at a missing id.
+
+    Only the gap right after the watermark has a known age (gap_seen_at,
+    or this run if it is new); it is stepped over once that is older than
+    the cutoff. Any later gap is new and stops the scan.
+    """
+    seen_at = state.gap_seen_at or started
+    expected = state.last_event_id + 1
+    ready = []
+    for row in rows:
+        if row.id != expected:
+            if ready or seen_at > cutoff:
+                return ready, True
+        ready.append(row)
+        expected = row.id + 1
+    return ready, False
+
+
+def rollup_batch(source: str, batch_size: int = 10000, settle_seconds: int = 10) -> int:
+    """
+    Fold up to batch_size events after the watermark into the rollups.
+    Returns the number of raw events consumed.
+
+    The batch stops at the first missing id: its transaction may still be
+    in flight. A gap that is still there settle_seconds after it was first
+    seen is taken to be a rollback and skipped.
+    """
+    model, columns, aggregate = _SOURCES[source]
+    started = now()
+    cutoff = started - timedelta(seconds=settle_seconds)
+
+    db = SessionLocal()
+    try:
+        state = db.get(AnalyticsRollupState, source)
+        if state is None:
+            state = AnalyticsRollupState(source=source, last_event_id=0)
+            db.add(state)
+
+        rows = db.execute(
+            select(*columns)
+            .where(model.id > state.last_event_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        ).all()
+
+        ready, stopped_at_gap = _contiguous(rows, state, started, cutoff)
+
+        if not ready:
+            if stopped_at_gap and state.gap_seen_at is None:
+                state.gap_seen_at = started
+                state.updated_at = started
+                db.commit()
+            else:
+                db.rollback()
+            return 0
+
+        counts, sessions = aggregate(ready)
+        _count_new_sessions(db, sessions, counts)
+        _upsert_counts(db, counts)
+
+        state.last_event_id = ready[-1].id
+        # The watermark moved, so any gap now ahead of it is a new one
+        state.gap_seen_at = started if stopped_at_gap else None
+        state.updated_at = now()
+        db.commit()
+        return len(ready)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_rollup(batch_size: int = 10000, settle_seconds: int = 10) -> dict:
+    """Catch the rollups up with all settled raw events."""
+    processed = {}
+    for source in _SOURCES:
+        total = 0
+        while True:
+            n = rollup_batch(source, batch_size, settle_seconds)
+            total += n
+            if n < batch_size:
+                break
+        processed[source] = total
+    return processed
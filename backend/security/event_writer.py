@@ -0,0 +1,176 @@
+"""
+Buffered, asynchronous writer for analytics events.
+
+Request handlers only build a row dict and put it on a bounded queue; a
+background thread drains the queue and bulk-inserts rows in batches. When the
+queue is full, events are dropped (and counted) instead of slowing requests.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from sqlalchemy import insert
+
+from backend.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class EventWriter:
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    # -------------------------
+    # Producer side (request threads)
+    # -------------------------
+
+    def enqueue(self, model, row: dict[str, Any]) -> bool:
+        """
+        Queue one row for `model`. Never blocks; returns False if the event
+        was dropped because the buffer is full.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((model, row))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is written (or timeout)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush what is buffered and stop the background thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "enqueued": counters.get("enqueued", 0),
+            "written": counters.get("written", 0),
+            "dropped": counters.get("dropped", 0),
+            "failed": counters.get("failed", 0),
+            "batches": counters.get("batches", 0),
+        }
+
+    # -------------------------
+    # Consumer side (background thread)
+    # -------------------------
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive a fork (gunicorn preload), so start one
+        # per worker process on first use.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="analytics-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._stop.is_set():
+                return
+
+    def _next_batch(self) -> list:
+        """
+        Collect up to batch_size rows, waiting at most flush_interval after
+        the first one arrives.
+        """
+        batch: list = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                # On shutdown, drain without waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        rows_by_model: dict[Any, list[dict]] = {}
+        for model, row in batch:
+            rows_by_model.setdefault(model, []).append(row)
+
+        db = SessionLocal()
+        try:
+            for model, rows in rows_by_model.items():
+                db.execute(insert(model), rows)
+            db.commit()
+            self._count("written", len(batch))
+            self._count("batches")
+        except Exception:
+            db.rollback()
+            self._count("failed", len(batch))
+            logger.exception("analytics writer: failed to insert %d events", len(batch))
+        finally:
+            db.close()
+
+    def _count(self, what: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[what] += n
+
+
+event_writer = EventWriter(
+    max_queue=int(os.getenv("ANALYTICS_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0")),
+)
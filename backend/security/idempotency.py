@@ -0,0 +1,254 @@
+"""
+Idempotency-Key support for POST endpoints with side effects.
+
+The first request with a key claims it by inserting an 'in_progress' row
+(the unique constraint decides the winner), runs the view and stores the
+response. A retry with the same key and body replays the stored response
+instead of running the view again; a retry that arrives while the first is
+still running waits for it. Keys are scoped to the user and endpoint and
+expire after IDEMPOTENCY_KEY_TTL.
+
+Server errors (5xx) and exceptions release the key, so the client can retry
+once the failure has been rolled back. A claim only lasts IDEMPOTENCY_LEASE
+until the response is stored: if the process dies in between (the views
+commit their own work, so the two cannot share a transaction), a retry
+takes the key over once the lease has run out instead of being told the
+request is still in progress for a day. Keep the lease longer than any
+request can run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from functools import wraps
+
+from flask import Response, g, jsonify, make_response, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.db.database import SessionLocal
+from backend.db.session import get_db
+from backend.models.models import IdempotencyKey, now
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+# How long a claimed key stays 'in_progress' before a retry may take it over
+IDEMPOTENCY_LEASE = timedelta(seconds=int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120")))
+# How long a duplicate waits for the original request to finish
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+_MAX_KEY_LENGTH = 255
+_POLL_INTERVAL = 0.05
+
+
+def _request_hash() -> str:
+    """Hash of the body; JSON is canonicalised so key order does not matter."""
+    body = request.get_json(silent=True)
+    raw = (
+        json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+        if body is not None
+        else request.get_data()
+    )
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _find(db, user_id: int, endpoint: str, key: str) -> IdempotencyKey | None:
+    return db.execute(
+        select(IdempotencyKey)
+        .where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.endpoint == endpoint,
+            IdempotencyKey.key == key,
+        )
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
+def _claim(db, user_id: int, endpoint: str, key: str, request_hash: str):
+    """
+    Insert the in-progress row. Returns (claim id, None) when this request
+    owns the key, otherwise (None, existing row).
+    """
+    while True:
+        claim = IdempotencyKey(
+            user_id=user_id,
+            endpoint=endpoint,
+            key=key,
+            request_hash=request_hash,
+            status="in_progress",
+            expires_at=now() + IDEMPOTENCY_LEASE,
+        )
+        db.add(claim)
+        try:
+            db.flush()
+            claim_id = claim.id
+            db.commit()
+            return claim_id, None
+        except IntegrityError:
+            db.rollback()
+
+        existing = _find(db, user_id, endpoint, key)
+        if existing is None:
+            # Released between our insert and the lookup; try again
+            continue
+        if existing.expires_at <= now():
+            db.delete(existing)
+            db.commit()
+            continue
+        return None, existing
+
+
+def _wait_for(user_id: int, endpoint: str, key: str) -> IdempotencyKey | None:
+    """
+    Poll until the original request stores its response (or give up).
+    Polls on the read pool so the original request can have the writer.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    with SessionLocal(info={"read_only": True}) as reader:
+        while True:
+            row = _find(reader, user_id, endpoint, key)
+            if row is None or row.status != "in_progress":
+                return row
+            if time.monotonic() >= deadline:
+                return row
+            # End the read so the next poll sees the other request's commit
+            reader.rollback()
+            time.sleep(_POLL_INTERVAL)
+
+
+def _replay(row: IdempotencyKey) -> Response:
+    response = Response(
+        row.response_body,
+        status=row.response_status,
+        mimetype=row.response_mimetype or "application/json",
+    )
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _release(claim_id: int) -> None:
+    db = get_db()
+    db.rollback()
+    db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.id == claim_id, IdempotencyKey.status == "in_progress"
+        )
+    )
+    db.commit()
+
+
+def idempotent(view):
+    """
+    Honour an optional Idempotency-Key header on a logged-in POST endpoint.
+    Place it under the auth decorator, it needs g.current_user.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(*args, **kwargs)
+
+        key = key.strip()
+        if not key or len(key) > _MAX_KEY_LENGTH:
+            return jsonify(
+                {"ok": False, "error": "Idempotency-Key must be 1-255 characters"}
+            ), 400
+
+        user_id = g.current_user.id
+        endpoint = request.path
+        request_hash = _request_hash()
+
+        db = get_db()
+        claim_id, existing = _claim(db, user_id, endpoint, key, request_hash)
+
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                return jsonify(
+                    {
+                        "ok": False,
+                        "error": "Idempotency-Key was already used with a different request",
+                    }
+                ), 422
+
+            db.rollback()
+            done = _wait_for(user_id, endpoint, key)
+            if done is None:
+                # The original failed and released the key; run it ourselves
+                return wrapper(*args, **kwargs)
+            if done.status == "in_progress" and done.expires_at <= now():
+                # The original died before storing its response
+                return wrapper(*args, **kwargs)
+            if done.status == "in_progress":
+                response = jsonify(
+                    {"ok": False, "error": "A request with this key is still in progress"}
+                )
+                response.status_code = 409
+                response.headers["Retry-After"] = "1"
+                return response
+            return _replay(done)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(claim_id)
+            raise
+
+        if response.status_code >= 500:
+            _release(claim_id)
+            return response
+
+        # Whatever the view left uncommitted would be discarded at teardown
+        # anyway; roll it back so only the stored response is committed here
+        db.rollback()
+        stored = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == claim_id, IdempotencyKey.status == "in_progress"
+            )
+            .values(
+                status="done",
+                expires_at=now() + IDEMPOTENCY_KEY_TTL,
+                response_status=response.status_code,
+                response_body=response.get_data(as_text=True),
+                response_mimetype=response.mimetype,
+            )
+        ).rowcount
+        db.commit()
+        if stored != 1:
+            # The view outlived IDEMPOTENCY_LEASE and the key was taken over
+            # or purged; its work is committed, so answer without storing
+            logger.warning(
+                "idempotency: lost the lease on key %r for %s (user %s), "
+                "response not stored",
+                key, endpoint, user_id,
+            )
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    """Delete expired keys in small batches. Returns the number removed."""
+    removed = 0
+    while True:
+        db = SessionLocal()
+        try:
+            ids = db.execute(
+                select(IdempotencyKey.id)
+                .where(IdempotencyKey.expires_at <= now())
+                .limit(batch_size)
+            ).scalars().all()
+            if ids:
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+                db.commit()
+        finally:
+            db.close()
+
+        removed += len(ids)
+        if len(ids) < batch_size:
+            return removed
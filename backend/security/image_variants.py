@@ -0,0 +1,229 @@
+"""
+Resized derivatives of uploaded images for product grids.
+
+Each original gets fixed-width variants stored next to it, e.g.
+
+    products/abc123.png -> products/abc123.w640.webp
+                           products/abc123.w640.jpg   (fallback)
+
+A small thread pool renders them after an upload, so the request returns
+straight away; /media/<path>?w=... renders a missing variant on the spot
+(first request after a deploy, or images uploaded before this existed).
+Requested widths are snapped to the configured set, so clients cannot make
+us store an unbounded number of sizes.
+
+AVIF is produced only when Pillow can write it (Pillow >= 11.3, or the
+optional pillow-avif-plugin package); otherwise WebP + JPEG are used.
+"""
+
+import atexit
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from backend.storage import MediaStorage
+
+try:
+    import pillow_avif  # noqa: F401  optional dependency, registers AVIF
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS: tuple[int, ...] = tuple(
+    sorted(
+        int(w)
+        for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960,1280").split(",")
+        if w.strip()
+    )
+)
+
+# Pillow format name and content type per variant extension
+_FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+}
+_SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def supported_formats() -> tuple[str, ...]:
+    """Variant formats this Pillow build can write, best first."""
+    Image.init()
+    return tuple(ext for ext, (name, _) in _FORMATS.items() if name in Image.SAVE)
+
+
+def content_type(fmt: str) -> str:
+    return _FORMATS[fmt][1]
+
+
+def snap_width(requested: int) -> int:
+    """Smallest configured width that covers `requested` (or the largest)."""
+    for width in VARIANT_WIDTHS:
+        if width >= requested:
+            return width
+    return VARIANT_WIDTHS[-1]
+
+
+def negotiate_format(accept) -> str:
+    """Pick the best variant format for a request's Accept header."""
+    available = supported_formats()
+    for fmt in ("avif", "webp"):
+        if fmt in available and accept.quality(content_type(fmt)) > 0:
+            return fmt
+    return "jpg"
+
+
+def variant_path(rel_path: str, width: int, fmt: str) -> str:
+    """'products/abc.png', 640, 'webp' -> 'products/abc.w640.webp'"""
+    stem = rel_path.rsplit(".", 1)[0]
+    return f"{stem}.w{width}.{fmt}"
+
+
+def is_variant(rel_path: str) -> bool:
+    parts = rel_path.rsplit(".", 2)
+    return (
+        len(parts) == 3
+        and parts[2] in _FORMATS
+        and parts[1][:1] == "w"
+        and parts[1][1:].isdigit()
+    )
+
+
+def _load(storage: MediaStorage, rel_path: str) -> Image.Image:
+    with storage.open(rel_path) as f, Image.open(f) as im:
+        # Phone photos are stored sideways with an EXIF rotation flag
+        im = ImageOps.exif_transpose(im)
+        im.load()
+    return im
+
+
+def _resize(im: Image.Image, width: int) -> Image.Image:
+    if im.width <= width:
+        # Never upscale; the variant is just re-encoded
+        return im.copy()
+    height = max(1, round(im.height * width / im.width))
+    return im.resize((width, height), Image.LANCZOS)
+
+
+def _encode(im: Image.Image, fmt: str, storage: MediaStorage, key: str) -> None:
+    if fmt == "jpg" and im.has_transparency_data:
+        # JPEG has no alpha: flatten onto white, as the product cards are
+        im = im.convert("RGBA")
+        background = Image.new("RGB", im.size, (255, 255, 255))
+        background.paste(im, mask=im.getchannel("A"))
+        im = background
+    elif im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA" if im.has_transparency_data else "RGB")
+
+    # Encode to a temp file and hand it to the storage, which renames it
+    # into place (local) or uploads it (S3), so a reader never sees half an
+    # image and two workers rendering the same variant do not corrupt it
+    fd, tmp = tempfile.mkstemp(dir=storage.scratch_dir, prefix=".variant-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            im.save(out, _FORMATS[fmt][0], **_SAVE_OPTIONS[fmt])
+        storage.save(key, Path(tmp), content_type=content_type(fmt))
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def render_variant(storage: MediaStorage, rel_path: str, width: int, fmt: str) -> str:
+    """Create one variant if it does not exist yet; returns its key."""
+    key = variant_path(rel_path, width, fmt)
+    if not storage.exists(key):
+        _encode(_resize(_load(storage, rel_path), width), fmt, storage, key)
+    return key
+
+
+def render_all(storage: MediaStorage, rel_path: str) -> int:
+    """Create every missing variant of one original. Returns how many."""
+    wanted = [
+        (width, fmt)
+        for width in VARIANT_WIDTHS
+        for fmt in supported_formats()
+        if not storage.exists(variant_path(rel_path, width, fmt))
+    ]
+    if not wanted:
+        return 0
+
+    im = _load(storage, rel_path)
+    for width in {w for w, _ in wanted}:
+        resized = _resize(im, width)
+        for fmt in (f for w, f in wanted if w == width):
+            _encode(resized, fmt, storage, variant_path(rel_path, width, fmt))
+    return len(wanted)
+
+
+class VariantPool:
+    """Renders variants in background threads (Pillow releases the GIL)."""
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+
+    def _ensure_started(self) -> ThreadPoolExecutor:
+        # One pool per worker process, as with the analytics writer
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pending = set()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="image-variants"
+                )
+                atexit.register(self.stop)
+            return self._executor
+
+    def submit(self, storage: MediaStorage, rel_path: str) -> None:
+        """Queue rendering every variant of a new upload."""
+        if self.workers <= 0:
+            # Rendered lazily by /media on first request instead
+            return
+        executor = self._ensure_started()
+        with self._lock:
+            if rel_path in self._pending:
+                return
+            self._pending.add(rel_path)
+            self._stats["queued"] += 1
+        executor.submit(self._run, storage, rel_path)
+
+    def _run(self, storage: MediaStorage, rel_path: str) -> None:
+        try:
+            rendered = render_all(storage, rel_path)
+            with self._lock:
+                self._stats["rendered"] += rendered
+        except Exception:
+            logger.exception("image variants: failed for %s", rel_path)
+            with self._lock:
+                self._stats["failed"] += 1
+        finally:
+            with self._lock:
+                self._pending.discard(rel_path)
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._pending), **self._stats}
+
+
+variant_pool = VariantPool(workers=int(os.getenv("IMAGE_VARIANT_WORKERS", "2")))
@@ -0,0 +1,177 @@
+"""
+Stock reservation against Variant.stock.
+
+Stock is taken with a conditional ``UPDATE ... WHERE stock >= :qty``. The
+database applies each one atomically, so concurrent checkouts can never push
+a variant below zero: the losers simply match no row. Every line of a cart
+is reserved in one executemany inside the caller's transaction, and the
+whole cart is rolled back if any line comes up short.
+
+Orders waiting for a card payment ('created') hold their stock until
+Order.reserved_until; release_expired() (run by the sweeper script) cancels
+the ones that were never paid and puts their stock back.
+
+Listings and facets only count variants in stock, so every commit that
+moves stock must bump the catalogue cache's stock generation. The functions
+here note the change on the session; call stock_committed() once the
+transaction is committed.
+"""
+
+import logging
+import os
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import select, text, update
+
+from backend.cache import catalogue_cache
+from backend.db.database import SessionLocal
+from backend.models.models import Order, OrderItem, Variant, now
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = timedelta(seconds=int(os.getenv("STOCK_RESERVATION_TTL", "900")))
+
+_TAKE_SQL = text(
+    "UPDATE variants SET stock = stock - :qty, updated_at = :now "
+    "WHERE id = :variant_id AND stock >= :qty"
+)
+_PUT_BACK_SQL = text(
+    "UPDATE variants SET stock = stock + :qty, updated_at = :now WHERE id = :variant_id"
+)
+
+
+class OutOfStock(Exception):
+    def __init__(self, variant_ids: list[int]):
+        super().__init__(f"not enough stock for variants {variant_ids}")
+        self.variant_ids = variant_ids
+
+
+def _by_variant(lines) -> list[dict]:
+    """One parameter set per variant, in id order so concurrent carts lock alike."""
+    totals: Counter = Counter()
+    for variant_id, qty in lines:
+        if variant_id is None:
+            # A product with no variants at all, which is not stock-tracked.
+            # Lines for products that have variants always carry one:
+            # PriceSnapshot.quote() fills in a sole variant and refuses the
+            # line when there are several.
+            continue
+        totals[variant_id] += qty
+    stamp = now()
+    return [
+        {"variant_id": v, "qty": q, "now": stamp} for v, q in sorted(totals.items())
+    ]
+
+
+def _mark_changed(db) -> None:
+    db.info["stock_changed"] = True
+
+
+def stock_committed(db) -> None:
+    """Bump the stock generation if this session changed stock since the last call."""
+    if db.info.pop("stock_changed", False):
+        catalogue_cache.stock_changed()
+
+
+def reserve_stock(db, lines) -> None:
+    """
+    Take stock for (variant_id, qty) pairs in the current transaction.
+
+    Raises OutOfStock if any variant is short; the caller must then roll
+    back, since lines that did fit may already have been decremented.
+    """
+    params = _by_variant(lines)
+    if not params:
+        return
+
+    # Cheap pre-check names the short variants in the common case; the
+    # conditional UPDATE below is what actually guarantees correctness
+    stock = dict(
+        db.execute(
+            select(Variant.id, Variant.stock).where(
+                Variant.id.in_([p["variant_id"] for p in params])
+            )
+        ).all()
+    )
+    short = [p["variant_id"] for p in params if stock.get(p["variant_id"], 0) < p["qty"]]
+    if short:
+        raise OutOfStock(short)
+
+    _mark_changed(db)
+    if db.get_bind().dialect.supports_sane_multi_rowcount:
+        taken = db.execute(_TAKE_SQL, params).rowcount
+        if taken != len(params):
+            # Lost a race after the pre-check; which line is unknown
+            raise OutOfStock([p["variant_id"] for p in params])
+        return
+
+    short = [p["variant_id"] for p in params if db.execute(_TAKE_SQL, p).rowcount != 1]
+    if short:
+        raise OutOfStock(short)
+
+
+def release_stock(db, lines) -> None:
+    """Give (variant_id, qty) pairs back, in the current transaction."""
+    params = _by_variant(lines)
+    if params:
+        _mark_changed(db)
+        db.execute(_PUT_BACK_SQL, params)
+
+
+def order_lines(db, order_id: int) -> list[tuple[int | None, int]]:
+    return db.execute(
+        select(OrderItem.variant_id, OrderItem.qty).where(OrderItem.order_id == order_id)
+    ).all()
+
+
+def cancel_reservation(db, order_id: int) -> bool:
+    """
+    Cancel a 'created' order and put its stock back, in the current
+    transaction. The status check in the UPDATE makes this safe against a
+    concurrent payment: only one of them can move the order out of 'created'.
+    """
+    moved = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == "created")
+        .values(status="cancelled", reserved_until=None)
+    ).rowcount
+    if moved != 1:
+        return False
+
+    release_stock(db, order_lines(db, order_id))
+    return True
+
+
+def release_expired(batch_size: int = 100) -> int:
+    """
+    Cancel unpaid orders whose reservation has expired and return their
+    stock. Each order is released in its own short transaction.
+    Returns the number of orders released.
+    """
+    released = 0
+    while True:
+        db = SessionLocal()
+        try:
+            expired = db.execute(
+                select(Order.id)
+                .where(Order.status == "created", Order.reserved_until < now())
+                .order_by(Order.reserved_until)
+                .limit(batch_size)
+            ).scalars().all()
+
+            for order_id in expired:
+                if cancel_reservation(db, order_id):
+                    released += 1
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            stock_committed(db)
+            db.close()
+
+        if len(expired) < batch_size:
+            if released:
+                logger.info("released stock for %d expired orders", released)
+            return released
@@ -1,7 +1,37 @@
+import os
+from dataclasses import dataclass
+
 from flask import g, session
-from backend.db.database import SessionLocal
+from backend.cache import TTLCache
+from backend.db.session import get_db, release_connection
 from backend.models import User
 
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    What request handlers get as g.current_user: just the fields RBAC and
+    the routes need, safe to share between requests.
+    """
+
+    id: int
+    email: str
+    role: str
+
+
+# user_id -> CurrentUser. Local to the process: explicit invalidation only
+# reaches this worker, the short TTL bounds staleness on the others.
+_user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop the cached snapshot after changing a user's role, email or password."""
+    _user_cache.delete(user_id)
+
+
 def load_user():
     user_id = session.get("user_id")
 
@@ -9,8 +39,18 @@ def load_user():
         g.current_user = None
         return
 
-    db = SessionLocal()
-    try:
-        g.current_user = db.query(User).filter_by(id=user_id).first()
-    finally:
-        db.close()
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        # Shares the request's session; hand its connection back until the
+        # handler needs one
+        user = get_db().query(User).filter_by(id=user_id).first()
+        release_connection()
+
+        if user is None:
+            g.current_user = None
+            return
+
+        snapshot = CurrentUser(id=user.id, email=user.email, role=user.role)
+        _user_cache.set(user_id, snapshot)
+
+    g.current_user = snapshot
@@ -0,0 +1,220 @@
+"""
+Client for the payment provider (Stripe).
+
+One StripeClient per process, built once at startup by init_payments():
+  - a shared, pooled requests session, so API connections are kept alive
+    instead of being opened for every call
+  - connect/read timeouts, so a slow provider cannot hold a web worker for
+    the library default of 80 seconds
+  - a circuit breaker: after repeated failures or slow calls, payment calls
+    fail fast for a cool-down period instead of queueing behind the provider
+
+STRIPE_API_BASE points the client at another host, e.g. a local stub server
+in tests.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable
+
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentProviderError(Exception):
+    """The provider could not be reached, timed out or failed on its side."""
+
+
+class CircuitOpen(PaymentProviderError):
+    """Calls are short-circuited while the provider is considered down."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures (errors for
+    which `is_failure` is true, or calls slower than `slow_call` seconds);
+    open -> half-open after `reset_timeout`, letting a single trial call
+    through; the trial closes the circuit again or re-opens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call: float = 5.0,
+        is_failure: Callable[[Exception], bool] = lambda exc: True,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.is_failure = is_failure
+
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._stats["short_circuited"] += 1
+                    raise CircuitOpen("payment provider circuit is open")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._trial_running:
+                    self._stats["short_circuited"] += 1
+                    raise CircuitOpen("payment provider circuit is half open")
+                self._trial_running = True
+
+    def _after_call(self, failed: bool) -> None:
+        with self._lock:
+            self._trial_running = False
+            if not failed:
+                self._failures = 0
+                self.state = "closed"
+                return
+
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("payment provider circuit opened")
+                    self._stats["opened"] += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        self._before_call()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            self._after_call(failed=self.is_failure(exc))
+            raise
+        self._after_call(failed=time.monotonic() - started > self.slow_call)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, **self._stats}
+
+
+# Errors that mean the provider is unhealthy, as opposed to a bad request
+_PROVIDER_FAULTS = (stripe.APIConnectionError, stripe.APIError, stripe.RateLimitError)
+
+
+def _is_provider_fault(exc: Exception) -> bool:
+    return isinstance(exc, _PROVIDER_FAULTS)
+
+
+class PaymentProvider:
+    def __init__(self):
+        self._client: stripe.StripeClient | None = None
+        self.breaker = CircuitBreaker(is_failure=_is_provider_fault)
+
+    @property
+    def configured(self) -> bool:
+        return self._client is not None
+
+    def configure(
+        self,
+        api_key: str,
+        api_base: str | None = None,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        pool_size: int = 10,
+        max_retries: int = 1,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        self._client = stripe.StripeClient(
+            api_key,
+            base_addresses={"api": api_base} if api_base else {},
+            # requests accepts a (connect, read) pair
+            http_client=stripe.RequestsClient(
+                timeout=(connect_timeout, read_timeout), session=session
+            ),
+            # Safe to retry: every create carries an idempotency key
+            max_network_retries=max_retries,
+        )
+        self.breaker = breaker or CircuitBreaker(is_failure=_is_provider_fault)
+
+    def create_payment_intent(
+        self,
+        amount_cents: int,
+        currency: str,
+        metadata: dict[str, str],
+        idempotency_key: str,
+    ) -> stripe.PaymentIntent:
+        """
+        Create a PaymentIntent. Raises PaymentProviderError when the provider
+        is down, slow or the circuit is open; other Stripe errors propagate.
+        """
+        if self._client is None:
+            raise PaymentProviderError("payment provider is not configured")
+
+        try:
+            return self.breaker.call(
+                self._client.payment_intents.create,
+                params={
+                    "amount": amount_cents,
+                    "currency": currency,
+                    "metadata": metadata,
+                },
+                options={"idempotency_key": idempotency_key},
+            )
+        except CircuitOpen:
+            raise
+        except _PROVIDER_FAULTS as exc:
+            raise PaymentProviderError(str(exc)) from exc
+
+
+payment_provider = PaymentProvider()
+
+
+def init_payments(app) -> None:
+    """
+    Configure the process-wide payment provider once, at startup:
+
+        STRIPE_SECRET_KEY            from app.config
+        STRIPE_API_BASE              optional API host override
+        STRIPE_CONNECT_TIMEOUT       seconds (default 3)
+        STRIPE_READ_TIMEOUT          seconds (default 10)
+        STRIPE_POOL_SIZE             kept-alive connections (default 10)
+        STRIPE_MAX_NETWORK_RETRIES   default 1
+        STRIPE_BREAKER_FAILURES      failures before the circuit opens (default 5)
+        STRIPE_BREAKER_RESET         seconds before a trial call (default 30)
+        STRIPE_SLOW_CALL             seconds after which a call counts as failed (default 5)
+    """
+    api_key = app.config.get("STRIPE_SECRET_KEY")
+    if not api_key:
+        app.logger.warning("STRIPE_SECRET_KEY is not configured")
+        return
+
+    payment_provider.configure(
+        api_key,
+        api_base=os.getenv("STRIPE_API_BASE") or None,
+        connect_timeout=float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3")),
+        read_timeout=float(os.getenv("STRIPE_READ_TIMEOUT", "10")),
+        pool_size=int(os.getenv("STRIPE_POOL_SIZE", "10")),
+        max_retries=int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "1")),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("STRIPE_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("STRIPE_BREAKER_RESET", "30")),
+            slow_call=float(os.getenv("STRIPE_SLOW_CALL", "5")),
+            is_failure=_is_provider_fault,
+        ),
+    )
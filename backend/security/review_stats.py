@@ -0,0 +1,92 @@
+"""
+Denormalised review aggregates on products: count, sum, a 1-5 histogram and
+the rounded average used as the sort=rating key.
+
+apply_review() adjusts them in the caller's transaction, next to the review
+insert or delete, with a single relative UPDATE so concurrent reviews of the
+same product cannot lose each other's changes. recompute() rebuilds them
+from the reviews table (backfill, or repair after bulk deletes).
+"""
+
+from sqlalchemy import bindparam, text
+
+_AVG_X100_SQL = (
+    "CASE WHEN {count} > 0 THEN (({sum}) * 100 + ({count}) / 2) / ({count}) ELSE 0 END"
+)
+
+
+def apply_review(db, product_id: int, rating: int, delta: int) -> None:
+    """Count a review in (delta=1) or out (delta=-1) of its product's stats."""
+    if rating not in (1, 2, 3, 4, 5):
+        raise ValueError("rating must be between 1 and 5")
+
+    new_count = "rating_count + :delta"
+    new_sum = "rating_sum + :delta * :rating"
+    db.execute(
+        text(
+            f"""
+            UPDATE products SET
+                rating_count = {new_count},
+                rating_sum = {new_sum},
+                rating_{rating} = rating_{rating} + :delta,
+                rating_avg_x100 = {_AVG_X100_SQL.format(count=new_count, sum=new_sum)}
+            WHERE id = :product_id
+            """
+        ),
+        {"product_id": product_id, "rating": rating, "delta": delta},
+    )
+
+
+def recompute(db, product_ids: list[int] | None = None) -> int:
+    """
+    Rebuild the stats from the reviews table, for every product or just
+    `product_ids`. Runs in the caller's transaction; returns rows updated.
+    """
+    if product_ids is not None and not product_ids:
+        return 0
+
+    buckets = ",\n".join(
+        f"rating_{n} = (SELECT COUNT(*) FROM reviews r "
+        f"WHERE r.product_id = products.id AND r.rating = {n})"
+        for n in range(1, 6)
+    )
+    where = "WHERE id IN :ids" if product_ids is not None else ""
+    counts = text(
+        f"""
+        UPDATE products SET
+            rating_count = (SELECT COUNT(*) FROM reviews r WHERE r.product_id = products.id),
+            rating_sum = (SELECT COALESCE(SUM(r.rating), 0) FROM reviews r
+                          WHERE r.product_id = products.id),
+            {buckets}
+        {where}
+        """
+    )
+    average = text(
+        f"""
+        UPDATE products
+        SET rating_avg_x100 = {_AVG_X100_SQL.format(count="rating_count", sum="rating_sum")}
+        {where}
+        """
+    )
+
+    params = {}
+    if product_ids is not None:
+        counts = counts.bindparams(bindparam("ids", expanding=True))
+        average = average.bindparams(bindparam("ids", expanding=True))
+        params = {"ids": list(product_ids)}
+
+    updated = db.execute(counts, params).rowcount
+    db.execute(average, params)
+    return updated
+
+
+def rating_summary(product) -> dict:
+    """Public shape of the stats for a product detail payload."""
+    count = product.rating_count or 0
+    return {
+        "count": count,
+        "average": round(product.rating_sum / count, 2) if count else None,
+        "histogram": {
+            str(n): getattr(product, f"rating_{n}") or 0 for n in range(1, 6)
+        },
+    }
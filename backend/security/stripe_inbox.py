@@ -0,0 +1,350 @@
+"""
+Durable inbox for Stripe webhook events.
+
+The webhook only verifies the signature and inserts the event into
+stripe_events (keyed by Stripe's event id, so redeliveries are dropped),
+then returns 200. A small pool of background threads applies the events to
+orders, each in its own transaction together with marking the event done.
+
+Failures are retried with exponential backoff up to STRIPE_INBOX_MAX_ATTEMPTS,
+after which the event is left as 'failed' for someone to look at. A payment
+that can no longer be honoured (RefundRequired) fails at once. An event
+that arrives before its order exists or is in the right state (Stripe does
+not guarantee ordering) is retried the same way.
+
+Workers claim an event by pushing its next_attempt_at forward (a lease), so
+several threads or processes can share the inbox, and an event held by a
+crashed worker becomes due again once the lease runs out.
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.cache import catalogue_cache
+from backend.db.database import SessionLocal
+from backend.models.models import Order, StripeEvent, now
+from backend.security.inventory import (
+    OutOfStock,
+    cancel_reservation,
+    order_lines,
+    reserve_stock,
+    stock_committed,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RetryLater(Exception):
+    """The event cannot be applied yet (e.g. its order is not there yet)."""
+
+
+class RefundRequired(Exception):
+    """The order was paid but cannot be filled; retrying will not help."""
+
+
+def record_event(db, event_id: str, event_type: str, payload: str) -> bool:
+    """
+    Store a verified event and commit. Returns False if it was already
+    stored (a redelivery).
+    """
+    db.add(StripeEvent(id=event_id, type=event_type, payload=payload))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+# -------------------------
+# Order transitions
+# -------------------------
+
+
+def _order_for_intent(db, intent_id: str) -> Order:
+    order = db.execute(
+        select(Order).where(Order.provider_ref == intent_id)
+    ).scalar_one_or_none()
+    if order is None:
+        # The webhook can beat the commit that stores provider_ref
+        raise RetryLater(f"no order for payment intent {intent_id}")
+    return order
+
+
+def mark_paid(db, order: Order) -> bool:
+    """
+    Move a created order to paid and drop its reservation. If the sweeper
+    already released it, the stock is taken again; when that is no longer
+    possible the order stays cancelled and RefundRequired is raised, which
+    leaves the event failed with the reason. Raises RetryLater if the order
+    changes status underneath us.
+    """
+    if order.status == "cancelled":
+        try:
+            reserve_stock(db, order_lines(db, order.id))
+        except OutOfStock as exc:
+            raise RefundRequired(
+                f"order {order.id} was paid after its reservation expired and "
+                f"is out of stock ({exc}), refund required"
+            ) from exc
+        from_status = "cancelled"
+    elif order.status == "created":
+        from_status = "created"
+    else:
+        return False
+
+    moved = db.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status == from_status)
+        .values(status="paid", reserved_until=None)
+    ).rowcount
+    if moved != 1:
+        # The sweeper (or another event) moved the order since we read it.
+        # Rolling back also returns any stock taken above; the retry starts
+        # again from the order's new status.
+        raise RetryLater(f"order {order.id} left {from_status!r} while being paid")
+    return True
+
+
+def _payment_succeeded(db, obj: dict) -> Order:
+    order = _order_for_intent(db, obj["id"])
+    mark_paid(db, order)
+    return order
+
+
+def _payment_ended(db, obj: dict) -> Order:
+    # A failed or cancelled payment gives the stock back. If the customer
+    # then pays the same intent after all, mark_paid takes it again.
+    order = _order_for_intent(db, obj["id"])
+    cancel_reservation(db, order.id)
+    return order
+
+
+def _charge_refunded(db, obj: dict) -> Order | None:
+    if not obj.get("refunded"):
+        # Partial refund: the order stands
+        return None
+    order = _order_for_intent(db, obj["payment_intent"])
+    if order.status == "created":
+        raise RetryLater(f"order {order.id} refunded before it was marked paid")
+    db.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.status.in_(("paid", "fulfilled")))
+        .values(status="refunded")
+    )
+    return order
+
+
+HANDLERS = {
+    "payment_intent.succeeded": _payment_succeeded,
+    "payment_intent.payment_failed": _payment_ended,
+    "payment_intent.canceled": _payment_ended,
+    "charge.refunded": _charge_refunded,
+}
+
+
+# -------------------------
+# Worker
+# -------------------------
+
+
+class StripeInbox:
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        max_attempts: int = 8,
+        retry_base: float = 2.0,
+        retry_max: float = 600.0,
+        lease: float = 60.0,
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def wake(self) -> None:
+        """Tell the workers a new event is waiting (starts them if needed)."""
+        self.ensure_started()
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, what: str) -> None:
+        with self._stats_lock:
+            self._stats[what] += 1
+
+    def ensure_started(self) -> None:
+        """
+        Start this process's worker threads if they are not running, so
+        events left pending by a previous process are picked up without
+        waiting for the next webhook. Called from create_app and by wake().
+        """
+        # Same as the analytics writer: one pool per worker process
+        if self.workers <= 0:
+            return
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self.run, name=f"stripe-inbox-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            atexit.register(self.stop)
+
+    def run(self) -> None:
+        """Worker loop, for the pool threads or a dedicated worker process."""
+        while not self._stop.is_set():
+            try:
+                worked = self.process_one()
+            except Exception:
+                logger.exception("stripe inbox: worker error")
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def drain(self) -> int:
+        """Apply every event that is due now. Returns how many were handled."""
+        handled = 0
+        while self.process_one():
+            handled += 1
+        return handled
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _claim(self, db) -> StripeEvent | None:
+        """Lease the next due event, or return None if nothing is due."""
+        while True:
+            candidate = db.execute(
+                select(StripeEvent.id, StripeEvent.next_attempt_at)
+                .where(
+                    StripeEvent.status.in_(("pending", "processing")),
+                    StripeEvent.next_attempt_at <= now(),
+                )
+                .order_by(StripeEvent.next_attempt_at)
+                .limit(1)
+            ).first()
+            if candidate is None:
+                db.rollback()
+                return None
+
+            claimed = db.execute(
+                update(StripeEvent)
+                .where(
+                    StripeEvent.id == candidate.id,
+                    StripeEvent.next_attempt_at == candidate.next_attempt_at,
+                    StripeEvent.status.in_(("pending", "processing")),
+                )
+                .values(
+                    status="processing",
+                    attempts=StripeEvent.attempts + 1,
+                    next_attempt_at=now() + timedelta(seconds=self.lease),
+                )
+            ).rowcount
+            db.commit()
+            if claimed == 1:
+                return db.get(StripeEvent, candidate.id)
+            # Another worker took it first
+
+    def process_one(self) -> bool:
+        """Claim and apply one due event. Returns False if none was due."""
+        db = SessionLocal()
+        try:
+            event = self._claim(db)
+            if event is None:
+                return False
+            event_id, attempts = event.id, event.attempts
+
+            handler = HANDLERS.get(event.type)
+            try:
+                order = None
+                if handler is not None:
+                    data = json.loads(event.payload)
+                    order = handler(db, data["data"]["object"])
+                db.execute(
+                    update(StripeEvent)
+                    .where(StripeEvent.id == event_id)
+                    .values(status="done", processed_at=now(), last_error=None)
+                )
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                self._failed(db, event_id, attempts, exc)
+                return True
+
+            stock_committed(db)
+            self._count("applied" if handler else "ignored")
+            if order is not None:
+                catalogue_cache.bump_generation(f"orders:{order.user_id}")
+            return True
+        finally:
+            db.close()
+
+    def _failed(self, db, event_id: str, attempts: int, exc: Exception) -> None:
+        if isinstance(exc, RefundRequired) or attempts >= self.max_attempts:
+            values = {"status": "failed"}
+            self._count("failed")
+            logger.error(
+                "stripe inbox: giving up on event %s after %d attempts: %s",
+                event_id, attempts, exc,
+            )
+        else:
+            values = {
+                "status": "pending",
+                "next_attempt_at": now() + self._backoff(attempts),
+            }
+            self._count("retried")
+            log = logger.info if isinstance(exc, RetryLater) else logger.warning
+            log("stripe inbox: event %s attempt %d failed: %s", event_id, attempts, exc)
+
+        db.execute(
+            update(StripeEvent)
+            .where(StripeEvent.id == event_id)
+            .values(last_error=str(exc)[:1000], **values)
+        )
+        db.commit()
+
+
+stripe_inbox = StripeInbox(
+    workers=int(os.getenv("STRIPE_INBOX_WORKERS", "2")),
+    max_attempts=int(os.getenv("STRIPE_INBOX_MAX_ATTEMPTS", "8")),
+    retry_base=float(os.getenv("STRIPE_INBOX_RETRY_BASE", "2")),
+    retry_max=float(os.getenv("STRIPE_INBOX_RETRY_MAX", "600")),
+)
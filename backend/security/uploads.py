@@ -1,14 +1,36 @@
+import hashlib
 import os
-import secrets
+import re
+import tempfile
 from pathlib import Path
 
 from werkzeug.datastructures import FileStorage
-from werkzeug.utils import secure_filename
 from PIL import Image
 
+from backend.storage import MediaStorage
+
 
 ALLOWED_EXTENSIONS: set[str] = {"jpg", "jpeg", "png", "gif", "webp"}
-MAX_BYTES = 5 * 1024 * 1024  # 5 MB
+MAX_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))  # 5 MB
+# Width x height; decoding is refused above this (default 25 megapixels)
+MAX_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(25_000_000)))
+
+# One name per format, so the same bytes uploaded as .jpeg and .jpg dedupe
+_CANONICAL_EXT = {"jpeg": "jpg"}
+_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of each accepted format (WebP is RIFF....WEBP, see below)
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+_SNIFF_BYTES = 12
+_PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "gif": "GIF", "webp": "WEBP"}
+_CONTENT_PATH_RE = re.compile(
+    r"^[\w-]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.w\d+)?\.[a-z0-9]+$"
+)
 
 
 def _allowed_ext(filename: str) -> bool:
@@ -18,14 +40,47 @@ def _allowed_ext(filename: str) -> bool:
     return ext in ALLOWED_EXTENSIONS
 
 
+def canonical_ext(ext: str) -> str:
+    ext = ext.lower()
+    return _CANONICAL_EXT.get(ext, ext)
+
+
+def content_path(digest: str, ext: str, subdir: str = "products") -> str:
+    """Sharded, content-addressed path: 'products/ab/cd/<sha256>.png'."""
+    return f"{subdir}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def is_content_addressed(rel_path: str) -> bool:
+    """True for content_path() names and their variants, whose bytes never change."""
+    return _CONTENT_PATH_RE.match(rel_path) is not None
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Extension for the image format `head` starts with, or None."""
+    for magic, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
 def validate_and_save_image(
     file: FileStorage,
-    upload_dir: Path,
+    storage: MediaStorage,
     subdir: str = "products",
 ) -> str:
     """
-    Validate image type and size, save with a random name under upload_dir/subdir,
-    return relative path like 'products/abc123.png'.
+    Validate image type and size and store it in `storage` by content hash;
+    return the key (relative path), e.g. 'products/ab/cd/<sha256>.png'.
+
+    The upload is streamed to a temp file in chunks, hashing on the way and
+    giving up as soon as it passes MAX_BYTES or its first bytes are not a
+    supported image format. Pillow then checks the dimensions against
+    MAX_PIXELS before verifying the data, and the file is handed to the
+    storage (a rename on local disk, an upload for S3). Identical bytes map
+    to the same path, so a re-upload keeps the existing file. Memory use is
+    one chunk, whatever the upload size.
     """
     if file.filename is None or file.filename.strip() == "":
         raise ValueError("No filename provided")
@@ -33,32 +88,60 @@ def validate_and_save_image(
     if not _allowed_ext(file.filename):
         raise ValueError("Unsupported file type")
 
-    # Limit size in memory
-    file.stream.seek(0, os.SEEK_END)
-    size = file.stream.tell()
-    file.stream.seek(0)
-    if size > MAX_BYTES:
-        raise ValueError("File too large")
-
-    # Verify it is a real image
+    if storage.scratch_dir is not None:
+        storage.scratch_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=storage.scratch_dir, prefix=".upload-")
+    tmp_path = Path(tmp_name)
     try:
-        im = Image.open(file.stream)
-        im.verify()
-    except Exception as exc:
-        raise ValueError("Invalid image file") from exc
+        digest = hashlib.sha256()
+        head = b""
+        ext = None
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            while chunk := file.stream.read(_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise ValueError("File too large")
+                if ext is None and len(head) < _SNIFF_BYTES:
+                    head += chunk[: _SNIFF_BYTES - len(head)]
+                    if len(head) == _SNIFF_BYTES:
+                        ext = _sniff_or_reject(head)
+                digest.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            ext = _sniff_or_reject(head)
+        # From here on the type is what the bytes say, not the filename
 
-    # Reset stream pointer after verify
-    file.stream.seek(0)
+        # Opening only parses the header; the pixel limit is checked before
+        # anything is decoded
+        try:
+            with Image.open(tmp_path, formats=[_PIL_FORMATS[ext]]) as im:
+                width, height = im.size
+                if width * height <= MAX_PIXELS:
+                    im.verify()
+        except Image.DecompressionBombError as exc:
+            raise ValueError("Image dimensions too large") from exc
+        except Exception as exc:
+            raise ValueError("Invalid image file") from exc
+        if width * height > MAX_PIXELS:
+            raise ValueError("Image dimensions too large")
 
-    ext = file.filename.rsplit(".", 1)[1].lower()
-    rand = secrets.token_hex(16)
-    safe_name = secure_filename(f"{rand}.{ext}")
+        rel_path = content_path(digest.hexdigest(), ext, subdir)
+        if storage.exists(rel_path):
+            # Same bytes were uploaded before
+            tmp_path.unlink()
+        else:
+            content_type = f"image/{_PIL_FORMATS[ext].lower()}"
+            storage.save(rel_path, tmp_path, content_type=content_type)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
-    target_dir = upload_dir / subdir
-    target_dir.mkdir(parents=True, exist_ok=True)
+    return rel_path
 
-    target_path = target_dir / safe_name
-    file.save(target_path)
 
-    # Return path relative to uploads root
-    return f"{subdir}/{safe_name}"
+def _sniff_or_reject(head: bytes) -> str:
+    ext = sniff_image_type(head)
+    if ext is None:
+        raise ValueError("Unsupported file type")
+    return ext
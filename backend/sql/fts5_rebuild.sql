@@ -1,9 +1,5 @@
-BEGIN;
+-- External content table: 'rebuild' re-reads every row from products
+INSERT INTO products_fts(products_fts) VALUES ('rebuild');
 
-DELETE FROM products_fts;
-
-INSERT INTO products_fts(rowid, name, brand, category)
-SELECT id, name, brand, category
-FROM products;
-
-COMMIT;
+-- Merge index segments after a large rebuild
+INSERT INTO products_fts(products_fts) VALUES ('optimize');
@@ -0,0 +1,87 @@
+"""
+Pluggable storage for uploaded media: the local filesystem, or an
+S3-compatible bucket so several app nodes (and a CDN) share the same files.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from flask import current_app
+
+from .base import MediaStorage
+from .local import LocalStorage
+from .s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+
+def media_storage() -> MediaStorage:
+    """The storage configured for the current app."""
+    return current_app.extensions["media_storage"]
+
+
+def storage_from_env(upload_root: Path) -> MediaStorage:
+    """
+    Build the media storage from the environment:
+
+        MEDIA_STORAGE           local (default) or s3
+        S3_BUCKET               bucket name (s3)
+        S3_ENDPOINT_URL         non-AWS endpoint, e.g. http://minio:9000
+        S3_REGION               optional
+        S3_PREFIX               key prefix inside the bucket
+        S3_PUBLIC_URL           public/CDN base URL; unset means presigned URLs
+        S3_URL_TTL              presigned URL lifetime, seconds (default 3600)
+        S3_MULTIPART_THRESHOLD  bytes above which uploads are multipart (default 8 MB)
+        S3_PART_SIZE            multipart chunk size (default 8 MB, S3 minimum 5 MB)
+
+    S3 credentials come from the usual AWS_* variables.
+    """
+    kind = (os.getenv("MEDIA_STORAGE") or "local").lower()
+    if kind == "local":
+        return LocalStorage(upload_root)
+    if kind != "s3":
+        raise RuntimeError(f"unknown MEDIA_STORAGE {kind!r}")
+
+    try:
+        import boto3  # only imported when s3 is configured
+    except ImportError:
+        raise RuntimeError(
+            "MEDIA_STORAGE=s3 needs the boto3 package (pinned in backend/requirements.txt)"
+        ) from None
+
+    bucket = os.getenv("S3_BUCKET")
+    if not bucket:
+        raise RuntimeError("MEDIA_STORAGE=s3 needs S3_BUCKET")
+
+    client = boto3.client(
+        "s3",
+        endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+        region_name=os.getenv("S3_REGION") or None,
+    )
+    return S3Storage(
+        client,
+        bucket,
+        prefix=os.getenv("S3_PREFIX", ""),
+        public_url=os.getenv("S3_PUBLIC_URL") or None,
+        url_ttl=int(os.getenv("S3_URL_TTL", "3600")),
+        multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))),
+        part_size=int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))),
+    )
+
+
+def init_media_storage(app) -> None:
+    """Configure the app's media storage once, at startup."""
+    storage = storage_from_env(app.config["UPLOAD_ROOT"])
+    app.extensions["media_storage"] = storage
+    logger.info("media storage: %s", type(storage).__name__)
+
+
+__all__ = [
+    "MediaStorage",
+    "LocalStorage",
+    "S3Storage",
+    "media_storage",
+    "storage_from_env",
+    "init_media_storage",
+]
@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+
+class MediaStorage(Protocol):
+    """
+    Where uploaded media lives. Keys are relative paths such as
+    'products/ab/cd/<sha256>.png', the same ones /media/ URLs use.
+    """
+
+    # Where callers create the temp files they pass to save(): a directory
+    # on the same filesystem for local storage (so save() is a rename), or
+    # None for the system temp directory
+    scratch_dir: Path | None
+
+    def exists(self, key: str) -> bool: ...
+
+    def save(self, key: str, source: Path, content_type: str | None = None) -> None:
+        """Store the file at `source` under `key`; `source` is consumed."""
+        ...
+
+    def open(self, key: str) -> BinaryIO:
+        """Seekable binary file with the object's bytes (close it after use)."""
+        ...
+
+    def delete(self, key: str) -> None: ...
+
+    def local_path(self, key: str) -> Path | None:
+        """Filesystem path the app can send from, or None if not local."""
+        ...
+
+    def url(self, key: str) -> str | None:
+        """URL clients can fetch the object from directly, or None."""
+        ...
@@ -0,0 +1,32 @@
+import os
+from pathlib import Path
+from typing import BinaryIO
+
+
+class LocalStorage:
+    """Media on the local filesystem, under `root` (UPLOAD_ROOT)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.scratch_dir = self.root
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).is_file()
+
+    def save(self, key: str, source: Path, content_type: str | None = None) -> None:
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic: readers see the old file or the whole new one
+        os.replace(source, target)
+
+    def open(self, key: str) -> BinaryIO:
+        return (self.root / key).open("rb")
+
+    def delete(self, key: str) -> None:
+        (self.root / key).unlink(missing_ok=True)
+
+    def local_path(self, key: str) -> Path | None:
+        return self.root / key
+
+    def url(self, key: str) -> str | None:
+        return None
@@ -0,0 +1,145 @@
+import mimetypes
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO
+
+# Stored keys are content-addressed, so objects never change under a key
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_MISSING_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+def _is_missing(exc: Exception) -> bool:
+    # botocore's ClientError (and the tests' fake client) carry the S3 error
+    # code in exc.response, which a network error may lack or leave None;
+    # checked by shape so botocore is only imported when S3 is configured
+    response = getattr(exc, "response", None) or {}
+    code = (response.get("Error") or {}).get("Code")
+    return code in _MISSING_CODES
+
+
+class S3Storage:
+    """
+    Media in an S3-compatible bucket (AWS S3, MinIO, R2...), through a
+    boto3 S3 client or anything with the same methods.
+
+    Files above `multipart_threshold` are sent as a multipart upload, one
+    `part_size` chunk at a time, so memory use does not grow with the file.
+    Clients are sent to the object itself: `public_url` (a CDN or public
+    bucket) when set, otherwise a presigned GET valid for `url_ttl` seconds.
+    """
+
+    scratch_dir = None
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        prefix: str = "",
+        public_url: str | None = None,
+        url_ttl: int = 3600,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.url_ttl = url_ttl
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+
+    @property
+    def url_max_age(self) -> int:
+        """How long a redirect to url() may be cached."""
+        if self.public_url:
+            return 365 * 24 * 3600
+        # Leave the client time to follow a cached redirect before it expires
+        return self.url_ttl // 2
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as exc:
+            if _is_missing(exc):
+                return False
+            raise
+        return True
+
+    def save(self, key: str, source: Path, content_type: str | None = None) -> None:
+        extra = {
+            "ContentType": content_type
+            or mimetypes.guess_type(key)[0]
+            or "application/octet-stream",
+            "CacheControl": IMMUTABLE,
+        }
+        try:
+            if source.stat().st_size <= self.multipart_threshold:
+                with source.open("rb") as f:
+                    self.client.put_object(
+                        Bucket=self.bucket, Key=self._key(key), Body=f, **extra
+                    )
+            else:
+                self._multipart(self._key(key), source, extra)
+        finally:
+            source.unlink(missing_ok=True)
+
+    def _multipart(self, key: str, source: Path, extra: dict) -> None:
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, **extra
+        )["UploadId"]
+        try:
+            parts = []
+            with source.open("rb") as f:
+                while chunk := f.read(self.part_size):
+                    number = len(parts) + 1
+                    etag = self.client.upload_part(
+                        Bucket=self.bucket,
+                        Key=key,
+                        UploadId=upload_id,
+                        PartNumber=number,
+                        Body=chunk,
+                    )["ETag"]
+                    parts.append({"ETag": etag, "PartNumber": number})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            # Otherwise the parts are kept (and billed) until a lifecycle rule
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        # Pillow needs to seek; spool to memory, or disk past 1 MB
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        try:
+            while chunk := body.read(64 * 1024):
+                spooled.write(chunk)
+        finally:
+            body.close()
+        spooled.seek(0)
+        return spooled
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def local_path(self, key: str) -> Path | None:
+        return None
+
+    def url(self, key: str) -> str | None:
+        if self.public_url:
+            return f"{self.public_url}/{self._key(key)}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=self.url_ttl,
+        )
@@ -0,0 +1,121 @@
+import os
+import uuid
+
+import pytest
+
+from backend.db import database
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """
+    App wired to a throwaway database so tests never touch lepax.db: a temp
+    SQLite file, or TEST_DATABASE_URL (e.g. a local Postgres container),
+    which is wiped first.
+    The engines are swapped before backend.app is imported, because
+    importing it builds an app and bootstraps the database.
+    """
+    test_url = os.getenv("TEST_DATABASE_URL")
+    if test_url:
+        database.init_engines(test_url)
+        database.Base.metadata.drop_all(bind=database.engine)
+    else:
+        db_file = tmp_path_factory.mktemp("db") / "test.db"
+        database.init_engines(f"sqlite:///{db_file}")
+
+    # Tests drain the Stripe inbox by hand; no worker threads
+    from backend.security.stripe_inbox import stripe_inbox
+
+    stripe_inbox.workers = 0
+
+    from backend.app import create_app
+    from backend.models.models import Product
+
+    app = create_app()
+    app.config.update(TESTING=True)
+
+    # Stands in for Redis, so version counters count as shared and
+    # conditional GETs can be answered with 304s
+    from backend.cache import LocalSharedBackend, catalogue_cache
+
+    catalogue_cache.configure(shared=LocalSharedBackend())
+
+    with database.SessionLocal() as db:
+        db.add(
+            Product(
+                sku="SKU-TEST-ROSE-001",
+                name="Rose Gold Hoop Earrings",
+                brand="Crescent Jewels",
+                category="Jewellery",
+                description_md="Lightweight hoops in brushed rose gold.",
+                price_cents=18000,
+                currency="GBP",
+                active=True,
+                seo_slug="rose-gold-hoop-earrings",
+            )
+        )
+        db.commit()
+
+    return app
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def login(client):
+    """Log the test client in as an existing user; returns the user id."""
+    from backend.models.models import User
+
+    def _login(email: str) -> int:
+        with database.SessionLocal() as db:
+            user_id = db.query(User).filter_by(email=email).one().id
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+        return user_id
+
+    return _login
+
+
+@pytest.fixture()
+def make_product(app):
+    """
+    Create an active product with one variant per stock level (sizes S0,
+    S1, ...); returns (product_id, [variant_ids]). Other Product fields can
+    be given as keywords.
+    """
+    from backend.models.models import Product, Variant
+
+    def _make(*stocks: int, price_cents: int = 5000, **fields) -> tuple[int, list[int]]:
+        tag = uuid.uuid4().hex[:8]
+        values = {
+            "sku": f"SKU-TEST-{tag}",
+            "name": f"Test Product {tag}",
+            "currency": "GBP",
+            "active": True,
+            "seo_slug": f"test-product-{tag}",
+            **fields,
+        }
+        with database.SessionLocal() as db:
+            product = Product(price_cents=price_cents, **values)
+            for i, level in enumerate(stocks):
+                product.variants.append(Variant(size=f"S{i}", stock=level))
+            db.add(product)
+            db.commit()
+            return product.id, [v.id for v in product.variants]
+
+    return _make
+
+
+@pytest.fixture()
+def stock(app):
+    """Current stock of a variant, read from the database."""
+    from backend.models.models import Variant
+
+    def _stock(variant_id: int) -> int:
+        with database.SessionLocal() as db:
+            return db.get(Variant, variant_id).stock
+
+    return _stock
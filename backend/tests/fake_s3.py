@@ -0,0 +1,108 @@
+"""
+In-process stand-in for an S3 endpoint, so the S3 storage can be tested
+without MinIO. Implements the handful of boto3 S3 client methods S3Storage
+uses, with the same argument and error shapes.
+"""
+
+import hashlib
+import io
+import threading
+import uuid
+from urllib.parse import quote
+
+
+class InMemoryS3Error(Exception):
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        # Same shape as botocore's ClientError.response
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class InMemoryS3Client:
+    def __init__(self, endpoint_url: str = "http://s3.local"):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        # (bucket, key) -> {"Body": bytes, "ContentType": ..., "CacheControl": ...}
+        self.objects: dict[tuple[str, str], dict] = {}
+        # upload id -> {"Bucket", "Key", "Parts": {number: bytes}, ...extra}
+        self.uploads: dict[str, dict] = {}
+        self.calls: list[str] = []
+        self._lock = threading.Lock()
+
+    def _get(self, bucket: str, key: str) -> dict:
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise InMemoryS3Error("404", "Not Found") from None
+
+    @staticmethod
+    def _read(body) -> bytes:
+        return body if isinstance(body, bytes) else body.read()
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        self.calls.append("head_object")
+        obj = self._get(Bucket, Key)
+        return {"ContentLength": len(obj["Body"]), "ContentType": obj.get("ContentType")}
+
+    def put_object(self, Bucket: str, Key: str, Body, **extra) -> dict:
+        self.calls.append("put_object")
+        data = self._read(Body)
+        with self._lock:
+            self.objects[(Bucket, Key)] = {"Body": data, **extra}
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        self.calls.append("get_object")
+        obj = self._get(Bucket, Key)
+        return {"Body": io.BytesIO(obj["Body"]), "ContentType": obj.get("ContentType")}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict:
+        self.calls.append("delete_object")
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **extra) -> dict:
+        self.calls.append("create_multipart_upload")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"Bucket": Bucket, "Key": Key, "Parts": {}, **extra}
+        return {"UploadId": upload_id}
+
+    def _upload(self, upload_id: str) -> dict:
+        try:
+            return self.uploads[upload_id]
+        except KeyError:
+            raise InMemoryS3Error("NoSuchUpload", "Unknown upload") from None
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int,
+                    Body) -> dict:
+        self.calls.append("upload_part")
+        data = self._read(Body)
+        self._upload(UploadId)["Parts"][PartNumber] = data
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str,
+                                  MultipartUpload: dict) -> dict:
+        self.calls.append("complete_multipart_upload")
+        with self._lock:
+            upload = self.uploads.pop(UploadId)
+        parts = upload.pop("Parts")
+        data = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        extra = {k: v for k, v in upload.items() if k not in ("Bucket", "Key")}
+        with self._lock:
+            self.objects[(Bucket, Key)] = {"Body": data, **extra}
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict:
+        self.calls.append("abort_multipart_upload")
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod: str, Params: dict,
+                               ExpiresIn: int = 3600) -> str:
+        self.calls.append("generate_presigned_url")
+        return (
+            f"{self.endpoint_url}/{Params['Bucket']}/{quote(Params['Key'])}"
+            f"?X-Amz-Expires={ExpiresIn}&X-Amz-Signature=fake"
+        )
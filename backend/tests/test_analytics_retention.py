@@ -0,0 +1,40 @@
+import gzip
+import json
+from datetime import datetime
+
+from backend.security.analytics_rollup import run_rollup
+from backend.security.analytics_retention import prune_table
+from backend.security.event_writer import event_writer
+
+
+def test_prune_archives_only_rolled_up_events(app, tmp_path):
+    from backend.db.database import SessionLocal
+    from backend.models.models import ViewEvent
+
+    old = datetime(2020, 5, 17, 12, 0)
+    with SessionLocal() as db:
+        db.add_all(
+            ViewEvent(session_id="old", path=f"/old/{i}", occurred_at=old)
+            for i in range(5)
+        )
+        db.commit()
+
+    event_writer.flush()
+    run_rollup(settle_seconds=0)
+
+    with SessionLocal() as db:
+        db.add(ViewEvent(session_id="old", path="/old/late", occurred_at=old))
+        db.commit()
+
+    removed = prune_table("view_events", days=30, archive_dir=tmp_path, batch_size=2)
+    assert removed >= 5
+
+    archive = tmp_path / "view_events" / "view_events-2020-05.ndjson.gz"
+    with gzip.open(archive, "rt") as fh:
+        paths = [json.loads(line)["path"] for line in fh]
+    assert paths == [f"/old/{i}" for i in range(5)]
+
+    with SessionLocal() as db:
+        left = [e.path for e in db.query(ViewEvent).filter_by(session_id="old")]
+    # Not rolled up yet, so it must stay
+    assert left == ["/old/late"]
@@ -0,0 +1,170 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from backend.cache import price_snapshot
+from backend.db.database import SessionLocal
+from backend.models.models import Product, Variant
+
+
+@pytest.fixture()
+def fresh_snapshot(monkeypatch):
+    """Refresh on every quote so writes made by the test show up at once."""
+    monkeypatch.setattr(price_snapshot, "max_age", 0)
+    return price_snapshot
+
+
+def test_quote_prices_a_whole_cart(client, fresh_snapshot, make_product):
+    one, (one_variant,) = make_product(5, price_cents=1200)
+    two, _ = make_product(price_cents=300)  # no variants: not stock-tracked
+
+    r = client.post(
+        "/api/cart/quote",
+        json={
+            "items": [
+                {"product_id": one, "qty": 2},
+                {"product_id": two, "qty": 3},
+                {"product_id": 999999, "qty": 1},
+            ]
+        },
+    )
+    assert r.status_code == 200
+    body = r.get_json()
+    first, second, missing = body["items"]
+
+    assert first["variant_id"] == one_variant
+    assert first["line_total_cents"] == 2400
+    assert first["stock"] == 5 and first["available"]
+    assert second["variant_id"] is None and second["available"]
+    assert not missing["available"] and "unknown product" in missing["error"]
+
+    assert body["total_cents"] == 2400 + 900
+    assert body["available"] is False
+
+
+def test_quote_flags_short_stock(client, fresh_snapshot, make_product):
+    product_id, (variant_id,) = make_product(1, price_cents=1000)
+
+    r = client.post(
+        "/api/cart/quote",
+        json={"items": [{"product_id": product_id, "variant_id": variant_id, "qty": 2}]},
+    )
+    (item,) = r.get_json()["items"]
+    assert item["available"] is False
+    assert item["error"] == "not enough stock"
+
+
+def test_snapshot_picks_up_changes_incrementally(client, fresh_snapshot, make_product):
+    product_id, (variant_id,) = make_product(4, price_cents=1000)
+    client.post("/api/cart/quote", json={"items": [{"product_id": product_id}]})
+    full_loads = fresh_snapshot.stats().get("full_loads", 0)
+
+    with SessionLocal() as db:
+        db.get(Product, product_id).price_cents = 1500
+        db.get(Variant, variant_id).stock = 1
+        db.commit()
+
+    r = client.post("/api/cart/quote", json={"items": [{"product_id": product_id}]})
+    (item,) = r.get_json()["items"]
+    assert item["unit_price_cents"] == 1500
+    assert item["stock"] == 1
+    assert fresh_snapshot.stats().get("full_loads", 0) == full_loads
+
+
+def test_snapshot_notices_deleted_products(client, fresh_snapshot, make_product):
+    product_id, _ = make_product(2, price_cents=1000)
+    r = client.post("/api/cart/quote", json={"items": [{"product_id": product_id}]})
+    assert r.get_json()["available"] is True
+
+    with SessionLocal() as db:
+        db.delete(db.get(Product, product_id))
+        db.commit()
+
+    r = client.post("/api/cart/quote", json={"items": [{"product_id": product_id}]})
+    assert r.get_json()["available"] is False
+    assert product_id not in fresh_snapshot.products
+
+
+def test_quote_rejects_bad_payload(client):
+    assert client.post("/api/cart/quote", json={"items": []}).status_code == 400
+    r = client.post("/api/cart/quote", json={"items": [{"product_id": "x"}]})
+    assert r.status_code == 400
+
+
+def test_snapshot_notices_a_delete_paired_with_an_unseen_insert(app, make_product):
+    gone, _ = make_product(price_cents=1000)
+    with SessionLocal() as db:
+        price_snapshot.refresh(db, force=True)
+        # Committed late: older than the overlap window, so no delta sees it
+        late = Product(
+            sku=f"SKU-QUOTE-LATE-{uuid.uuid4().hex[:8]}",
+            name="Late Commit",
+            price_cents=500,
+            currency="GBP",
+            active=True,
+            seo_slug=f"late-commit-{uuid.uuid4().hex[:8]}",
+            updated_at=datetime(2000, 1, 1),
+        )
+        db.add(late)
+        db.delete(db.get(Product, gone))
+        db.commit()
+
+        price_snapshot.refresh(db, force=True)
+        assert gone not in price_snapshot.products
+        assert late.id in price_snapshot.products
+
+
+def test_checkout_of_a_product_deleted_since_the_snapshot(
+    client, login, monkeypatch, make_product
+):
+    login("buyer@example.com")
+    product_id, _ = make_product(price_cents=1000)
+    with SessionLocal() as db:
+        price_snapshot.refresh(db, force=True)
+        db.delete(db.get(Product, product_id))
+        db.commit()
+    # The snapshot is still considered fresh and holds the product
+    monkeypatch.setattr(price_snapshot, "max_age", 3600)
+
+    r = client.post("/api/checkout", json={"items": [{"product_id": product_id}]})
+    assert r.status_code == 400
+    assert "unknown product" in r.get_json()["error"]
+
+
+def test_checkout_never_skips_stock_for_variants_the_snapshot_missed(
+    client, login, monkeypatch, make_product
+):
+    login("buyer@example.com")
+    product_id, _ = make_product(price_cents=1000)
+    with SessionLocal() as db:
+        price_snapshot.refresh(db, force=True)
+        db.add(Variant(product_id=product_id, size="M", stock=0))
+        db.commit()
+    monkeypatch.setattr(price_snapshot, "max_age", 3600)
+
+    r = client.post("/api/checkout", json={"items": [{"product_id": product_id}]})
+    assert r.status_code == 409
+    assert r.get_json()["code"] == "OUT_OF_STOCK"
+
+
+def test_checkout_charges_the_current_price(client, login, monkeypatch, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product(5, price_cents=1000)
+    with SessionLocal() as db:
+        price_snapshot.refresh(db, force=True)
+        # Changed without moving updated_at, so no delta refresh sees it
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(price_cents=1500, updated_at=Product.updated_at)
+        )
+        db.commit()
+    monkeypatch.setattr(price_snapshot, "max_age", 3600)
+
+    r = client.post("/api/checkout", json={"items": [{"product_id": product_id}]})
+    assert r.status_code == 200
+    order = r.get_json()["order"]
+    assert order["items"][0]["unit_price_cents"] == 1500
+    assert order["total_cents"] == 1500
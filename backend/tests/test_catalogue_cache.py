@@ -0,0 +1,54 @@
+from backend.cache import CatalogueCache, LocalSharedBackend
+
+
+def test_listing_is_served_from_cache(client):
+    first = client.get("/api/products", query_string={"brand": "Lune"})
+    again = client.get("/api/products", query_string={"brand": " lune "})
+    assert first.headers["X-Cache"] == "MISS"
+    assert again.headers["X-Cache"] == "HIT"
+    assert again.get_json() == first.get_json()
+
+
+def test_seller_edit_invalidates_product_and_listings(client, login, make_product):
+    seller_id = login("seller@example.com")
+    product_id, _ = make_product(
+        price_cents=9900,
+        owner_id=seller_id,
+        name="Vela Linen Shirt",
+        brand="Vela",
+        category="Shirts",
+    )
+
+    listing = client.get("/api/products", query_string={"brand": "Vela"}).get_json()
+    assert [i["name"] for i in listing["items"]] == ["Vela Linen Shirt"]
+    assert client.get(f"/api/products/{product_id}").get_json()["name"] == (
+        "Vela Linen Shirt"
+    )
+
+    client.patch(
+        f"/api/seller/products/{product_id}", json={"name": "Vela Hemp Shirt"}
+    )
+
+    r = client.get(f"/api/products/{product_id}")
+    assert r.headers["X-Cache"] == "MISS"
+    assert r.get_json()["name"] == "Vela Hemp Shirt"
+    listing = client.get("/api/products", query_string={"brand": "Vela"}).get_json()
+    assert [i["name"] for i in listing["items"]] == ["Vela Hemp Shirt"]
+
+    client.delete(f"/api/seller/products/{product_id}")
+    assert client.get(f"/api/products/{product_id}").status_code == 404
+
+
+def test_shared_backend_spreads_invalidation():
+    shared = LocalSharedBackend()
+    node_a = CatalogueCache(shared=shared, generation_ttl=0)
+    node_b = CatalogueCache(shared=shared, generation_ttl=0)
+
+    node_a.set("list", ("page", 1), {"items": [1]})
+    assert node_b.get("list", ("page", 1)) == {"items": [1]}
+
+    node_b.product_changed()
+    assert node_a.get("list", ("page", 1)) is None
+
+    stats = node_a.stats()["namespaces"]["list"]
+    assert (stats["hits"], stats["misses"]) == (0, 1)
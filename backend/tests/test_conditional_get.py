@@ -0,0 +1,52 @@
+def test_product_revalidation_returns_304(client):
+    first = client.get("/api/products/1")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/products/1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+    # Talisman / security headers still applied
+    assert again.headers["X-Content-Type-Options"] == "nosniff"
+
+
+def test_listing_etag_depends_on_args_and_catalogue(client):
+    from backend.cache import catalogue_cache
+
+    a = client.get("/api/products", query_string={"sort": "price_asc"})
+    b = client.get("/api/products", query_string={"sort": "price_desc"})
+    assert a.headers["ETag"] != b.headers["ETag"]
+
+    headers = {"If-None-Match": a.headers["ETag"]}
+    r = client.get("/api/products", query_string={"sort": "price_asc"}, headers=headers)
+    assert r.status_code == 304
+
+    catalogue_cache.product_changed()
+    r = client.get("/api/products", query_string={"sort": "price_asc"}, headers=headers)
+    assert r.status_code == 200
+
+
+def test_reviews_etag_changes_with_reviews(client):
+    from backend.cache import catalogue_cache
+
+    first = client.get("/api/products/2/reviews")
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert "Cookie" in first.headers["Vary"]
+
+    headers = {"If-None-Match": first.headers["ETag"]}
+    assert client.get("/api/products/2/reviews", headers=headers).status_code == 304
+
+    catalogue_cache.bump_generation("reviews:2")
+    assert client.get("/api/products/2/reviews", headers=headers).status_code == 200
+
+
+def test_no_304_without_shared_versions(client, monkeypatch):
+    from backend.cache import catalogue_cache
+
+    etag = client.get("/api/products/1").headers["ETag"]
+    # Per-process counters: another worker may have moved on unseen
+    monkeypatch.setattr(catalogue_cache, "shared", None)
+    r = client.get("/api/products/1", headers={"If-None-Match": etag})
+    assert r.status_code == 200
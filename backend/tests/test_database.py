@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+
+from backend.db import database
+from backend.models.models import ViewEvent
+
+
+@pytest.fixture()
+def sqlite_only(app):
+    if database.dialect_name() != "sqlite":
+        pytest.skip("SQLite connection profile")
+
+
+def _pragma(conn, name):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_connections_use_tuned_pragmas(sqlite_only):
+    with database.engine.connect() as conn:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1  # NORMAL
+        assert _pragma(conn, "temp_store") == 2  # MEMORY
+        assert _pragma(conn, "foreign_keys") == 1
+        assert _pragma(conn, "busy_timeout") == database.SQLITE_PRAGMAS["busy_timeout"]
+        assert _pragma(conn, "query_only") == 0
+
+    with database.read_engine.connect() as conn:
+        assert _pragma(conn, "query_only") == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM view_events"))
+
+
+def test_writer_pool_is_a_single_connection(sqlite_only):
+    assert database.engine.pool.size() == 1
+    assert database.read_engine is not database.engine
+
+
+def test_get_requests_read_from_the_read_engine(app):
+    with app.test_request_context("/api/products", method="GET"):
+        with database.SessionLocal() as db:
+            assert db.get_bind() is database.read_engine
+            # DML still goes to the writer
+            assert db.get_bind(clause=insert(ViewEvent)) is database.engine
+
+    with app.test_request_context("/api/auth/login", method="POST"):
+        with database.SessionLocal() as db:
+            assert db.get_bind() is database.engine
+
+    with database.SessionLocal() as db:
+        assert db.get_bind() is database.engine
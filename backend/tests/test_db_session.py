@@ -0,0 +1,89 @@
+import pytest
+
+from backend.cache import TTLCache
+from backend.db import database
+from backend.db import session as session_mod
+from backend.db.session import get_db, read_only, transactional
+from backend.models.models import SellerApplication, User
+from backend.security import load_user as load_user_mod
+
+
+def test_one_session_per_request_closed_on_teardown(app):
+    with app.test_request_context("/api/orders/my"):
+        db = get_db()
+        assert get_db() is db
+        db.query(User).first()
+
+    # teardown_appcontext closed it and removed it from g
+    assert not db.in_transaction()
+
+    with app.test_request_context("/api/orders/my"):
+        assert get_db() is not db
+
+
+def test_read_only_rejects_writes(app):
+    @read_only
+    def view():
+        get_db().add(User(email="ro@example.com", role="customer", password_hash="x"))
+        get_db().flush()
+
+    with app.test_request_context("/api/auth/login", method="POST"):
+        with pytest.raises(RuntimeError):
+            view()
+
+
+def test_transactional_commits_only_on_success(app):
+    def applying(status):
+        @transactional
+        def view():
+            get_db().add(SellerApplication(user_id=1, note=f"test-{status}"))
+            return {"ok": status < 400}, status
+
+        return view
+
+    for status in (201, 400):
+        with app.test_request_context("/api/account/upgrade-seller", method="POST"):
+            applying(status)()
+
+    with database.SessionLocal() as db:
+        notes = {a.note for a in db.query(SellerApplication).all()}
+    assert "test-201" in notes
+    assert "test-400" not in notes
+
+
+def test_handlers_share_the_load_user_session(client, login, monkeypatch):
+    login("buyer@example.com")
+
+    opened = []
+    real = database.SessionLocal
+
+    def counting(*a, **kw):
+        opened.append(1)
+        return real(*a, **kw)
+
+    monkeypatch.setattr(session_mod, "SessionLocal", counting)
+    # Force load_user to hit the database too
+    monkeypatch.setattr(load_user_mod, "_user_cache", TTLCache(maxsize=1, ttl=0))
+
+    assert client.get("/api/orders/my").status_code == 200
+    assert len(opened) == 1
+
+
+def test_slow_auth_work_does_not_hold_the_writer(client, monkeypatch):
+    from backend.routes import auth
+
+    held = []
+
+    def slow(*args):
+        held.append(database.engine.pool.checkedout())
+        return "hashed"
+
+    monkeypatch.setattr(auth, "hash_password", slow)
+    monkeypatch.setattr(auth, "send_password_reset_email", slow)
+
+    r = client.post("/api/auth/register",
+                    json={"email": "writer-free@example.com", "password": "pw"})
+    assert r.status_code == 201
+    r = client.post("/api/auth/forgot-password", json={"email": "buyer@example.com"})
+    assert r.status_code == 200
+    assert held == [0, 0]
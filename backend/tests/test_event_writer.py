@@ -0,0 +1,30 @@
+from backend.security.event_writer import EventWriter
+
+
+def test_views_are_written_in_batches(client):
+    from backend.db.database import SessionLocal
+    from backend.models.models import ViewEvent
+    from backend.security.event_writer import event_writer
+
+    for _ in range(5):
+        client.get("/api/health")
+    assert event_writer.flush()
+
+    with SessionLocal() as db:
+        n = db.query(ViewEvent).filter_by(path="/api/health").count()
+    assert n == 5
+    assert event_writer.stats()["written"] >= 5
+
+
+def test_full_queue_drops_instead_of_blocking():
+    from backend.models.models import ViewEvent
+
+    writer = EventWriter(max_queue=2, batch_size=10, flush_interval=0.05)
+    # Do not let the consumer run so the queue stays full
+    writer._ensure_started = lambda: None
+
+    row = {"session_id": "s", "path": "/x"}
+    results = [writer.enqueue(ViewEvent, row) for _ in range(4)]
+
+    assert results == [True, True, False, False]
+    assert writer.stats()["dropped"] == 2
@@ -0,0 +1,147 @@
+import threading
+import uuid
+from datetime import timedelta
+
+from flask import g
+
+from backend.db.database import SessionLocal
+from backend.models.models import IdempotencyKey, Order, User, now
+from backend.security.idempotency import idempotent
+from backend.security.load_user import CurrentUser
+
+
+def _order_count(user_id: int) -> int:
+    with SessionLocal() as db:
+        return db.query(Order).filter_by(user_id=user_id).count()
+
+
+def test_retry_replays_the_first_response(client, login, make_product, stock):
+    user_id = login("buyer@example.com")
+    product_id, (variant_id,) = make_product(10, price_cents=2500)
+    before = _order_count(user_id)
+    body = {"items": [{"product_id": product_id, "qty": 1}]}
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    first = client.post("/api/checkout", json=body, headers=headers)
+    second = client.post("/api/checkout", json=body, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.get_json() == first.get_json()
+    assert _order_count(user_id) == before + 1
+    assert stock(variant_id) == 9
+
+
+def test_key_reused_with_different_body_is_rejected(client, login, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product(10, price_cents=2500)
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    r = client.post(
+        "/api/checkout", json={"items": [{"product_id": product_id, "qty": 1}]},
+        headers=headers,
+    )
+    assert r.status_code == 200
+
+    r = client.post(
+        "/api/checkout", json={"items": [{"product_id": product_id, "qty": 2}]},
+        headers=headers,
+    )
+    assert r.status_code == 422
+
+
+def test_expired_key_runs_again(client, login, make_product):
+    user_id = login("buyer@example.com")
+    product_id, _ = make_product(10, price_cents=2500)
+    key = uuid.uuid4().hex
+    body = {"items": [{"product_id": product_id, "qty": 1}]}
+    before = _order_count(user_id)
+
+    client.post("/api/checkout", json=body, headers={"Idempotency-Key": key})
+    with SessionLocal() as db:
+        row = db.query(IdempotencyKey).filter_by(user_id=user_id, key=key).one()
+        row.expires_at = now() - timedelta(seconds=1)
+        db.commit()
+
+    r = client.post("/api/checkout", json=body, headers={"Idempotency-Key": key})
+    assert r.status_code == 200
+    assert "Idempotent-Replayed" not in r.headers
+    assert _order_count(user_id) == before + 2
+
+
+def test_claim_left_by_a_crashed_request_expires_after_the_lease(client, login, make_product):
+    user_id = login("buyer@example.com")
+    product_id, _ = make_product(10, price_cents=2500)
+    key = uuid.uuid4().hex
+    body = {"items": [{"product_id": product_id, "qty": 1}]}
+
+    # A first attempt whose process died before it stored the response
+    r = client.post("/api/checkout", json=body, headers={"Idempotency-Key": key})
+    with SessionLocal() as db:
+        row = db.query(IdempotencyKey).filter_by(user_id=user_id, key=key).one()
+        assert row.status == "done"
+        assert row.expires_at > now() + timedelta(hours=1)
+        row.status = "in_progress"
+        row.expires_at = now() - timedelta(seconds=1)
+        db.commit()
+
+    r = client.post("/api/checkout", json=body, headers={"Idempotency-Key": key})
+    assert r.status_code == 200
+    assert "Idempotent-Replayed" not in r.headers
+
+
+def test_concurrent_duplicates_create_one_order(app, make_product, stock):
+    product_id, (variant_id,) = make_product(10, price_cents=2500)
+    with SessionLocal() as db:
+        buyer_id = db.query(User).filter_by(email="buyer@example.com").one().id
+    before = _order_count(buyer_id)
+    key = uuid.uuid4().hex
+
+    responses = []
+    start = threading.Barrier(6)
+
+    def buy():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = buyer_id
+        start.wait()
+        r = client.post(
+            "/api/checkout",
+            json={"items": [{"product_id": product_id, "qty": 1}]},
+            headers={"Idempotency-Key": key},
+        )
+        responses.append((r.status_code, r.get_json()))
+
+    threads = [threading.Thread(target=buy) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert {status for status, _ in responses} == {200}
+    assert len({body["order"]["id"] for _, body in responses}) == 1
+    assert _order_count(buyer_id) == before + 1
+    assert stock(variant_id) == 9
+
+
+def test_lost_lease_returns_the_response_without_storing_it(app, caplog):
+    key = uuid.uuid4().hex
+
+    @idempotent
+    def view():
+        # Ran past the lease: another request took the key over
+        with SessionLocal() as db:
+            db.query(IdempotencyKey).filter_by(key=key).delete()
+            db.commit()
+        return {"ok": True}, 201
+
+    with app.test_request_context(
+        "/api/checkout", method="POST", json={}, headers={"Idempotency-Key": key}
+    ):
+        g.current_user = CurrentUser(id=1, email="x@example.com", role="customer")
+        response = view()
+
+    assert response.status_code == 201
+    assert "lost the lease" in caplog.text
+    with SessionLocal() as db:
+        assert db.query(IdempotencyKey).filter_by(key=key).count() == 0
@@ -0,0 +1,130 @@
+import threading
+from datetime import timedelta
+
+from backend.db.database import SessionLocal
+from backend.models.models import Order, OrderItem, User, now
+from backend.security.inventory import release_expired
+
+
+def test_checkout_takes_stock(client, login, make_product, stock):
+    login("buyer@example.com")
+    product_id, (variant_id,) = make_product(3)
+
+    r = client.post(
+        "/api/checkout", json={"items": [{"product_id": product_id, "qty": 2}]}
+    )
+    assert r.status_code == 200
+    assert r.get_json()["order"]["items"][0]["variant_id"] == variant_id
+    assert stock(variant_id) == 1
+
+
+def test_checkout_is_all_or_nothing(client, login, make_product, stock):
+    login("buyer@example.com")
+    product_id, (big, small) = make_product(10, 1)
+
+    r = client.post(
+        "/api/checkout",
+        json={
+            "items": [
+                {"product_id": product_id, "variant_id": big, "qty": 2},
+                {"product_id": product_id, "variant_id": small, "qty": 2},
+            ]
+        },
+    )
+    assert r.status_code == 409
+    assert r.get_json()["variant_ids"] == [small]
+    assert stock(big) == 10
+    assert stock(small) == 1
+
+
+def test_checkout_requires_variant_when_ambiguous(client, login, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product(5, 5)
+
+    r = client.post("/api/checkout", json={"items": [{"product_id": product_id}]})
+    assert r.status_code == 400
+    assert "variant_id" in r.get_json()["error"]
+
+
+def test_product_without_variants_is_not_stock_tracked(client, login, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product()
+
+    r = client.post(
+        "/api/checkout", json={"items": [{"product_id": product_id, "qty": 3}]}
+    )
+    assert r.status_code == 200
+    assert r.get_json()["order"]["items"][0]["variant_id"] is None
+
+
+def test_sweeper_releases_expired_reservations(app, make_product, stock):
+    product_id, (variant_id,) = make_product(0)
+    with SessionLocal() as db:
+        buyer = db.query(User).filter_by(email="buyer@example.com").one()
+        order = Order(
+            user_id=buyer.id,
+            total_cents=5000,
+            status="created",
+            payment_provider="stripe",
+            reserved_until=now() - timedelta(minutes=1),
+        )
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=product_id,
+                         variant_id=variant_id, qty=2, unit_price_cents=5000))
+        db.commit()
+        order_id = order.id
+
+    assert release_expired() >= 1
+    assert stock(variant_id) == 2
+    with SessionLocal() as db:
+        assert db.get(Order, order_id).status == "cancelled"
+
+    # Already released, nothing to do the second time
+    assert release_expired() == 0
+    assert stock(variant_id) == 2
+
+
+def test_parallel_buyers_never_oversell(app, make_product, stock):
+    product_id, (variant_id,) = make_product(5)
+    with SessionLocal() as db:
+        buyer_id = db.query(User).filter_by(email="buyer@example.com").one().id
+
+    statuses = []
+    start = threading.Barrier(12)
+
+    def buy():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = buyer_id
+        start.wait()
+        r = client.post(
+            "/api/checkout", json={"items": [{"product_id": product_id, "qty": 1}]}
+        )
+        statuses.append(r.status_code)
+
+    threads = [threading.Thread(target=buy) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert statuses.count(200) == 5
+    assert statuses.count(409) == 7
+    assert stock(variant_id) == 0
+
+
+def test_sold_out_size_leaves_cached_listing(client, login, make_product):
+    login("buyer@example.com")
+    product_id, (variant_id,) = make_product(1)
+
+    listing = client.get("/api/products?size=S0&limit=100").get_json()
+    assert product_id in [i["id"] for i in listing["items"]]
+
+    r = client.post(
+        "/api/checkout", json={"items": [{"product_id": product_id, "qty": 1}]}
+    )
+    assert r.status_code == 200
+
+    listing = client.get("/api/products?size=S0&limit=100").get_json()
+    assert product_id not in [i["id"] for i in listing["items"]]
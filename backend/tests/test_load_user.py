@@ -0,0 +1,34 @@
+def test_role_change_takes_effect_immediately(app, client, login):
+    from backend.db.database import SessionLocal
+    from backend.models.models import User
+    from backend.security.passwords import hash_password
+
+    with SessionLocal() as db:
+        db.add(User(email="promote@example.com", role="customer",
+                    password_hash=hash_password("x")))
+        db.commit()
+
+    user_id = login("promote@example.com")
+    assert client.get("/api/seller/products").status_code == 403
+
+    admin_client = app.test_client()
+    with admin_client.session_transaction() as sess:
+        with SessionLocal() as db:
+            sess["user_id"] = db.query(User).filter_by(email="admin@example.com").one().id
+    r = admin_client.patch(f"/api/admin/users/{user_id}", json={"role": "seller"})
+    assert r.status_code == 200
+
+    assert client.get("/api/seller/products").status_code == 200
+
+
+def test_snapshot_avoids_user_query(client, login, monkeypatch):
+    from backend.security import load_user as mod
+
+    login("buyer@example.com")
+    client.get("/api/health")
+
+    def fail(*a, **kw):
+        raise AssertionError("user lookup should be cached")
+
+    monkeypatch.setattr(mod, "get_db", fail)
+    assert client.get("/api/orders/my").status_code == 200
@@ -0,0 +1,205 @@
+import hashlib
+import io
+import sys
+
+import pytest
+from PIL import Image
+
+from backend.db.database import SessionLocal
+from backend.models.models import Product
+from backend.security import image_variants
+from backend.security.image_variants import render_all, variant_path, variant_pool
+from backend.storage import LocalStorage
+
+
+@pytest.fixture()
+def upload_root(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.extensions, "media_storage", LocalStorage(tmp_path))
+    return tmp_path
+
+
+def _png(width: int = 2000, height: int = 1000) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 120, 80, 128)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _upload(client, data: bytes, name: str = "photo.png") -> dict:
+    r = client.post(
+        "/api/uploads/image",
+        data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 201
+    return r.get_json()
+
+
+def test_variant_rendered_on_first_request(client, upload_root, monkeypatch):
+    monkeypatch.setattr(variant_pool, "workers", 0)
+    uploaded = _upload(client, _png())
+    assert "?w=320 320w" in uploaded["srcset"]
+
+    r = client.get(f"{uploaded['url']}?w=600", headers={"Accept": "image/webp,*/*"})
+    assert r.status_code == 200
+    assert r.mimetype == "image/webp"
+    assert "Accept" in r.headers["Vary"]
+    # 600 is snapped up to the 640 variant, which is now stored next to the original
+    assert Image.open(io.BytesIO(r.data)).width == 640
+    assert (upload_root / variant_path(uploaded["path"], 640, "webp")).exists()
+
+    r = client.get(f"{uploaded['url']}?w=600", headers={"Accept": "image/png"})
+    assert r.mimetype == "image/jpeg"
+    im = Image.open(io.BytesIO(r.data))
+    assert im.format == "JPEG" and im.mode == "RGB"
+
+    r = client.get(f"{uploaded['url']}?w=0")
+    assert r.status_code == 400
+
+
+def test_small_originals_are_not_upscaled(upload_root):
+    (upload_root / "products").mkdir()
+    (upload_root / "products" / "tiny.png").write_bytes(_png(200, 100))
+
+    rendered = render_all(LocalStorage(upload_root), "products/tiny.png")
+    assert rendered == len(image_variants.VARIANT_WIDTHS) * len(
+        image_variants.supported_formats()
+    )
+    widest = upload_root / variant_path("products/tiny.png", 1280, "jpg")
+    assert Image.open(widest).size == (200, 100)
+    # Everything exists now, so a second pass has nothing to do
+    assert render_all(LocalStorage(upload_root), "products/tiny.png") == 0
+
+
+def test_upload_queues_background_rendering(client, upload_root):
+    uploaded = _upload(client, _png(800, 400))
+    variant_pool.stop()  # waits for the queued work
+
+    assert (upload_root / variant_path(uploaded["path"], 320, "webp")).exists()
+    assert (upload_root / variant_path(uploaded["path"], 320, "jpg")).exists()
+
+
+def test_uploads_are_content_addressed(client, upload_root, monkeypatch):
+    monkeypatch.setattr(variant_pool, "workers", 0)
+    data = _png(64, 64)
+    first = _upload(client, data, "a.png")
+    second = _upload(client, data, "b.png")
+
+    digest = hashlib.sha256(data).hexdigest()
+    assert first["path"] == f"products/{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert second["path"] == first["path"]
+    # One stored file, no temp files left behind
+    assert [p for p in upload_root.rglob("*") if p.is_file()] == [
+        upload_root / first["path"]
+    ]
+
+    r = client.get(first["url"])
+    assert r.status_code == 200
+    assert r.cache_control.immutable
+    assert r.cache_control.max_age == 365 * 24 * 3600
+
+
+def test_rehash_moves_legacy_uploads(app, upload_root, monkeypatch, make_product):
+    from backend.scripts import rehash_uploads
+
+    data = _png(32, 32)
+    (upload_root / "products").mkdir()
+    for name in ("old1.png", "old2.png"):
+        (upload_root / "products" / name).write_bytes(data)
+    (upload_root / "products" / "old1.w320.jpg").write_bytes(b"stale")
+
+    product_id, _ = make_product(
+        price_cents=100, hero_image_url="/media/products/old1.png"
+    )
+
+    monkeypatch.setattr(rehash_uploads, "UPLOAD_ROOT", str(upload_root))
+    monkeypatch.setattr(sys, "argv", ["rehash_uploads"])
+    rehash_uploads.main()
+
+    digest = hashlib.sha256(data).hexdigest()
+    new_rel = f"products/{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert [p for p in upload_root.rglob("*") if p.is_file()] == [upload_root / new_rel]
+    with SessionLocal() as db:
+        assert db.get(Product, product_id).hero_image_url == f"/media/{new_rel}"
+
+
+def test_media_conditional_and_range_requests(client, upload_root):
+    data = _png(16, 16)
+    (upload_root / "legacy.png").write_bytes(data)
+
+    r = client.get("/media/legacy.png")
+    assert r.status_code == 200
+    assert r.cache_control.public and r.cache_control.max_age == 86400
+    assert not r.cache_control.no_cache
+    # Public media never reads the session, so caches are not split per user
+    assert "Cookie" not in r.headers.get("Vary", "")
+
+    r = client.get("/media/legacy.png", headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+
+    r = client.get("/media/legacy.png", headers={"Range": "bytes=0-7"})
+    assert r.status_code == 206
+    assert r.data == data[:8]
+
+    assert client.get("/media/missing.png").status_code == 404
+    assert client.get("/media/../app.py").status_code in (400, 404)
+
+
+def test_media_can_be_handed_to_the_proxy(client, upload_root, monkeypatch):
+    from backend.routes import uploads
+
+    (upload_root / "legacy.png").write_bytes(_png(16, 16))
+
+    monkeypatch.setattr(uploads, "MEDIA_ACCEL", "x-accel")
+    r = client.get("/media/legacy.png")
+    assert r.status_code == 200
+    assert r.headers["X-Accel-Redirect"] == "/_media/legacy.png"
+    assert r.data == b""
+    r = client.get("/media/legacy.png", headers={"If-None-Match": r.headers["ETag"]})
+    assert r.status_code == 304
+    assert "X-Accel-Redirect" not in r.headers
+
+    monkeypatch.setattr(uploads, "MEDIA_ACCEL", "x-sendfile")
+    r = client.get("/media/legacy.png")
+    assert r.headers["X-Sendfile"] == str(upload_root / "legacy.png")
+
+
+def test_upload_validation_streams_and_sniffs(client, app, upload_root, monkeypatch):
+    from backend.security import uploads
+
+    # Refused from Content-Length, before the body is read
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 1024)
+    r = client.post(
+        "/api/uploads/image",
+        data={"file": (io.BytesIO(b"\0" * 4096), "big.png")},
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 413
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 10 * 1024 * 1024)
+
+    # A GIF named .png is stored as what it is
+    buf = io.BytesIO()
+    Image.new("P", (8, 8)).save(buf, "GIF")
+    assert _upload(client, buf.getvalue(), "fake.png")["path"].endswith(".gif")
+
+    def post(data: bytes, name: str = "x.png"):
+        return client.post(
+            "/api/uploads/image",
+            data={"file": (io.BytesIO(data), name)},
+            content_type="multipart/form-data",
+        )
+
+    r = post(b"<html><script>alert(1)</script></html>")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Unsupported file type"
+
+    monkeypatch.setattr(uploads, "MAX_PIXELS", 100 * 100)
+    r = post(_png(200, 200))
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Image dimensions too large"
+
+    monkeypatch.setattr(uploads, "MAX_BYTES", 1000)
+    r = post(_png(64, 64) + b"\0" * 2000)
+    assert r.get_json()["error"] == "File too large"
+
+    # Nothing half-written is left behind
+    assert not list(upload_root.glob(".upload-*"))
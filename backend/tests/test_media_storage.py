@@ -0,0 +1,117 @@
+import io
+import sys
+
+import pytest
+from PIL import Image
+
+from backend.security.image_variants import variant_path, variant_pool
+from backend.storage import S3Storage, storage_from_env
+from fake_s3 import InMemoryS3Client
+
+
+@pytest.fixture()
+def s3(app, monkeypatch):
+    client = InMemoryS3Client()
+    storage = S3Storage(client, "media", prefix="lepax", url_ttl=600)
+    monkeypatch.setitem(app.extensions, "media_storage", storage)
+    monkeypatch.setattr(variant_pool, "workers", 0)
+    return storage
+
+
+def _upload(client, size=(300, 200), name="photo.png"):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (10, 120, 200)).save(buf, "PNG")
+    r = client.post(
+        "/api/uploads/image",
+        data={"file": (io.BytesIO(buf.getvalue()), name)},
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 201
+    return r.get_json()
+
+
+def test_uploads_go_to_the_bucket_and_media_redirects(client, s3):
+    uploaded = _upload(client)
+    obj = s3.client.objects[("media", f"lepax/{uploaded['path']}")]
+    assert obj["ContentType"] == "image/png"
+    assert "immutable" in obj["CacheControl"]
+
+    # Same bytes again: found by HEAD, not uploaded twice
+    assert _upload(client)["path"] == uploaded["path"]
+    assert s3.client.calls.count("put_object") == 1
+
+    r = client.get(uploaded["url"])
+    assert r.status_code == 302
+    assert r.location.startswith(f"http://s3.local/media/lepax/{uploaded['path']}?")
+    assert r.cache_control.max_age == 300
+
+
+def test_variants_are_rendered_into_the_bucket(client, s3):
+    uploaded = _upload(client)
+
+    r = client.get(f"{uploaded['url']}?w=100", headers={"Accept": "image/webp"})
+    assert r.status_code == 302
+    assert "Accept" in r.headers["Vary"]
+    key = variant_path(uploaded["path"], 320, "webp")
+    assert r.location.startswith(f"http://s3.local/media/lepax/{key}?")
+    variant = s3.client.objects[("media", f"lepax/{key}")]
+    assert variant["ContentType"] == "image/webp"
+    assert Image.open(io.BytesIO(variant["Body"])).size == (300, 200)
+
+    puts = s3.client.calls.count("put_object")
+    client.get(f"{uploaded['url']}?w=100", headers={"Accept": "image/webp"})
+    assert s3.client.calls.count("put_object") == puts
+
+    assert client.get("/media/products/missing.png?w=100").status_code == 404
+
+
+def test_large_files_use_multipart_upload(tmp_path):
+    client = InMemoryS3Client()
+    storage = S3Storage(client, "media", multipart_threshold=1024, part_size=1024)
+    data = bytes(range(256)) * 14  # 3.5 parts
+
+    source = tmp_path / "big.bin"
+    source.write_bytes(data)
+    storage.save("big.bin", source)
+    assert client.calls.count("upload_part") == 4
+    assert client.objects[("media", "big.bin")]["Body"] == data
+    assert not source.exists()
+    with storage.open("big.bin") as f:
+        assert f.read() == data
+
+    # A failed part aborts the upload instead of leaving parts behind
+    def broken_part(**kwargs):
+        raise ConnectionError("reset")
+
+    client.upload_part = broken_part
+    source.write_bytes(data)
+    with pytest.raises(ConnectionError):
+        storage.save("other.bin", source)
+    assert "abort_multipart_upload" in client.calls
+    assert client.uploads == {}
+    assert ("media", "other.bin") not in client.objects
+
+
+def test_public_url_skips_presigning():
+    storage = S3Storage(InMemoryS3Client(), "media", public_url="https://cdn.example.com/")
+    assert storage.url("products/a.png") == "https://cdn.example.com/products/a.png"
+    assert storage.url_max_age == 365 * 24 * 3600
+
+
+def test_errors_without_a_response_are_not_taken_for_missing():
+    class Down(Exception):
+        response = None
+
+    class Unreachable(InMemoryS3Client):
+        def head_object(self, Bucket: str, Key: str) -> dict:
+            raise Down("timed out")
+
+    with pytest.raises(Down):
+        S3Storage(Unreachable(), "media").exists("products/a.png")
+
+
+def test_s3_without_boto3_fails_at_startup(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDIA_STORAGE", "s3")
+    monkeypatch.setitem(sys.modules, "boto3", None)
+    with pytest.raises(RuntimeError, match="boto3"):
+        storage_from_env(tmp_path)
@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.db.database import SessionLocal
+from backend.models.models import Order
+from backend.security.payments import CircuitBreaker, CircuitOpen, payment_provider
+
+
+class StubStripe(BaseHTTPRequestHandler):
+    """Just enough of POST /v1/payment_intents; behaviour set on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.calls.append(
+            {"path": self.path, "port": self.client_address[1],
+             "idempotency_key": self.headers.get("Idempotency-Key")}
+        )
+        time.sleep(server.delay)
+
+        if server.fail:
+            status, body = 500, {"error": {"type": "api_error", "message": "boom"}}
+        else:
+            intent_id = f"pi_stub_{len(server.calls)}"
+            status, body = 200, {
+                "id": intent_id,
+                "object": "payment_intent",
+                "client_secret": f"{intent_id}_secret",
+            }
+        raw = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout test)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubStripe)
+    server.calls, server.delay, server.fail = [], 0.0, False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    payment_provider.configure(
+        "sk_test_stub",
+        api_base=f"http://127.0.0.1:{server.server_port}",
+        read_timeout=0.3,
+        max_retries=0,
+        breaker=CircuitBreaker(
+            failure_threshold=2,
+            reset_timeout=60,
+            slow_call=1.0,
+            is_failure=payment_provider.breaker.is_failure,
+        ),
+    )
+    yield server
+
+    server.shutdown()
+    payment_provider._client = None
+
+
+def _create_intent(client, product_id):
+    return client.post(
+        "/api/payments/stripe/create-intent",
+        json={"items": [{"product_id": product_id, "quantity": 1}]},
+    )
+
+
+def test_intent_is_created_after_the_order_is_committed(client, login, stub, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product(5, price_cents=2000)
+
+    first = _create_intent(client, product_id)
+    second = _create_intent(client, product_id)
+
+    assert first.status_code == 200
+    body = first.get_json()
+    with SessionLocal() as db:
+        order = db.get(Order, body["order_id"])
+        assert order.status == "created"
+        assert order.provider_ref == body["client_secret"].removesuffix("_secret")
+
+    assert stub.calls[0]["idempotency_key"] == f"order-{body['order_id']}"
+    # The pooled session reuses one kept-alive connection
+    assert second.status_code == 200
+    assert stub.calls[0]["port"] == stub.calls[1]["port"]
+
+
+def test_provider_errors_cancel_the_order_and_open_the_circuit(
+    client, login, stub, make_product, stock
+):
+    login("buyer@example.com")
+    product_id, (variant_id,) = make_product(5, price_cents=2000)
+    stub.fail = True
+
+    for _ in range(2):
+        assert _create_intent(client, product_id).status_code == 503
+    assert payment_provider.breaker.state == "open"
+
+    # Open circuit: fails fast without reaching the provider
+    r = _create_intent(client, product_id)
+    assert r.status_code == 503
+    assert len(stub.calls) == 2
+
+    assert stock(variant_id) == 5
+    with SessionLocal() as db:
+        statuses = {
+            o.status
+            for o in db.query(Order).filter(Order.provider_ref.is_(None)).all()
+        }
+    assert statuses == {"cancelled"}
+
+
+def test_slow_provider_times_out(client, login, stub, make_product):
+    login("buyer@example.com")
+    product_id, _ = make_product(5, price_cents=2000)
+    stub.delay = 1.0
+
+    started = time.monotonic()
+    r = _create_intent(client, product_id)
+    assert r.status_code == 503
+    assert time.monotonic() - started < 1.0
+
+
+def test_breaker_lets_one_trial_through_after_reset():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+
+    def boom():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        breaker.call(boom)
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: "ok")
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
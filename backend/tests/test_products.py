@@ -0,0 +1,80 @@
+from backend.cache import catalogue_cache
+
+
+def _walk(client, **params):
+    seen, cursor = [], ""
+    while True:
+        js = client.get(
+            "/api/products", query_string={**params, "cursor": cursor, "limit": 7}
+        ).get_json()
+        seen.extend(i["id"] for i in js["items"])
+        cursor = js["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_cursor_pages_match_offset_pages(client):
+    for sort in ("newest", "price_asc", "price_desc"):
+        full = client.get(
+            "/api/products", query_string={"sort": sort, "limit": 50}
+        ).get_json()
+        assert _walk(client, sort=sort) == [i["id"] for i in full["items"]]
+
+
+def test_cursor_mode_skips_total_unless_asked(client):
+    js = client.get("/api/products", query_string={"cursor": ""}).get_json()
+    assert js["total"] is None
+
+    js = client.get(
+        "/api/products", query_string={"cursor": "", "include_total": "estimate"}
+    ).get_json()
+    assert js["total"] >= 20
+    assert js["total_is_estimate"] is False
+
+
+def test_cursor_is_bound_to_its_sort(client):
+    js = client.get(
+        "/api/products", query_string={"cursor": "", "limit": 2}
+    ).get_json()
+    r = client.get(
+        "/api/products",
+        query_string={"cursor": js["next_cursor"], "sort": "price_asc"},
+    )
+    assert r.status_code == 400
+
+    r = client.get("/api/products", query_string={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
+
+
+def test_facets_follow_listing_filters(client):
+    js = client.get(
+        "/api/products/facets", query_string={"category": "shoes"}
+    ).get_json()
+    listing = client.get(
+        "/api/products", query_string={"category": "shoes"}
+    ).get_json()
+
+    assert js["total"] == listing["total"]
+    assert sum(b["count"] for b in js["facets"]["brand"]) == listing["total"]
+    assert sum(b["count"] for b in js["facets"]["price"]) == listing["total"]
+    assert [c["value"] for c in js["facets"]["category"]] == ["Shoes"]
+
+
+def test_facets_reuse_text_search(client):
+    js = client.get("/api/products/facets", query_string={"q": "gold"}).get_json()
+    brands = {b["value"]: b["count"] for b in js["facets"]["brand"]}
+    assert brands == {"Crescent Jewels": 2}
+
+
+def test_brand_facet_groups_case_insensitively(client, make_product):
+    for brand in ("Mixcase Co", "MIXCASE CO"):
+        make_product(price_cents=1000, brand=brand, category="Facets")
+    catalogue_cache.product_changed()
+
+    js = client.get(
+        "/api/products/facets", query_string={"brand": "mixcase co"}
+    ).get_json()
+    assert js["total"] == 2
+    assert [(b["value"].lower(), b["count"]) for b in js["facets"]["brand"]] == [
+        ("mixcase co", 2)
+    ]
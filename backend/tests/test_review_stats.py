@@ -0,0 +1,94 @@
+from backend.db.database import SessionLocal
+from backend.models.models import Order, OrderItem, Product, Review, User
+from backend.security.review_stats import recompute
+
+
+def _bought_product(make_product, *emails: str) -> int:
+    """A product with a paid order for each of `emails`."""
+    product_id, _ = make_product(price_cents=3000)
+    with SessionLocal() as db:
+        for email in emails:
+            user = db.query(User).filter_by(email=email).one()
+            order = Order(user_id=user.id, total_cents=3000, status="paid")
+            db.add(order)
+            db.flush()
+            db.add(OrderItem(order_id=order.id, product_id=product_id, qty=1,
+                             unit_price_cents=3000))
+        db.commit()
+    return product_id
+
+
+def _review(client, login, email: str, product_id: int, rating: int):
+    login(email)
+    r = client.post(
+        f"/api/products/{product_id}/reviews", json={"rating": rating, "body": "Lovely"}
+    )
+    assert r.status_code == 201
+    return r.get_json()["review"]["id"]
+
+
+def test_stats_follow_reviews(client, login, make_product):
+    product_id = _bought_product(make_product, "buyer@example.com", "seller@example.com")
+    before = client.get(f"/api/products/{product_id}")
+    assert before.get_json()["rating"] == {
+        "count": 0,
+        "average": None,
+        "histogram": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0},
+    }
+
+    _review(client, login, "buyer@example.com", product_id, 5)
+    second = _review(client, login, "seller@example.com", product_id, 2)
+
+    # The cached detail and its ETag were invalidated by the writes
+    r = client.get(
+        f"/api/products/{product_id}", headers={"If-None-Match": before.headers["ETag"]}
+    )
+    assert r.status_code == 200
+    rating = r.get_json()["rating"]
+    assert rating["count"] == 2
+    assert rating["average"] == 3.5
+    assert rating["histogram"]["5"] == 1 and rating["histogram"]["2"] == 1
+
+    assert client.delete(f"/api/reviews/{second}").status_code == 200
+    rating = client.get(f"/api/products/{product_id}").get_json()["rating"]
+    assert rating["count"] == 1 and rating["average"] == 5.0
+
+
+def test_sort_by_rating_pages_with_cursor(client, login, make_product):
+    low = _bought_product(make_product, "buyer@example.com")
+    high = _bought_product(make_product, "buyer@example.com")
+    _review(client, login, "buyer@example.com", low, 1)
+    _review(client, login, "buyer@example.com", high, 4)
+
+    seen = []
+    cursor = ""
+    while cursor is not None:
+        body = client.get(
+            "/api/products", query_string={"sort": "rating", "limit": 5, "cursor": cursor}
+        ).get_json()
+        seen.extend(body["items"])
+        cursor = body["next_cursor"]
+
+    ids = [item["id"] for item in seen]
+    assert len(ids) == len(set(ids))
+    assert ids.index(high) < ids.index(low)
+
+    averages = [item["rating_avg"] or 0 for item in seen]
+    assert averages == sorted(averages, reverse=True)
+    assert seen[ids.index(high)]["rating_count"] == 1
+    assert seen[ids.index(high)]["rating_avg"] == 4.0
+
+
+def test_recompute_repairs_drift(app, make_product):
+    product_id = _bought_product(make_product, "buyer@example.com")
+    with SessionLocal() as db:
+        buyer = db.query(User).filter_by(email="buyer@example.com").one()
+        # Written behind the routes' back, so the stats do not know about it
+        db.add(Review(product_id=product_id, user_id=buyer.id, rating=3, body_md="ok"))
+        db.commit()
+
+        assert recompute(db, [product_id]) == 1
+        db.commit()
+        product = db.get(Product, product_id)
+        assert (product.rating_count, product.rating_sum, product.rating_3) == (1, 3, 1)
+        assert product.rating_avg_x100 == 300
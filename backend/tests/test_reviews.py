@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime
+
+from backend.cache import catalogue_cache
+from backend.db.database import SessionLocal
+from backend.models.models import Order, OrderItem, Review, User
+
+
+def _product_with_reviews(make_product, count: int) -> int:
+    """A product with `count` reviews by throwaway users, all posted at once."""
+    product_id, _ = make_product(price_cents=2500)
+    tag = uuid.uuid4().hex[:8]
+    posted = datetime(2026, 1, 1, 12, 0, 0)
+    with SessionLocal() as db:
+        for n in range(count):
+            user = User(email=f"reviewer-{tag}-{n}@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            # Identical timestamps force the id tie-breaker
+            db.add(Review(product_id=product_id, user_id=user.id, rating=4,
+                          body_md="ok", body_html_sanitised="<p>ok</p>",
+                          created_at=posted))
+        db.commit()
+    return product_id
+
+
+def test_reviews_are_paged_by_cursor(client, make_product):
+    product_id = _product_with_reviews(make_product, 5)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = client.get(f"/api/products/{product_id}/reviews", query_string=params)
+        assert r.status_code == 200
+        data = r.get_json()
+        assert len(data["reviews"]) <= 2
+        seen.extend(rev["id"] for rev in data["reviews"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+    r = client.get(f"/api/products/{product_id}/reviews?cursor=not-a-cursor")
+    assert r.status_code == 400
+
+
+def test_can_review_follows_orders_and_reviews(client, login, make_product):
+    product_id = _product_with_reviews(make_product, 0)
+    user_id = login("buyer@example.com")
+    url = f"/api/products/{product_id}/reviews"
+
+    data = client.get(url).get_json()
+    assert data["can_review"] is False
+    assert data["my_review_id"] is None
+
+    with SessionLocal() as db:
+        order = Order(user_id=user_id, total_cents=2500, status="paid")
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=product_id, qty=1,
+                         unit_price_cents=2500))
+        db.commit()
+    # What checkout and the Stripe inbox do once an order is paid
+    catalogue_cache.bump_generation(f"orders:{user_id}")
+
+    assert client.get(url).get_json()["can_review"] is True
+
+    r = client.post(url, json={"rating": 5, "body": "Great"})
+    assert r.status_code == 201
+    review_id = r.get_json()["review"]["id"]
+
+    data = client.get(url).get_json()
+    assert data["can_review"] is False
+    assert data["my_review_id"] == review_id
@@ -5,3 +5,32 @@ def test_search_smoke(client):
     assert js["total"] >= 1
     names = [i["name"] for i in js["items"]]
     assert any("Rose Gold" in n for n in names)
+
+
+def test_search_matches_description(client):
+    r = client.get("/api/products", query_string={"q": "lightweight hoops"})
+    assert r.status_code == 200
+    names = [i["name"] for i in r.get_json()["items"]]
+    assert names == ["Rose Gold Hoop Earrings"]
+
+
+def test_search_relevance_prefers_name_hits(client):
+    r = client.get("/api/search", query_string={"q": "gold"})
+    items = r.get_json()["items"]
+    # "Elara Gold Band" and the earrings both carry "gold" in the name
+    assert {items[0]["name"], items[1]["name"]} == {
+        "Elara Gold Band",
+        "Rose Gold Hoop Earrings",
+    }
+
+
+def test_search_ignores_fts_syntax(client):
+    r = client.get("/api/search", query_string={"q": 'gold" OR NEAR(*'})
+    assert r.status_code == 200
+
+
+def test_tsquery_expr_quotes_prefix_terms():
+    from backend.routes.products import _tsquery_expr
+
+    assert _tsquery_expr("Rose  gold!") == "'Rose':* & 'gold':*"
+    assert _tsquery_expr("a' | b") == "'a':* & 'b':*"
@@ -0,0 +1,214 @@
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+import pytest
+
+from backend.db.database import SessionLocal
+from backend.models.models import (
+    Order,
+    OrderItem,
+    StripeEvent,
+    User,
+    Variant,
+    now,
+)
+from backend.security.inventory import cancel_reservation
+from backend.security.stripe_inbox import RetryLater, mark_paid, stripe_inbox
+
+SECRET = "whsec_test_secret"
+
+
+def _sign(payload: bytes, secret: str = SECRET) -> str:
+    """Build a Stripe-Signature header the way Stripe does."""
+    timestamp = int(time.time())
+    signed = f"{timestamp}.".encode() + payload
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+@pytest.fixture()
+def webhook(app, client, monkeypatch):
+    """Post signed events; the inbox is drained by hand instead of by threads."""
+    monkeypatch.setitem(app.config, "STRIPE_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(stripe_inbox, "workers", 0)
+
+    def _post(event_type: str, obj: dict, event_id: str | None = None):
+        payload = json.dumps(
+            {
+                "id": event_id or f"evt_{uuid.uuid4().hex}",
+                "object": "event",
+                "type": event_type,
+                "data": {"object": obj},
+            }
+        ).encode()
+        return client.post(
+            "/webhooks/stripe",
+            data=payload,
+            headers={"Stripe-Signature": _sign(payload)},
+            content_type="application/json",
+        )
+
+    return _post
+
+
+def _card_order(make_product, stock_left: int = 0, qty: int = 1) -> tuple[int, int, str]:
+    """A created Stripe order holding `qty` of a variant; returns ids and intent."""
+    product_id, (variant_id,) = make_product(stock_left, price_cents=4000)
+    intent_id = f"pi_{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        buyer = db.query(User).filter_by(email="buyer@example.com").one()
+        order = Order(
+            user_id=buyer.id,
+            total_cents=4000 * qty,
+            status="created",
+            payment_provider="stripe",
+            provider_ref=intent_id,
+            reserved_until=now(),
+        )
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=product_id,
+                         variant_id=variant_id, qty=qty, unit_price_cents=4000))
+        db.commit()
+        return order.id, variant_id, intent_id
+
+
+def _order_status(order_id: int) -> str:
+    with SessionLocal() as db:
+        return db.get(Order, order_id).status
+
+
+def _event(event_id: str) -> StripeEvent:
+    with SessionLocal() as db:
+        return db.get(StripeEvent, event_id)
+
+
+def test_webhook_stores_event_and_worker_marks_paid(webhook, make_product):
+    order_id, _, intent_id = _card_order(make_product)
+    event_id = f"evt_{uuid.uuid4().hex}"
+
+    r = webhook("payment_intent.succeeded", {"id": intent_id}, event_id)
+    assert r.status_code == 200
+    # Nothing applied inside the request
+    assert _order_status(order_id) == "created"
+    assert _event(event_id).status == "pending"
+
+    # A redelivery is accepted but not stored twice
+    assert webhook("payment_intent.succeeded", {"id": intent_id}, event_id).status_code == 200
+
+    assert stripe_inbox.drain() == 1
+    assert _order_status(order_id) == "paid"
+    assert _event(event_id).status == "done"
+
+
+def test_bad_signature_is_rejected(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "STRIPE_WEBHOOK_SECRET", SECRET)
+    payload = b'{"id": "evt_forged", "type": "payment_intent.succeeded"}'
+    r = client.post(
+        "/webhooks/stripe",
+        data=payload,
+        headers={"Stripe-Signature": _sign(payload, "whsec_wrong")},
+    )
+    assert r.status_code == 400
+    assert _event("evt_forged") is None
+
+
+def test_failed_payment_releases_stock(webhook, make_product, stock):
+    order_id, variant_id, intent_id = _card_order(make_product, stock_left=0, qty=2)
+
+    webhook("payment_intent.payment_failed", {"id": intent_id})
+    stripe_inbox.drain()
+
+    assert _order_status(order_id) == "cancelled"
+    assert stock(variant_id) == 2
+
+
+def test_out_of_order_refund_is_retried(webhook, make_product):
+    order_id, _, intent_id = _card_order(make_product)
+    refund_id = f"evt_{uuid.uuid4().hex}"
+
+    webhook(
+        "charge.refunded",
+        {"id": "ch_1", "payment_intent": intent_id, "refunded": True},
+        refund_id,
+    )
+    stripe_inbox.drain()
+    refund = _event(refund_id)
+    assert refund.status == "pending" and refund.attempts == 1
+    assert refund.next_attempt_at > now()
+
+    webhook("payment_intent.succeeded", {"id": intent_id})
+    stripe_inbox.drain()
+    assert _order_status(order_id) == "paid"
+
+    # Backoff elapsed
+    with SessionLocal() as db:
+        db.get(StripeEvent, refund_id).next_attempt_at = now()
+        db.commit()
+    stripe_inbox.drain()
+    assert _order_status(order_id) == "refunded"
+    assert _event(refund_id).status == "done"
+
+
+def test_event_fails_after_max_attempts(webhook, monkeypatch):
+    monkeypatch.setattr(stripe_inbox, "max_attempts", 2)
+    event_id = f"evt_{uuid.uuid4().hex}"
+    webhook("payment_intent.succeeded", {"id": "pi_does_not_exist"}, event_id)
+
+    for _ in range(2):
+        with SessionLocal() as db:
+            db.get(StripeEvent, event_id).next_attempt_at = now()
+            db.commit()
+        stripe_inbox.drain()
+
+    event = _event(event_id)
+    assert event.status == "failed"
+    assert event.attempts == 2
+    assert "pi_does_not_exist" in event.last_error
+
+
+def test_mark_paid_retries_when_the_sweeper_gets_there_first(app, make_product, stock):
+    order_id, variant_id, _ = _card_order(make_product, stock_left=0)
+    with SessionLocal() as db:
+        stale = db.get(Order, order_id)
+        db.expunge(stale)
+    # The sweeper cancels the order after the event handler read it
+    with SessionLocal() as db:
+        cancel_reservation(db, order_id)
+        db.commit()
+
+    with SessionLocal() as db:
+        with pytest.raises(RetryLater):
+            mark_paid(db, stale)
+        db.rollback()
+
+    assert _order_status(order_id) == "cancelled"
+    with SessionLocal() as db:
+        assert db.get(Variant, variant_id).stock == 1
+        # The retry sees the cancelled order and takes the stock again
+        assert mark_paid(db, db.get(Order, order_id))
+        db.commit()
+    assert _order_status(order_id) == "paid"
+    assert stock(variant_id) == 0
+
+
+def test_payment_after_expiry_without_stock_fails_for_a_refund(webhook, make_product):
+    order_id, variant_id, intent_id = _card_order(make_product, stock_left=0)
+    with SessionLocal() as db:
+        cancel_reservation(db, order_id)
+        # Someone else bought the released unit
+        db.get(Variant, variant_id).stock = 0
+        db.commit()
+    event_id = f"evt_{uuid.uuid4().hex}"
+
+    webhook("payment_intent.succeeded", {"id": intent_id}, event_id)
+    stripe_inbox.drain()
+
+    assert _order_status(order_id) == "cancelled"
+    event = _event(event_id)
+    # Not retried: it is left for someone to refund
+    assert event.status == "failed" and event.attempts == 1
+    assert "refund required" in event.last_error
@@ -1,5 +1,6 @@
 import { Link } from 'react-router-dom';
 import { formatMoney } from '../lib/formatMoney';
+import { mediaSrcSet } from '../lib/mediaSrcSet';
 
 type Props = {
 	id: number;
@@ -29,6 +30,9 @@ export default function ProductCard({
 				{hero_image_url ? (
 					<img
 						src={hero_image_url}
+						srcSet={mediaSrcSet(hero_image_url)}
+						sizes='(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw'
+						loading='lazy'
 						alt={name}
 						className='h-full w-full object-cover transition-transform duration-300 group-hover:scale-[1.03]'
 					/>
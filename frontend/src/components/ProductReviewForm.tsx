@@ -48,9 +48,11 @@ export default function ProductReviewForm({
 			try {
 				const res = await api.get(`/api/products/${productId}/reviews`);
 				const reviews: Review[] = res.data.reviews ?? [];
-				const mine = reviews.find((r) => r.user_id === user.id);
+				const myReviewId: number | null = res.data.my_review_id ?? null;
+				// Only the first page is loaded; the body shows if it is on it
+				const mine = reviews.find((r) => r.id === myReviewId) ?? null;
 
-				if (!cancelled && mine) {
+				if (!cancelled && myReviewId !== null) {
 					setHasReview(true);
 					setExistingReview(mine);
 				}
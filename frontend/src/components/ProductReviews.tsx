@@ -11,7 +11,9 @@ type ProductReview = {
 
 export default function ProductReviews({ productId }: { productId: number }) {
 	const [reviews, setReviews] = useState<ProductReview[]>([]);
+	const [nextCursor, setNextCursor] = useState<string | null>(null);
 	const [loading, setLoading] = useState(true);
+	const [loadingMore, setLoadingMore] = useState(false);
 	const [error, setError] = useState('');
 
 	useEffect(() => {
@@ -21,6 +23,7 @@ export default function ProductReviews({ productId }: { productId: number }) {
 				setError('');
 				const res = await api.get(`/api/products/${productId}/reviews`);
 				setReviews(res.data.reviews ?? []);
+				setNextCursor(res.data.next_cursor ?? null);
 			} catch (err: any) {
 				setError(err?.response?.data?.error || 'Failed to load reviews');
 			} finally {
@@ -30,6 +33,22 @@ export default function ProductReviews({ productId }: { productId: number }) {
 		load();
 	}, [productId]);
 
+	async function loadMore() {
+		if (!nextCursor) return;
+		try {
+			setLoadingMore(true);
+			const res = await api.get(`/api/products/${productId}/reviews`, {
+				params: { cursor: nextCursor },
+			});
+			setReviews((prev) => [...prev, ...(res.data.reviews ?? [])]);
+			setNextCursor(res.data.next_cursor ?? null);
+		} catch (err: any) {
+			setError(err?.response?.data?.error || 'Failed to load reviews');
+		} finally {
+			setLoadingMore(false);
+		}
+	}
+
 	if (loading) {
 		return <p className='text-xs text-lepax-silver/70'>Loading reviews…</p>;
 	}
@@ -66,6 +85,18 @@ export default function ProductReviews({ productId }: { productId: number }) {
 					<p className='mt-2 text-xs text-lepax-silver/80'>{rev.comment}</p>
 				</li>
 			))}
+			{nextCursor && (
+				<li>
+					<button
+						type='button'
+						onClick={loadMore}
+						disabled={loadingMore}
+						className='text-xs text-lepax-gold hover:underline disabled:opacity-50'
+					>
+						{loadingMore ? 'Loading…' : 'Show more reviews'}
+					</button>
+				</li>
+			)}
 		</ul>
 	);
 }
@@ -3,6 +3,10 @@ import { api } from '../lib/api';
 
 export type CartItem = {
 	product_id: number;
+	// Required by checkout when the product has more than one variant
+	variant_id?: number;
+	// e.g. "M / Black", shown in the bag when the product has several
+	variant_label?: string;
 	name: string;
 	brand: string;
 	category: string;
@@ -14,11 +18,18 @@ export type CartItem = {
 type CartContextType = {
 	items: CartItem[];
 	addItem: (item: Omit<CartItem, 'qty'>, qty?: number) => void;
-	removeItem: (product_id: number) => void;
+	removeItem: (product_id: number, variant_id?: number) => void;
 	clear: () => void;
 	totalCents: number;
 };
 
+function sameLine(
+	a: Pick<CartItem, 'product_id' | 'variant_id'>,
+	b: Pick<CartItem, 'product_id' | 'variant_id'>
+) {
+	return a.product_id === b.product_id && a.variant_id === b.variant_id;
+}
+
 const CartContext = createContext<CartContextType | undefined>(undefined);
 
 export function CartProvider({ children }: { children: ReactNode }) {
@@ -26,10 +37,11 @@ export function CartProvider({ children }: { children: ReactNode }) {
 
 	function addItem(item: Omit<CartItem, 'qty'>, qty = 1) {
 		setItems((prev) => {
-			const existing = prev.find((p) => p.product_id === item.product_id);
+			// Each variant of a product is its own line
+			const existing = prev.find((p) => sameLine(p, item));
 			if (existing) {
 				return prev.map((p) =>
-					p.product_id === item.product_id ? { ...p, qty: p.qty + qty } : p
+					sameLine(p, item) ? { ...p, qty: p.qty + qty } : p
 				);
 			}
 			return [...prev, { ...item, qty }];
@@ -47,8 +59,10 @@ export function CartProvider({ children }: { children: ReactNode }) {
 			});
 	}
 
-	function removeItem(product_id: number) {
-		setItems((prev) => prev.filter((p) => p.product_id !== product_id));
+	function removeItem(product_id: number, variant_id?: number) {
+		setItems((prev) =>
+			prev.filter((p) => !sameLine(p, { product_id, variant_id }))
+		);
 	}
 
 	function clear() {
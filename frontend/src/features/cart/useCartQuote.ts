@@ -0,0 +1,45 @@
+import { useQuery } from '@tanstack/react-query';
+import { api } from '../../lib/api';
+import type { CartItem } from '../../context/CartContext';
+
+export type QuoteItem = {
+	product_id: number;
+	variant_id: number | null;
+	qty: number;
+	name?: string;
+	unit_price_cents?: number;
+	currency?: string;
+	line_total_cents?: number;
+	stock?: number | null;
+	available: boolean;
+	error?: string;
+};
+
+export type CartQuote = {
+	ok: boolean;
+	items: QuoteItem[];
+	total_cents: number;
+	currency: string | null;
+	available: boolean;
+};
+
+// Current server-side prices and stock for the whole bag in one request
+export function useCartQuote(items: CartItem[]) {
+	const lines = items.map((it) => ({
+		product_id: it.product_id,
+		variant_id: it.variant_id,
+		qty: it.qty,
+	}));
+
+	return useQuery({
+		queryKey: ['cart-quote', lines],
+		queryFn: async () => {
+			const { data } = await api.post<CartQuote>('/api/cart/quote', {
+				items: lines,
+			});
+			return data;
+		},
+		enabled: lines.length > 0,
+		placeholderData: (prev) => prev,
+	});
+}
@@ -4,6 +4,8 @@ export interface ProductListItem {
 	brand: string;
 	category: string;
 	price_cents: number;
+	rating_count: number;
+	rating_avg: number | null;
 }
 
 export interface ProductListResponse {
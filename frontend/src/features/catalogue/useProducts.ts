@@ -9,7 +9,7 @@ export type ProductQuery = Partial<{
 	colour: string;
 	min_price: number;
 	max_price: number;
-	sort: 'newest' | 'price_asc' | 'price_desc';
+	sort: 'newest' | 'price_asc' | 'price_desc' | 'rating';
 	page: number;
 	limit: number;
 }>;
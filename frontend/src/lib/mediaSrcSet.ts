@@ -0,0 +1,13 @@
+// Widths the backend renders variants at (IMAGE_VARIANT_WIDTHS); others are
+// snapped to the next one up, so this only needs to be roughly in sync.
+const VARIANT_WIDTHS = [320, 640, 960, 1280];
+
+/**
+ * srcset for an image served from our /media/ route, so the browser picks a
+ * resized WebP/AVIF/JPEG variant instead of the full-size original.
+ * Returns undefined for external URLs, which are used as-is.
+ */
+export function mediaSrcSet(url?: string | null): string | undefined {
+	if (!url || !url.includes('/media/') || url.includes('?')) return undefined;
+	return VARIANT_WIDTHS.map((w) => `${url}?w=${w} ${w}w`).join(', ');
+}
@@ -2,9 +2,10 @@ import { useNavigate } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
 import { api } from '../lib/api';
 import { useAuth } from '../context/AuthContext';
-import { useState } from 'react';
+import { useMemo, useState } from 'react';
 import { formatMoney } from '../lib/formatMoney';
 import { StripeCardForm } from '../components/StripeCardForm';
+import { useCartQuote } from '../features/cart/useCartQuote';
 
 type Phase = 'review' | 'payment';
 type PaymentMethod = 'card' | 'paypal';
@@ -32,8 +33,17 @@ export default function CartPage() {
 	);
 	const [stripeOrderId, setStripeOrderId] = useState<number | null>(null);
 
+	// One key per checkout attempt, made when the bag is loaded and reused
+	// by every retry, so a repeated request replays the first response
+	// instead of creating a second order. A changed bag is a new attempt.
+	const idempotencyKey = useMemo(() => crypto.randomUUID(), [items]);
+
+	// Server prices win over the ones stored when items were added
+	const { data: quote } = useCartQuote(items);
+	const quotedTotal = quote?.ok ? quote.total_cents : totalCents;
+
 	// Use the currency of the first item, fallback just in case
-	const currency = items[0]?.currency ?? 'EUR';
+	const currency = quote?.currency ?? items[0]?.currency ?? 'EUR';
 
 	function handleStartCheckout() {
 		if (!user) {
@@ -71,6 +81,8 @@ export default function CartPage() {
 			return;
 		}
 
+		const idempotency = { headers: { 'Idempotency-Key': idempotencyKey } };
+
 		try {
 			setLoading(true);
 			setError('');
@@ -80,9 +92,10 @@ export default function CartPage() {
 				const res = await api.post('/api/payments/stripe/create-intent', {
 					items: items.map((it) => ({
 						product_id: it.product_id,
+						variant_id: it.variant_id,
 						quantity: it.qty, // backend expects "quantity"
 					})),
-				});
+				}, idempotency);
 
 				if (!res.data?.ok) {
 					setError(res.data?.error || 'Failed to start Stripe payment.');
@@ -99,6 +112,7 @@ export default function CartPage() {
 			const payload = {
 				items: items.map((it) => ({
 					product_id: it.product_id,
+					variant_id: it.variant_id,
 					qty: it.qty,
 				})),
 				// purely for audit / coursework flavour
@@ -106,7 +120,7 @@ export default function CartPage() {
 				two_factor_used: true,
 			};
 
-			const res = await api.post('/api/checkout', payload);
+			const res = await api.post('/api/checkout', payload, idempotency);
 
 			if (res.data?.ok) {
 				clear();
@@ -169,19 +183,36 @@ export default function CartPage() {
 
 			<div className='grid gap-8 lg:grid-cols-[3fr,2fr]'>
 				<ul className='space-y-3'>
-					{items.map((it) => (
+					{items.map((it, i) => (
 						<li
-							key={it.product_id}
+							key={`${it.product_id}-${it.variant_id ?? ''}`}
 							className='flex items-center justify-between rounded-2xl border border-slate-800 bg-lepax-charcoalSoft/80 px-4 py-3 text-sm'
 						>
 							<div>
 								<p className='font-medium'>{it.name}</p>
+								{it.variant_label && (
+									<p className='text-xs text-lepax-silver/70'>
+										{it.variant_label}
+									</p>
+								)}
 								<p className='text-xs text-lepax-silver/70'>
-									Qty {it.qty} • {formatMoney(it.price_cents, it.currency)} each
+									Qty {it.qty} •{' '}
+									{formatMoney(
+										quote?.items[i]?.unit_price_cents ?? it.price_cents,
+										it.currency
+									)}{' '}
+									each
 								</p>
+								{quote?.items[i] && !quote.items[i].available && (
+									<p className='text-xs text-red-400'>
+										{quote.items[i].error === 'not enough stock'
+											? 'Not enough stock'
+											: 'No longer available'}
+									</p>
+								)}
 							</div>
 							<button
-								onClick={() => removeItem(it.product_id)}
+								onClick={() => removeItem(it.product_id, it.variant_id)}
 								className='text-xs text-lepax-silver/60 hover:text-red-400'
 							>
 								Remove
@@ -198,7 +229,7 @@ export default function CartPage() {
 					</p>
 
 					<p className='text-lg font-semibold text-lepax-gold'>
-						Total: {formatMoney(totalCents, currency)}
+						Total: {formatMoney(quotedTotal, currency)}
 					</p>
 
 					{/* Phase switch */}
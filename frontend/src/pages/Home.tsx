@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { api } from '../lib/api';
+import { mediaSrcSet } from '../lib/mediaSrcSet';
 
 type ProductSummary = {
 	id: number;
@@ -81,6 +82,8 @@ function HomeCarousel() {
 			{p.hero_image_url && (
 				<img
 					src={p.hero_image_url}
+					srcSet={mediaSrcSet(p.hero_image_url)}
+					sizes='256px'
 					alt={p.name}
 					className='absolute inset-0 h-full w-full object-cover opacity-60'
 				/>
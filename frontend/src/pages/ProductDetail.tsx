@@ -7,6 +7,12 @@ import { formatMoney } from '../lib/formatMoney';
 import ProductReviews from '../components/ProductReviews';
 
 
+type Variant = {
+	id: number;
+	size: string | null;
+	colour: string | null;
+};
+
 type Product = {
 	id: number;
 	name: string;
@@ -15,13 +21,19 @@ type Product = {
 	description_md: string;
 	price_cents: number;
 	currency: string;
+	variants: Variant[];
 };
 
+function variantLabel(v: Variant) {
+	return [v.size, v.colour].filter(Boolean).join(' / ') || `Option ${v.id}`;
+}
+
 export default function ProductDetail() {
 	const { id } = useParams();
 	const [product, setProduct] = useState<Product | null>(null);
 	const [loading, setLoading] = useState(true);
 	const [error, setError] = useState('');
+	const [variantId, setVariantId] = useState<number | null>(null);
 
 	const { user } = useAuth();
 	console.log('ProductDetail user =', user);
@@ -36,6 +48,9 @@ export default function ProductDetail() {
 				setError('');
 				const prodRes = await api.get(`/api/products/${id}`);
 				setProduct(prodRes.data);
+				// A single variant needs no choice; several must be picked
+				const variants: Variant[] = prodRes.data.variants ?? [];
+				setVariantId(variants.length === 1 ? variants[0].id : null);
 			} catch (err: any) {
 				setError(err.response?.data?.error || 'Failed to load product');
 			} finally {
@@ -49,8 +64,12 @@ export default function ProductDetail() {
 	function handleAddToCart() {
 		if (!product) return;
 
+		const chosen = product.variants.find((v) => v.id === variantId);
 		addItem({
 			product_id: product.id,
+			variant_id: chosen?.id,
+			variant_label:
+				chosen && product.variants.length > 1 ? variantLabel(chosen) : undefined,
 			name: product.name,
 			brand: product.brand,
 			category: product.category,
@@ -84,6 +103,8 @@ export default function ProductDetail() {
 	}
 
 	const priceDisplay = formatMoney(product.price_cents, product.currency);
+	// Checkout cannot tell which of several variants was meant
+	const needsChoice = product.variants.length > 1 && variantId === null;
 
 	return (
 		<main className='mx-auto max-w-4xl px-4 py-10 text-slate-100'>
@@ -113,9 +134,32 @@ export default function ProductDetail() {
 					{priceDisplay}
 				</p>
 
+				{product.variants.length > 1 && (
+					<div>
+						<label className='block text-xs text-lepax-silver/70 mb-1'>
+							Option
+						</label>
+						<select
+							value={variantId ?? ''}
+							onChange={(e) =>
+								setVariantId(e.target.value ? Number(e.target.value) : null)
+							}
+							className='rounded-md border border-slate-700 bg-lepax-charcoalSoft px-2 py-1 text-sm text-slate-100'
+						>
+							<option value=''>Choose…</option>
+							{product.variants.map((v) => (
+								<option key={v.id} value={v.id}>
+									{variantLabel(v)}
+								</option>
+							))}
+						</select>
+					</div>
+				)}
+
 				<button
 					onClick={handleAddToCart}
-					className='mt-4 rounded-full bg-lepax-gold px-6 py-2 text-sm font-medium text-lepax-charcoal hover:bg-lepax-rose transition'
+					disabled={needsChoice}
+					className='mt-4 rounded-full bg-lepax-gold px-6 py-2 text-sm font-medium text-lepax-charcoal hover:bg-lepax-rose transition disabled:opacity-50'
 				>
 					Add to bag
 				</button>